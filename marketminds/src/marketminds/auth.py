@@ -1,23 +1,34 @@
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from passlib.context import CryptContext
+from typing import Optional, Tuple
 from jose import JWTError, jwt
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from . import schemas
-from .database import UserDB
+from . import outbox, passwords, schemas
+from .database import AsyncSessionLocal, UserDB
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "a_super_secret_key_for_development")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = passwords.pwd_context
+
+# Authenticated principals are cached by token subject so chat requests do not
+# query the users table every time.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+# Trust a valid signature and expiry alone; deleted users keep access until their token expires.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return passwords.verify_password(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -33,15 +44,94 @@ def decode_access_token(token: str) -> Optional[str]:
     except JWTError:
         return None
 
+class PrincipalCache:
+    """Bounded LRU of authenticated users with a fixed TTL."""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[schemas.User, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[schemas.User]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return user
+
+    def put(self, user: schemas.User) -> None:
+        with self._lock:
+            self._entries[user.username] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidate_user(username: str) -> None:
+    """Call after a user is deleted or changed so the next request re-reads them."""
+    principal_cache.invalidate(username)
+
+
+async def load_principal(username: str) -> Optional[schemas.User]:
+    """Reads a user in its own session and caches the result."""
+    async with AsyncSessionLocal() as db:
+        user = await aget_user(db, username)
+    if user is None:
+        return None
+    principal = schemas.User(username=user.username)
+    principal_cache.put(principal)
+    return principal
+
+
 def get_user(db: Session, username: str) -> Optional[UserDB]:
     """Reads a user from the database."""
     return db.query(UserDB).filter(UserDB.username == username).first()
 
-def create_user(db: Session, user: schemas.UserCreate) -> UserDB:
-    """Writes a new user to the database."""
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None) -> UserDB:
+    """Writes a new user to the database. Pass ``hashed_password`` if it was already computed."""
+    hashed_password = hashed_password or get_password_hash(user.password)
     db_user = UserDB(username=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    invalidate_user(db_user.username)
+    return db_user
+
+def update_password_hash(db: Session, username: str, hashed_password: str) -> None:
+    """Stores a rehashed password, e.g. after the argon2 parameters changed."""
+    db.query(UserDB).filter(UserDB.username == username).update({UserDB.hashed_password: hashed_password})
+    db.commit()
+
+async def aget_user(db: AsyncSession, username: str) -> Optional[UserDB]:
+    result = await db.execute(select(UserDB).where(UserDB.username == username))
+    return result.scalar_one_or_none()
+
+async def acreate_user(db: AsyncSession, user: schemas.UserCreate, hashed_password: str) -> UserDB:
+    """Writes a new user and its signup outbox event in one transaction."""
+    db_user = UserDB(username=user.email, hashed_password=hashed_password)
+    db.add(db_user)
+    outbox.enqueue(db, outbox.USER_SIGNUP, {"email": user.email})
+    await db.commit()
+    invalidate_user(db_user.username)
+    return db_user
+
+async def aupdate_password_hash(db: AsyncSession, username: str, hashed_password: str) -> None:
+    await db.execute(update(UserDB).where(UserDB.username == username).values(hashed_password=hashed_password))
+    await db.commit()
@@ -0,0 +1,436 @@
+"""Quotes for many symbols in one round trip.
+
+Symbols are grouped by asset class and each group is sent to a provider's
+multi-symbol endpoint: FMP comma-separated quotes for stocks (the remainder
+from Polygon's grouped daily bars), Twelve Data batch ``symbol=`` for forex,
+commodities and indices (the remainder from FMP), and CoinGecko ``ids=`` for
+crypto (the remainder from CoinCap). The primary calls for every group, split
+into chunks of ``QUOTE_BATCH_CHUNK_SIZE`` symbols, go out concurrently, then
+the fallbacks for whatever they missed. Twelve Data bills one API credit per
+symbol, so its chunks are smaller and spend one rate-limit token per symbol.
+
+Each quote is kept in the shared quote cache under the ``batch`` provider, so a
+watchlist refreshed every few seconds only asks for symbols that expired.
+"""
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import http_client
+from .quote_cache import normalize_symbol, quote_cache
+
+QUOTE_BATCH_CHUNK_SIZE = int(os.getenv("QUOTE_BATCH_CHUNK_SIZE", "50"))
+# At most the per-minute credit limit (8 on the free tier), or a chunk can never be granted.
+TWELVE_DATA_BATCH_CHUNK_SIZE = int(os.getenv("TWELVE_DATA_BATCH_CHUNK_SIZE", "8"))
+QUOTE_BATCH_MAX_SYMBOLS = int(os.getenv("QUOTE_BATCH_MAX_SYMBOLS", "200"))
+QUOTE_BATCH_WORKERS = int(os.getenv("QUOTE_BATCH_WORKERS", "8"))
+
+STOCK, MARKET, CRYPTO = "stock", "market", "crypto"
+ASSET_CLASSES = (STOCK, MARKET, CRYPTO)
+
+# Common tickers and their CoinGecko ids; other crypto can be asked for as "crypto:<id>".
+CRYPTO_IDS = {
+    "BTC": "bitcoin",
+    "ETH": "ethereum",
+    "SOL": "solana",
+    "XRP": "ripple",
+    "BNB": "binancecoin",
+    "ADA": "cardano",
+    "DOGE": "dogecoin",
+    "TRX": "tron",
+    "DOT": "polkadot",
+    "AVAX": "avalanche-2",
+    "LINK": "chainlink",
+    "LTC": "litecoin",
+    "MATIC": "matic-network",
+    "USDT": "tether",
+    "USDC": "usd-coin",
+}
+_CRYPTO_NAMES = set(CRYPTO_IDS.values())
+
+# Commodities as Twelve Data spells them and as FMP does.
+_COMMODITY_SYMBOLS = {
+    "XAU/USD": "GCUSD",  # gold
+    "XAG/USD": "SIUSD",  # silver
+    "XPT/USD": "PLUSD",  # platinum
+    "XPD/USD": "PAUSD",  # palladium
+    "WTI/USD": "CLUSD",  # crude oil
+    "XBR/USD": "BZUSD",  # Brent crude
+    "NG/USD": "NGUSD",  # natural gas
+}
+_FMP_COMMODITIES = {fmp: twelve_data for twelve_data, fmp in _COMMODITY_SYMBOLS.items()}
+_CURRENCIES = {
+    "USD", "EUR", "GBP", "JPY", "CHF", "CAD", "AUD", "NZD", "CNY", "HKD", "SGD", "SEK", "NOK", "DKK", "INR", "MXN", "ZAR",
+}
+
+
+def twelve_data_symbol(symbol: str) -> str:
+    """Twelve Data's spelling of a market symbol: 'EUR/USD', 'XAU/USD', '^IXIC'."""
+    symbol = symbol.strip().upper()
+    if symbol in _FMP_COMMODITIES:
+        return _FMP_COMMODITIES[symbol]
+    if len(symbol) == 6 and symbol[:3] in _CURRENCIES and symbol[3:] in _CURRENCIES:
+        return f"{symbol[:3]}/{symbol[3:]}"
+    return symbol
+
+
+def fmp_symbol(symbol: str) -> str:
+    """FMP's spelling: 'EURUSD', 'GCUSD' for gold, '^IXIC'."""
+    symbol = twelve_data_symbol(symbol)
+    return _COMMODITY_SYMBOLS.get(symbol, symbol.replace("/", ""))
+
+
+Quote = Dict[str, Any]
+# (url, params, symbols covered by the request)
+Request = Tuple[str, Dict[str, Any], List[str]]
+
+
+def classify(symbol: str) -> Tuple[str, str]:
+    """Returns (asset class, provider symbol) for a requested symbol.
+
+    ``stock:``, ``market:`` and ``crypto:`` prefixes override the guess. Market
+    symbols are spelled the Twelve Data way, so 'market:GCUSD' and 'XAU/USD'
+    are one symbol.
+    """
+    prefix, _, rest = symbol.partition(":")
+    if rest and prefix.lower() in ASSET_CLASSES:
+        asset_class, symbol = prefix.lower(), rest.strip()
+        if asset_class == CRYPTO:
+            return CRYPTO, CRYPTO_IDS.get(symbol.upper(), symbol.lower())
+        if asset_class == MARKET:
+            return MARKET, twelve_data_symbol(symbol)
+        return asset_class, symbol.upper()
+
+    symbol = symbol.strip()
+    base = re.sub(r"[-/]USDT?$", "", symbol.upper())
+    if base in CRYPTO_IDS:
+        return CRYPTO, CRYPTO_IDS[base]
+    if symbol.lower() in _CRYPTO_NAMES:
+        return CRYPTO, symbol.lower()
+    if "/" in symbol or symbol.startswith("^"):
+        return MARKET, twelve_data_symbol(symbol)
+    return STOCK, symbol.upper()
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _quote(provider: str, price: Any, change: Any = None, change_percent: Any = None, volume: Any = None) -> Quote:
+    return {
+        "provider": provider,
+        "price": _float(price),
+        "change": _float(change),
+        "change_percent": _float(change_percent),
+        "volume": _float(volume),
+    }
+
+
+def _chunks(symbols: List[str], size: int = QUOTE_BATCH_CHUNK_SIZE) -> List[List[str]]:
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+
+class BatchProvider:
+    """A multi-symbol quote endpoint.
+
+    ``requests`` builds the calls for a list of provider symbols and ``parse``
+    maps one response body back to quotes keyed by those symbols. ``spell``
+    turns a symbol into the provider's own spelling.
+    """
+
+    name: str = ""
+
+    @staticmethod
+    def spell(symbol: str) -> str:
+        return symbol
+
+    def requests(self, symbols: List[str]) -> List[Request]:
+        raise NotImplementedError
+
+    def parse(self, data: Any, symbols: List[str]) -> Dict[str, Quote]:
+        raise NotImplementedError
+
+    def cost(self, request: Request) -> int:
+        """Rate-limit tokens one request spends."""
+        return 1
+
+    def _match(self, symbols: List[str]) -> Dict[str, str]:
+        """Normalized provider spelling -> requested symbol ('GCUSD' -> 'XAU/USD')."""
+        return {normalize_symbol(self.spell(symbol)): symbol for symbol in symbols}
+
+
+class FMPBatchProvider(BatchProvider):
+    name = "fmp"
+    spell = staticmethod(fmp_symbol)
+
+    def requests(self, symbols: List[str]) -> List[Request]:
+        params = {"apikey": os.getenv("FMP_API_KEY")}
+        return [
+            (
+                "https://financialmodelingprep.com/api/v3/quote/" + ",".join(self.spell(s) for s in chunk),
+                params,
+                chunk,
+            )
+            for chunk in _chunks(symbols)
+        ]
+
+    def parse(self, data: Any, symbols: List[str]) -> Dict[str, Quote]:
+        requested = self._match(symbols)
+        quotes = {}
+        for row in data or []:
+            symbol = requested.get(normalize_symbol(row.get("symbol", "")))
+            if symbol and row.get("price") is not None:
+                quotes[symbol] = _quote(
+                    self.name, row["price"], row.get("change"), row.get("changesPercentage"), row.get("volume")
+                )
+        return quotes
+
+
+class TwelveDataBatchProvider(BatchProvider):
+    name = "twelve_data"
+    spell = staticmethod(twelve_data_symbol)
+
+    def requests(self, symbols: List[str]) -> List[Request]:
+        api_key = os.getenv("TWELVE_DATA_API_KEY")
+        return [
+            (
+                "https://api.twelvedata.com/quote",
+                {"symbol": ",".join(self.spell(s) for s in chunk), "apikey": api_key},
+                chunk,
+            )
+            for chunk in _chunks(symbols, TWELVE_DATA_BATCH_CHUNK_SIZE)
+        ]
+
+    def cost(self, request: Request) -> int:
+        # Batch requests are billed one credit per symbol.
+        return len(request[2])
+
+    def parse(self, data: Any, symbols: List[str]) -> Dict[str, Quote]:
+        # A single symbol comes back as the quote itself, several as {provider symbol: quote}.
+        rows = {self.spell(symbols[0]): data} if len(symbols) == 1 else data
+        quotes = {}
+        for symbol in symbols:
+            row = rows.get(self.spell(symbol)) or {}
+            if row.get("status") == "error" or row.get("close") is None:
+                continue
+            quotes[symbol] = _quote(
+                self.name, row["close"], row.get("change"), row.get("percent_change"), row.get("volume")
+            )
+        return quotes
+
+
+class PolygonGroupedDailyProvider(BatchProvider):
+    """Previous trading day's bars for every US stock in a single call.
+
+    A grouped bar carries no previous close, so these quotes have no change
+    figures rather than an open-to-close move that other providers do not report.
+    """
+
+    name = "polygon"
+
+    @staticmethod
+    def _previous_weekday(today: Optional[date] = None) -> date:
+        day = (today or date.today()) - timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day
+
+    def requests(self, symbols: List[str]) -> List[Request]:
+        day = self._previous_weekday().isoformat()
+        url = f"https://api.polygon.io/v2/aggs/grouped/locale/us/market/stocks/{day}"
+        return [(url, {"adjusted": "true", "apiKey": os.getenv("POLYGON_API_KEY")}, symbols)]
+
+    def parse(self, data: Any, symbols: List[str]) -> Dict[str, Quote]:
+        wanted = set(symbols)
+        quotes = {}
+        for bar in data.get("results") or []:
+            symbol = bar.get("T")
+            if symbol in wanted and bar.get("c") is not None:
+                quotes[symbol] = _quote(self.name, bar["c"], volume=bar.get("v"))
+        return quotes
+
+
+class CoinGeckoBatchProvider(BatchProvider):
+    name = "coingecko"
+
+    def requests(self, symbols: List[str]) -> List[Request]:
+        return [
+            (
+                "https://api.coingecko.com/api/v3/simple/price",
+                {
+                    "ids": ",".join(chunk),
+                    "vs_currencies": "usd",
+                    "include_24hr_change": "true",
+                    "include_24hr_vol": "true",
+                    "x_cg_demo_api_key": os.getenv("COINGECKO_API_KEY"),
+                },
+                chunk,
+            )
+            for chunk in _chunks(symbols)
+        ]
+
+    def parse(self, data: Any, symbols: List[str]) -> Dict[str, Quote]:
+        quotes = {}
+        for coin_id in symbols:
+            row = data.get(coin_id)
+            if row and row.get("usd") is not None:
+                quotes[coin_id] = _quote(
+                    self.name, row["usd"], change_percent=row.get("usd_24h_change"), volume=row.get("usd_24h_vol")
+                )
+        return quotes
+
+
+class CoinCapBatchProvider(BatchProvider):
+    name = "coincap"
+
+    def requests(self, symbols: List[str]) -> List[Request]:
+        return [("https://api.coincap.io/v2/assets", {"ids": ",".join(chunk)}, chunk) for chunk in _chunks(symbols)]
+
+    def parse(self, data: Any, symbols: List[str]) -> Dict[str, Quote]:
+        wanted = set(symbols)
+        return {
+            row["id"]: _quote(self.name, row.get("priceUsd"), change_percent=row.get("changePercent24Hr"),
+                              volume=row.get("volumeUsd24Hr"))
+            for row in data.get("data") or []
+            if row.get("id") in wanted and row.get("priceUsd") is not None
+        }
+
+
+# Providers tried in order for each asset class; later ones only get what earlier ones missed.
+PROVIDERS: Dict[str, List[BatchProvider]] = {
+    STOCK: [FMPBatchProvider(), PolygonGroupedDailyProvider()],
+    MARKET: [TwelveDataBatchProvider(), FMPBatchProvider()],
+    CRYPTO: [CoinGeckoBatchProvider(), CoinCapBatchProvider()],
+}
+
+
+def _group(symbols: List[str]) -> Tuple[Dict[str, Dict[str, List[str]]], Dict[str, Quote]]:
+    """Splits requested symbols by asset class, skipping ones in the quote cache.
+
+    Returns ({asset class: {provider symbol: [requested symbols]}}, cached quotes).
+    """
+    groups: Dict[str, Dict[str, List[str]]] = {asset_class: {} for asset_class in ASSET_CLASSES}
+    cached: Dict[str, Quote] = {}
+    for requested in dict.fromkeys(symbols):
+        asset_class, provider_symbol = classify(requested)
+        quote = quote_cache.get("batch", f"{asset_class}:{provider_symbol}")
+        if quote is not None:
+            cached[requested] = {**quote, "cached": True}
+        else:
+            groups[asset_class].setdefault(provider_symbol, []).append(requested)
+    return groups, cached
+
+
+def _collect(
+    asset_class: str, wanted: Dict[str, List[str]], found: Dict[str, Quote], payload: Dict[str, Any]
+) -> None:
+    for provider_symbol, requested_symbols in wanted.items():
+        quote = found.get(provider_symbol)
+        if quote is None:
+            for requested in requested_symbols:
+                payload["errors"][requested] = f"No quote found for '{requested}'."
+            continue
+        quote = {"symbol": provider_symbol, "asset_class": asset_class, **quote}
+        quote_cache.put("batch", f"{asset_class}:{provider_symbol}", quote)
+        for requested in requested_symbols:
+            payload["quotes"][requested] = {**quote, "cached": False}
+
+
+def _payload(symbols: List[str], cached: Dict[str, Quote]) -> Dict[str, Any]:
+    return {"quotes": dict(cached), "errors": {}, "requested": len(symbols)}
+
+
+def _ordered(payload: Dict[str, Any], symbols: List[str]) -> Dict[str, Any]:
+    payload["quotes"] = {s: payload["quotes"][s] for s in dict.fromkeys(symbols) if s in payload["quotes"]}
+    return payload
+
+
+def _check(symbols: List[str]) -> None:
+    if len(symbols) > QUOTE_BATCH_MAX_SYMBOLS:
+        raise ValueError(f"At most {QUOTE_BATCH_MAX_SYMBOLS} symbols can be quoted at once.")
+
+
+def _calls(
+    groups: Dict[str, Dict[str, List[str]]], found: Dict[str, Dict[str, Quote]], tier: int
+) -> List[Tuple[str, BatchProvider, Request]]:
+    """Requests to the ``tier``-th provider of each asset class for symbols still missing."""
+    calls = []
+    for asset_class, wanted in groups.items():
+        providers = PROVIDERS[asset_class]
+        missing = [s for s in wanted if s not in found[asset_class]]
+        if missing and tier < len(providers):
+            calls.extend((asset_class, providers[tier], request) for request in providers[tier].requests(missing))
+    return calls
+
+
+def _absorb(call: Tuple[str, BatchProvider, Request], response: Any, found: Dict[str, Dict[str, Quote]]) -> None:
+    asset_class, provider, (_, _, chunk) = call
+    if isinstance(response, Exception):
+        print(f"WARNING: Batch quote request to {provider.name} failed: {response}")
+        return
+    try:
+        quotes = provider.parse(response.json(), chunk)
+    except Exception as e:
+        print(f"WARNING: Could not parse batch quotes from {provider.name}: {e}")
+        return
+    # A row without a price counts as missing, so the next provider is asked for it.
+    found[asset_class].update((symbol, quote) for symbol, quote in quotes.items() if quote["price"] is not None)
+
+
+def _finish(symbols, groups, found, payload) -> Dict[str, Any]:
+    for asset_class, wanted in groups.items():
+        _collect(asset_class, wanted, found[asset_class], payload)
+    return _ordered(payload, symbols)
+
+
+_TIERS = max(len(providers) for providers in PROVIDERS.values())
+_pool = ThreadPoolExecutor(max_workers=QUOTE_BATCH_WORKERS, thread_name_prefix="batch-quotes")
+
+
+async def afetch_quotes(symbols: List[str]) -> Dict[str, Any]:
+    """Quotes for ``symbols`` as ``{"quotes": {symbol: quote}, "errors": {symbol: message}}``.
+
+    Primary providers for every asset class are called at once, then fallbacks
+    for whatever they missed.
+    """
+    _check(symbols)
+    groups, cached = _group(symbols)
+    found: Dict[str, Dict[str, Quote]] = {asset_class: {} for asset_class in groups}
+    for tier in range(_TIERS):
+        calls = _calls(groups, found, tier)
+        responses = await asyncio.gather(
+            *(
+                http_client.aget(request[0], params=request[1], cost=provider.cost(request))
+                for _, provider, request in calls
+            ),
+            return_exceptions=True,
+        )
+        for call, response in zip(calls, responses):
+            _absorb(call, response, found)
+    return _finish(symbols, groups, found, _payload(symbols, cached))
+
+
+def fetch_quotes(symbols: List[str]) -> Dict[str, Any]:
+    """Blocking counterpart of ``afetch_quotes`` for tools running in crew threads."""
+    _check(symbols)
+    groups, cached = _group(symbols)
+    found: Dict[str, Dict[str, Quote]] = {asset_class: {} for asset_class in groups}
+    for tier in range(_TIERS):
+        calls = _calls(groups, found, tier)
+        futures = [
+            _pool.submit(http_client.get, request[0], params=request[1], cost=provider.cost(request))
+            for _, provider, request in calls
+        ]
+        for call, future in zip(calls, futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                response = e
+            _absorb(call, response, found)
+    return _finish(symbols, groups, found, _payload(symbols, cached))
@@ -1,18 +1,30 @@
-from typing import Dict, Any, List, Literal
+import asyncio
+import os
+import time
+from contextvars import copy_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Literal, Optional
 from pydantic import BaseModel, Field
 from langchain_core.runnables import (
     Runnable,
     RunnableConfig,
     RunnableLambda,
     RunnableBranch,
-    RunnablePassthrough,
 )
+from langchain_core.runnables.config import get_config_list
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from crewai import Crew, Process
 
-from .crew import MarketmindsCrewService
-from .templates import MASTER_ROUTER_PROMPT
+from . import metrics
+from .coalescing import CHAT_COALESCING_ENABLED, RunCoalescer, run_coalescer
+from .crew import get_crew_registry
+from .crew_executor import CREW_EXECUTOR_WORKERS, crew_executor
+from .fast_router import classify
+from .prewarm import popularity
+from .streaming import emit
+from .response_cache import RESPONSE_CACHE_ENABLED, ResponseCache, cache_key, is_cacheable, response_cache
+from .templates import MASTER_ROUTER_PROMPT, ROUTER_EXTRACTOR_PROMPT
 
 
 class ExtractedInputs(BaseModel):
@@ -41,17 +53,56 @@ class SimpleInput(BaseModel):
     input: str
 
 
-class SingleTaskRunnable(Runnable):
+def _session_user(config: Optional[RunnableConfig]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("session_id")
+
+
+class CrewRunnable(Runnable):
+    """Base for runnables whose ``invoke`` blocks on a crew.
+
+    ``ainvoke`` runs ``invoke`` on the bounded crew executor, counted against
+    the ``session_id`` user, so async callers never block the event loop and
+    excess load is rejected instead of queued without limit.
+    """
+
+    async def ainvoke(self, input: Any, config: RunnableConfig = None, **kwargs) -> Dict[str, Any]:
+        return await crew_executor.run(self.invoke, input, config, user=_session_user(config))
+
+    async def abatch(
+        self,
+        inputs: List[Any],
+        config: RunnableConfig = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        # A batch from one user should not trip that user's concurrency limit.
+        semaphore = asyncio.Semaphore(
+            configs[0].get("max_concurrency") or crew_executor.per_user_limit
+        )
+
+        async def run_one(input: Any, run_config: RunnableConfig):
+            async with semaphore:
+                return await self.ainvoke(input, run_config)
+
+        return await asyncio.gather(
+            *(run_one(input, run_config) for input, run_config in zip(inputs, configs)),
+            return_exceptions=return_exceptions,
+        )
+
+
+class SingleTaskRunnable(CrewRunnable):
     task_name: str
 
     def __init__(self, task_name: str):
         self.task_name = task_name
 
     def invoke(self, input: str, config: RunnableConfig = None) -> Dict[str, Any]:
-        crew_service = MarketmindsCrewService()
         try:
-            task_method = getattr(crew_service, self.task_name)
-            task = task_method()
+            task = get_crew_registry().task(self.task_name)
         except AttributeError:
             return {"output": f"Error: Task method '{self.task_name}' not found."}
 
@@ -77,11 +128,9 @@ class SingleTaskRunnable(Runnable):
         return {"output": result.raw}
 
 
-class HistoricalTaskRunnable(Runnable):
+class HistoricalTaskRunnable(CrewRunnable):
     def invoke(self, input: Dict, config: RunnableConfig = None) -> Dict[str, Any]:
-        crew_service = MarketmindsCrewService()
-        task_method = getattr(crew_service, "crypto_historical_analysis_task")
-        task = task_method()
+        task = get_crew_registry().task("crypto_historical_analysis_task")
         agent = task.agent
 
         single_task_crew = Crew(
@@ -91,66 +140,129 @@ class HistoricalTaskRunnable(Runnable):
         return {"output": result.raw}
 
 
-class DualTaskRunnable(Runnable):
+CREW_PARALLEL_TASKS = os.getenv("CREW_PARALLEL_TASKS", "true").lower() == "true"
+# Enough threads for every crew run the executor allows at once to fan out to
+# three branches, so a branch only waits for a thread when crews are also
+# started outside the executor (the per-route endpoints).
+CREW_PARALLEL_WORKERS = int(os.getenv("CREW_PARALLEL_WORKERS", str(CREW_EXECUTOR_WORKERS * 3)))
+CREW_TASK_TIMEOUT_SECONDS = float(os.getenv("CREW_TASK_TIMEOUT_SECONDS", "180"))
+
+parallel_task_executor = ThreadPoolExecutor(
+    max_workers=CREW_PARALLEL_WORKERS, thread_name_prefix="crew-task"
+)
+
+
+def _kickoff_single_task(task, inputs: Dict) -> str:
+    single_task_crew = Crew(
+        agents=[task.agent], tasks=[task], process=Process.sequential, verbose=0
+    )
+    return single_task_crew.kickoff(inputs=inputs).raw
+
+
+def run_tasks_in_parallel(tasks: List, inputs: Dict, timeout: float) -> List[str]:
+    """Runs each task as its own single-agent crew and returns outputs in task order.
+
+    A branch that fails, or is still running ``timeout`` seconds after it
+    started, is reported in its slot instead of failing the others. A running
+    crew cannot be stopped, so a timed-out branch keeps its thread until it
+    finishes and its result is discarded. A branch that could not start within
+    ``timeout`` seconds of submission is cancelled.
+    """
+    started: Dict[int, float] = {}
+
+    def branch(index: int, task) -> str:
+        started[index] = time.monotonic()
+        return _kickoff_single_task(task, inputs)
+
+    submitted = time.monotonic()
+    # Each branch runs in a copy of the caller's context so per-request state
+    # (such as the chat event stream) follows it onto the pool threads.
+    futures = [
+        parallel_task_executor.submit(copy_context().run, branch, index, task)
+        for index, task in enumerate(tasks)
+    ]
+    outputs: Dict[int, str] = {}
+    pending = dict(enumerate(futures))
+    while pending:
+        now = time.monotonic()
+        for index, future in list(pending.items()):
+            task = tasks[index]
+            if future.done():
+                if future.exception() is not None:
+                    outputs[index] = f"Error: '{task.name}' failed: {future.exception()}"
+                else:
+                    outputs[index] = future.result()
+            elif index in started:
+                if started[index] + timeout > now:
+                    continue
+                outputs[index] = (
+                    f"Error: '{task.name}' is still running after {timeout:g} seconds; its result was not used."
+                )
+            elif submitted + timeout > now:
+                continue
+            elif future.cancel():
+                outputs[index] = f"Error: '{task.name}' could not start within {timeout:g} seconds; all workers were busy."
+            else:
+                # It started between the checks; its own deadline applies from now.
+                started.setdefault(index, now)
+                continue
+            del pending[index]
+        if pending:
+            next_deadline = min(started.get(index, submitted) + timeout for index in pending)
+            wait(pending.values(), timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+    return [outputs[index] for index in range(len(tasks))]
+
+
+class MultiTaskRunnable(CrewRunnable):
+    """Runs several independent tasks on the same extracted inputs.
+
+    By default each task gets its own crew and the crews run concurrently;
+    with ``parallel=False`` they run as one sequential crew.
+    """
+
     task_names: List[str]
 
-    def __init__(self, task_names: List[str]):
-        if len(task_names) != 2:
-            raise ValueError("DualTaskRunnable requires exactly two task names.")
+    def __init__(
+        self,
+        task_names: List[str],
+        parallel: bool = CREW_PARALLEL_TASKS,
+        task_timeout: float = CREW_TASK_TIMEOUT_SECONDS,
+    ):
         self.task_names = task_names
+        self.parallel = parallel
+        self.task_timeout = task_timeout
 
     def invoke(
         self, extracted_inputs: Dict, config: RunnableConfig = None
     ) -> Dict[str, Any]:
-        crew_service = MarketmindsCrewService()
-        task1_method = getattr(crew_service, self.task_names[0])
-        task2_method = getattr(crew_service, self.task_names[1])
-        task1 = task1_method()
-        task2 = task2_method()
-        dual_task_crew = Crew(
-            agents=[task1.agent, task2.agent],
-            tasks=[task1, task2],
-            process=Process.sequential,
-            verbose=0,
-        )
-        result = dual_task_crew.kickoff(inputs=extracted_inputs)
-        return {
-            "output": "\n\n---\n\n".join(
-                [task_output.raw for task_output in result.tasks_output]
+        registry = get_crew_registry()
+        tasks = [registry.task(task_name) for task_name in self.task_names]
+        if self.parallel:
+            outputs = run_tasks_in_parallel(tasks, extracted_inputs, self.task_timeout)
+        else:
+            multi_task_crew = Crew(
+                agents=[task.agent for task in tasks],
+                tasks=tasks,
+                process=Process.sequential,
+                verbose=0,
             )
-        }
+            result = multi_task_crew.kickoff(inputs=extracted_inputs)
+            outputs = [task_output.raw for task_output in result.tasks_output]
+        return {"output": "\n\n---\n\n".join(outputs)}
 
 
-class TripleTaskRunnable(Runnable):
-    task_names: List[str]
+class DualTaskRunnable(MultiTaskRunnable):
+    def __init__(self, task_names: List[str], **kwargs):
+        if len(task_names) != 2:
+            raise ValueError("DualTaskRunnable requires exactly two task names.")
+        super().__init__(task_names, **kwargs)
 
-    def __init__(self, task_names: List[str]):
+
+class TripleTaskRunnable(MultiTaskRunnable):
+    def __init__(self, task_names: List[str], **kwargs):
         if len(task_names) != 3:
             raise ValueError("TripleTaskRunnable requires exactly three task names.")
-        self.task_names = task_names
-
-    def invoke(
-        self, extracted_inputs: Dict, config: RunnableConfig = None
-    ) -> Dict[str, Any]:
-        crew_service = MarketmindsCrewService()
-        task1_method = getattr(crew_service, self.task_names[0])
-        task2_method = getattr(crew_service, self.task_names[1])
-        task3_method = getattr(crew_service, self.task_names[2])
-        task1 = task1_method()
-        task2 = task2_method()
-        task3 = task3_method()
-        full_crew = Crew(
-            agents=[task1.agent, task2.agent, task3.agent],
-            tasks=[task1, task2, task3],
-            process=Process.sequential,
-            verbose=0,
-        )
-        result = full_crew.kickoff(inputs=extracted_inputs)
-        return {
-            "output": "\n\n---\n\n".join(
-                [task_output.raw for task_output in result.tasks_output]
-            )
-        }
+        super().__init__(task_names, **kwargs)
 
 
 NewsAnalysisChain = SingleTaskRunnable(task_name="news_summary_task")
@@ -160,35 +272,42 @@ CryptoAnalysisChain = SingleTaskRunnable(task_name="crypto_analysis_task")
 EconomicAnalysisChain = SingleTaskRunnable(task_name="economic_analysis_task")
 GlobalMarketChain = SingleTaskRunnable(task_name="global_market_analysis_task")
 
-CryptoHistoricalChain = (
-    InputExtractorChain
-    | RunnableLambda(lambda x: {"coin_id": x.get("coin_id"), "days": x.get("days", 30)})
-    | HistoricalTaskRunnable()
-)
-NewsAndFinancialsChain = InputExtractorChain | DualTaskRunnable(
+def _historical_inputs(x: Dict) -> Dict:
+    return {"coin_id": x.get("coin_id"), "days": x.get("days", 30)}
+
+
+crypto_historical_runnable = RunnableLambda(_historical_inputs) | HistoricalTaskRunnable()
+news_and_financials_runnable = DualTaskRunnable(
     task_names=["news_summary_task", "financial_analysis_task"]
 )
-NewsAndResearchChain = InputExtractorChain | DualTaskRunnable(
+news_and_research_runnable = DualTaskRunnable(
     task_names=["news_summary_task", "research_task"]
 )
-FinancialsAndResearchChain = InputExtractorChain | DualTaskRunnable(
+financials_and_research_runnable = DualTaskRunnable(
     task_names=["financial_analysis_task", "research_task"]
 )
-NewsAndCryptoChain = InputExtractorChain | DualTaskRunnable(
+news_and_crypto_runnable = DualTaskRunnable(
     task_names=["news_summary_task", "crypto_analysis_task"]
 )
-FinancialsAndCryptoChain = InputExtractorChain | DualTaskRunnable(
+financials_and_crypto_runnable = DualTaskRunnable(
     task_names=["financial_analysis_task", "crypto_analysis_task"]
 )
-FullAnalysisChain = InputExtractorChain | TripleTaskRunnable(
+full_analysis_runnable = TripleTaskRunnable(
     task_names=["news_summary_task", "financial_analysis_task", "research_task"]
 )
 
+CryptoHistoricalChain = InputExtractorChain | crypto_historical_runnable
+NewsAndFinancialsChain = InputExtractorChain | news_and_financials_runnable
+NewsAndResearchChain = InputExtractorChain | news_and_research_runnable
+FinancialsAndResearchChain = InputExtractorChain | financials_and_research_runnable
+NewsAndCryptoChain = InputExtractorChain | news_and_crypto_runnable
+FinancialsAndCryptoChain = InputExtractorChain | financials_and_crypto_runnable
+FullAnalysisChain = InputExtractorChain | full_analysis_runnable
 
-class HierarchicalCrewRunnable(Runnable):
+
+class HierarchicalCrewRunnable(CrewRunnable):
     def invoke(self, input: str, config: RunnableConfig = None) -> Dict[str, Any]:
-        crew_service = MarketmindsCrewService()
-        hierarchical_crew = crew_service.hierarchical_crew()
+        hierarchical_crew = get_crew_registry().hierarchical_crew()
 
         crew_inputs = {
             "master_query": input,
@@ -206,27 +325,106 @@ class HierarchicalCrewRunnable(Runnable):
         return {"output": result}
 
 
+RouteName = Literal[
+    "news_analysis",
+    "financial_analysis",
+    "knowledge_base_query",
+    "news_and_financials",
+    "news_and_research",
+    "financials_and_research",
+    "full_analysis",
+    "crypto_analysis",
+    "economic_analysis",
+    "global_market_quote",
+    "crypto_historical",
+    "news_and_crypto",
+    "financials_and_crypto",
+    "reasoning_query",
+]
+
+
 class RouteQuery(BaseModel):
-    route: Literal[
-        "news_analysis",
-        "financial_analysis",
-        "knowledge_base_query",
-        "news_and_financials",
-        "news_and_research",
-        "financials_and_research",
-        "full_analysis",
-        "crypto_analysis",
-        "economic_analysis",
-        "global_market_quote",
-        "crypto_historical",
-        "news_and_crypto",
-        "financials_and_crypto",
-        "reasoning_query",
-    ]
+    route: RouteName
+
+
+class RoutedInputs(ExtractedInputs):
+    route: RouteName = Field(description="The workflow that should handle the request.")
 
 
 router_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 RouterChain = MASTER_ROUTER_PROMPT | router_llm.with_structured_output(RouteQuery)
+# One structured call that picks the route and extracts the entities together.
+RouterExtractorChain = ROUTER_EXTRACTOR_PROMPT | router_llm.with_structured_output(RoutedInputs)
+
+FAST_ROUTER_THRESHOLD = float(os.getenv("FAST_ROUTER_THRESHOLD", "0.8"))
+
+
+def _fast_route(question: str):
+    route, confidence = classify(question)
+    if route is not None and confidence >= FAST_ROUTER_THRESHOLD:
+        return RouteQuery(route=route)
+    return None
+
+
+def _routed(x: Dict, result: RoutedInputs) -> Dict:
+    emit("route", route=result.route, router="llm")
+    entities = result.dict(exclude={"route"})
+    popularity.record(entities)
+    return {**x, "route": RouteQuery(route=result.route), "entities": entities}
+
+
+def route_and_extract(x: Dict) -> Dict:
+    """Adds ``route`` and ``entities`` to the request.
+
+    A confident keyword route skips the LLM entirely and leaves ``entities``
+    unset; otherwise a single LLM call returns both.
+    """
+    with metrics.span("routing", "keywords") as span:
+        route = _fast_route(x["input"])
+        if route is not None:
+            span["route"] = route.route
+            emit("route", route=route.route, router="keywords")
+            return {**x, "route": route, "entities": None}
+        span["name"] = "llm"
+        routed = _routed(x, RouterExtractorChain.invoke({"question": x["input"]}))
+        span["route"] = routed["route"].route
+        return routed
+
+
+async def aroute_and_extract(x: Dict) -> Dict:
+    with metrics.span("routing", "keywords") as span:
+        route = _fast_route(x["input"])
+        if route is not None:
+            span["route"] = route.route
+            emit("route", route=route.route, router="keywords")
+            return {**x, "route": route, "entities": None}
+        span["name"] = "llm"
+        routed = _routed(x, await RouterExtractorChain.ainvoke({"question": x["input"]}))
+        span["route"] = routed["route"].route
+        return routed
+
+
+def _entities(x: Dict) -> Dict:
+    if x["entities"]:
+        return x["entities"]
+    with metrics.span("extraction"):
+        entities = InputExtractorChain.invoke(x["input"])
+    popularity.record(entities)
+    return entities
+
+
+async def _aentities(x: Dict) -> Dict:
+    if x["entities"]:
+        return x["entities"]
+    with metrics.span("extraction"):
+        entities = await InputExtractorChain.ainvoke(x["input"])
+    popularity.record(entities)
+    return entities
+
+
+RouteAndExtractChain = RunnableLambda(route_and_extract, afunc=aroute_and_extract)
+# Entities from the routing call, extracted only when the fast path routed the request.
+RoutedEntities = RunnableLambda(_entities, afunc=_aentities)
 ReasoningChain = HierarchicalCrewRunnable()
 
 MasterBranch = RunnableBranch(
@@ -256,31 +454,31 @@ MasterBranch = RunnableBranch(
     ),
     (
         lambda x: x["route"].route == "crypto_historical",
-        RunnableLambda(lambda x: x["input"]) | CryptoHistoricalChain,
+        RoutedEntities | crypto_historical_runnable,
     ),
     (
         lambda x: x["route"].route == "news_and_financials",
-        RunnableLambda(lambda x: x["input"]) | NewsAndFinancialsChain,
+        RoutedEntities | news_and_financials_runnable,
     ),
     (
         lambda x: x["route"].route == "news_and_research",
-        RunnableLambda(lambda x: x["input"]) | NewsAndResearchChain,
+        RoutedEntities | news_and_research_runnable,
     ),
     (
         lambda x: x["route"].route == "financials_and_research",
-        RunnableLambda(lambda x: x["input"]) | FinancialsAndResearchChain,
+        RoutedEntities | financials_and_research_runnable,
     ),
     (
         lambda x: x["route"].route == "news_and_crypto",
-        RunnableLambda(lambda x: x["input"]) | NewsAndCryptoChain,
+        RoutedEntities | news_and_crypto_runnable,
     ),
     (
         lambda x: x["route"].route == "financials_and_crypto",
-        RunnableLambda(lambda x: x["input"]) | FinancialsAndCryptoChain,
+        RoutedEntities | financials_and_crypto_runnable,
     ),
     (
         lambda x: x["route"].route == "full_analysis",
-        RunnableLambda(lambda x: x["input"]) | FullAnalysisChain,
+        RoutedEntities | full_analysis_runnable,
     ),
     (
         lambda x: x["route"].route == "reasoning_query",
@@ -289,9 +487,99 @@ MasterBranch = RunnableBranch(
     NewsAnalysisChain,
 )
 
-MasterChain = (
-    RunnablePassthrough.assign(
-        route=RunnableLambda(lambda x: {"question": x["input"]}) | RouterChain
-    )
-    | MasterBranch
-).with_types(input_type=SimpleInput)
+
+
+class CoalescingRunnable(Runnable):
+    """Lets concurrent identical questions share one crew run.
+
+    Requests are identical when they share a response-cache key: same route
+    and normalized entities (or normalized question text).
+    """
+
+    def __init__(self, branch: Runnable, coalescer: RunCoalescer):
+        self.branch = branch
+        self.coalescer = coalescer
+
+    @staticmethod
+    def _key(input: Dict):
+        return cache_key(input["route"].route, input.get("entities"), input["input"])
+
+    def invoke(self, input: Dict, config: RunnableConfig = None) -> Dict[str, Any]:
+        return self.coalescer.run(self._key(input), lambda: self.branch.invoke(input, config))
+
+    async def ainvoke(self, input: Dict, config: RunnableConfig = None, **kwargs) -> Dict[str, Any]:
+        return await self.coalescer.arun(self._key(input), lambda: self.branch.ainvoke(input, config))
+
+
+class CachedResponseRunnable(Runnable):
+    """Serves repeated questions from the response cache before running a crew.
+
+    The output always carries ``cached`` so callers can tell the two apart.
+    """
+
+    def __init__(self, branch: Runnable, cache: ResponseCache):
+        self.branch = branch
+        self.cache = cache
+
+    def invoke(self, input: Dict, config: RunnableConfig = None) -> Dict[str, Any]:
+        route = input["route"].route
+        key = cache_key(route, input.get("entities"), input["input"])
+        hit = self.cache.get(key)
+        vector = None
+        if hit is None and self.cache.semantic:
+            vector = self.cache.embed(input["input"])
+            hit = self.cache.find_similar(route, vector)
+        if hit is not None:
+            return {**hit, "cached": True}
+
+        self.cache.record_miss()
+        result = self.branch.invoke(input, config)
+        if is_cacheable(result):
+            self.cache.put(key, route, result, vector)
+        return {**result, "cached": False}
+
+    async def ainvoke(self, input: Dict, config: RunnableConfig = None, **kwargs) -> Dict[str, Any]:
+        route = input["route"].route
+        key = cache_key(route, input.get("entities"), input["input"])
+        hit = self.cache.get(key)
+        vector = None
+        if hit is None and self.cache.semantic:
+            vector = await self.cache.aembed(input["input"])
+            hit = self.cache.find_similar(route, vector)
+        if hit is not None:
+            return {**hit, "cached": True}
+
+        self.cache.record_miss()
+        result = await self.branch.ainvoke(input, config)
+        if is_cacheable(result):
+            self.cache.put(key, route, result, vector)
+        return {**result, "cached": False}
+
+
+class TimedRunnable(Runnable):
+    """Times the answer to a routed request and tags the spans under it with the route."""
+
+    def __init__(self, branch: Runnable):
+        self.branch = branch
+
+    def invoke(self, input: Dict, config: RunnableConfig = None) -> Dict[str, Any]:
+        with metrics.routed(input["route"].route), metrics.span("answer") as span:
+            result = self.branch.invoke(input, config)
+            span["name"] = "cached" if result.get("cached") else "crew"
+            return result
+
+    async def ainvoke(self, input: Dict, config: RunnableConfig = None, **kwargs) -> Dict[str, Any]:
+        with metrics.routed(input["route"].route), metrics.span("answer") as span:
+            result = await self.branch.ainvoke(input, config)
+            span["name"] = "cached" if result.get("cached") else "crew"
+            return result
+
+
+CrewBranch = CoalescingRunnable(MasterBranch, run_coalescer) if CHAT_COALESCING_ENABLED else MasterBranch
+
+if RESPONSE_CACHE_ENABLED:
+    AnsweringBranch = CachedResponseRunnable(CrewBranch, response_cache)
+else:
+    AnsweringBranch = CrewBranch | RunnableLambda(lambda x: {**x, "cached": False})
+
+MasterChain = (RouteAndExtractChain | TimedRunnable(AnsweringBranch)).with_types(input_type=SimpleInput)
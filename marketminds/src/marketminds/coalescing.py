@@ -0,0 +1,121 @@
+"""Single-flight for crew runs.
+
+Requests that resolve to the same response-cache key, meaning the same route
+and normalized entities, while a run for that key is in progress attach to it
+instead of starting their own crew. Every attached request gets the run's
+result, except the leader's own admission rejection
+(``UserConcurrencyLimitExceeded``): that is about the leader's user, so each
+follower then runs the request itself. Async runs execute with an
+``EventFanout`` bound as the current stream, so streaming requests that attach
+mid-run receive the events so far and then the live ones.
+"""
+import asyncio
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, Type
+
+from .crew_executor import UserConcurrencyLimitExceeded
+from .streaming import EventFanout, current_stream
+
+CHAT_COALESCING_ENABLED = os.getenv("CHAT_COALESCING_ENABLED", "true").lower() == "true"
+
+
+class RunCoalescer:
+    def __init__(self, unshared: Tuple[Type[BaseException], ...] = (UserConcurrencyLimitExceeded,)):
+        # Errors that concern only the request that raised them; followers run again instead.
+        self.unshared = unshared
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._ainflight: Dict[Hashable, Tuple[asyncio.Task, EventFanout]] = {}
+        self.counters = Counter()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _rerunning(self) -> None:
+        """A follower is running on its own after all, so it saved nothing."""
+        with self._lock:
+            self.counters["runs_saved"] -= 1
+            self.counters["follower_reruns"] += 1
+
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.counters["runs"] += 1
+            else:
+                self.counters["runs_saved"] += 1
+        if not leader:
+            try:
+                return future.result()
+            except self.unshared:
+                self._rerunning()
+                return self.run(key, fn)
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def arun(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        stream = current_stream.get()
+        entry = self._ainflight.get(key)
+        follower = entry is not None and entry[0].get_loop() is loop
+        if follower:
+            task, fanout = entry
+            self._count("runs_saved")
+        else:
+            fanout = EventFanout(streaming=stream is not None and stream.streaming)
+            token = current_stream.set(fanout)
+            try:
+                # The task copies the context, so the crew emits into the fanout.
+                task = asyncio.create_task(fn())
+            finally:
+                current_stream.reset(token)
+            self._ainflight[key] = (task, fanout)
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self._count("runs")
+
+        if stream is not None:
+            fanout.subscribe(stream)
+        try:
+            # Shielded: a caller that disconnects does not cancel the run for the others.
+            return await asyncio.shield(task)
+        except self.unshared:
+            if not follower:
+                raise
+        finally:
+            if stream is not None:
+                fanout.unsubscribe(stream)
+        self._rerunning()
+        return await self.arun(key, fn)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        entry = self._ainflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._ainflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller went away
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self._inflight) + len(self._ainflight)
+        requests = stats.get("runs", 0) + stats.get("runs_saved", 0)
+        stats["saved_ratio"] = stats.get("runs_saved", 0) / requests if requests else 0.0
+        return stats
+
+
+run_coalescer = RunCoalescer()
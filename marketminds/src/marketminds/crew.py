@@ -1,12 +1,19 @@
 import os
+import threading
+
+import yaml
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task, tool
+from crewai.utilities.llm_utils import create_llm
 from langchain_openai import ChatOpenAI
 
+from marketminds.streaming import is_streaming
 from marketminds.tools.custom_tool import NewsSearchTool
 from marketminds.tools.stock_analysis_tools import (
     PolygonQuoteTool,
     YFinanceTool,
+    StockDataTool,
+    StockHistoricalTool,
     AlphaVantageProfileTool,
     AlphaVantageFinancialsTool,
 )
@@ -15,13 +22,17 @@ from marketminds.tools.crypto_economic_tools import (
     CryptoInfoTool,
     CryptoHistoricalTool,
     CoinCapQuoteTool,
+    CryptoQuoteTool,
     FREDEconomicTool,
     WorldBankEconomicTool,
+    EconomicDataTool,
 )
 from marketminds.tools.market_data_tools import (
     TwelveDataQuoteTool,
     FMPQuoteTool,
     AlphaVantageMarketQuoteTool,
+    MarketQuoteTool,
+    BatchQuoteTool,
 )
 
 
@@ -29,219 +40,312 @@ def get_config_path(file_name):
     return os.path.join(os.path.dirname(__file__), "config", file_name)
 
 
+def load_config(file_name):
+    with open(get_config_path(file_name), "r", encoding="utf-8") as file:
+        return yaml.safe_load(file)
+
+
 shared_llm = ChatOpenAI(model="gpt-4o-mini")
 
+TOOL_CLASSES = {
+    "news_search_tool": NewsSearchTool,
+    "polygon_quote_tool": PolygonQuoteTool,
+    "yfinance_tool": YFinanceTool,
+    "stock_historical_tool": StockHistoricalTool,
+    "alpha_vantage_profile_tool": AlphaVantageProfileTool,
+    "alpha_vantage_financials_tool": AlphaVantageFinancialsTool,
+    "knowledge_base_tool": RAGTool,
+    "coingecko_crypto_profile_tool": CryptoInfoTool,
+    "coincap_crypto_price_tool": CoinCapQuoteTool,
+    "crypto_historical_tool": CryptoHistoricalTool,
+    "fred_economic_tool": FREDEconomicTool,
+    "world_bank_economic_tool": WorldBankEconomicTool,
+    "twelve_data_quote_tool": TwelveDataQuoteTool,
+    "fmp_quote_tool": FMPQuoteTool,
+    "alpha_vantage_market_quote_tool": AlphaVantageMarketQuoteTool,
+    "batch_quote_tool": BatchQuoteTool,
+    # Composite tools that walk each provider fallback chain in code.
+    "stock_data_tool": StockDataTool,
+    "market_quote_tool": MarketQuoteTool,
+    "crypto_quote_tool": CryptoQuoteTool,
+    "economic_data_tool": EconomicDataTool,
+}
+
+AGENT_TOOLS = {
+    "news_and_sentiment_agent": ["news_search_tool"],
+    "stock_analyst_agent": ["stock_data_tool", "stock_historical_tool", "batch_quote_tool"],
+    "research_analyst_agent": ["knowledge_base_tool"],
+    "crypto_analyst_agent": ["crypto_quote_tool", "crypto_historical_tool"],
+    "economic_indicator_agent": ["economic_data_tool"],
+    "global_markets_agent": ["market_quote_tool", "batch_quote_tool"],
+    "market_reasoning_agent": [],
+}
+
+TASK_AGENTS = {
+    "news_summary_task": "news_and_sentiment_agent",
+    "financial_analysis_task": "stock_analyst_agent",
+    "research_task": "research_analyst_agent",
+    "crypto_analysis_task": "crypto_analyst_agent",
+    "economic_analysis_task": "economic_indicator_agent",
+    "global_market_analysis_task": "global_markets_agent",
+    "crypto_historical_analysis_task": "crypto_analyst_agent",
+}
+
+
+class CrewRegistry:
+    """Holds everything a crew needs that does not change between requests.
+
+    The YAML configs, tool instances (including the RAG tool's vector store
+    handle) and LLM clients are built once. Agents and tasks carry per-run state,
+    so ``agent``/``task``/``hierarchical_crew`` bind fresh ones to those shared
+    parts on every call.
+    """
+
+    def __init__(self):
+        self.agents_config = load_config("agents.yaml")
+        self.tasks_config = load_config("tasks.yaml")
+        self.tools = {name: tool_class() for name, tool_class in TOOL_CLASSES.items()}
+        self.reasoning_llm = shared_llm
+        self.manager_llm = ChatOpenAI(model="gpt-4o-mini")
+        # Same models with token streaming on, used while a chat stream is open.
+        self.streaming_llm = create_llm(None)
+        self.streaming_llm.stream = True
+        self.streaming_reasoning_llm = create_llm(self.reasoning_llm)
+        self.streaming_reasoning_llm.stream = True
+
+    def agent(self, agent_name: str) -> Agent:
+        config = {
+            key: value
+            for key, value in self.agents_config[agent_name].items()
+            if key != "tools"
+        }
+        kwargs = {}
+        if agent_name == "market_reasoning_agent":
+            kwargs["llm"] = self.streaming_reasoning_llm if is_streaming() else self.reasoning_llm
+        elif is_streaming():
+            kwargs["llm"] = self.streaming_llm
+        return Agent(
+            config=config,
+            tools=[self.tools[tool_name] for tool_name in AGENT_TOOLS[agent_name]],
+            **kwargs,
+        )
+
+    def manager_agent(self) -> Agent:
+        return Agent(
+            role="Lead Research Coordinator",
+            goal="Manage a team of agents to answer complex user queries.",
+            backstory="You are the central hub, an expert at understanding user intent and delegating tasks to the correct specialist.",
+            allow_delegation=True,
+            verbose=True,
+            llm=self.reasoning_llm,
+        )
+
+    def task(self, task_name: str, agent: Agent = None) -> Task:
+        if task_name not in TASK_AGENTS:
+            raise AttributeError(f"Unknown task '{task_name}'.")
+        return Task(
+            config=self.tasks_config[task_name],
+            agent=agent or self.agent(TASK_AGENTS[task_name]),
+            name=task_name,
+        )
+
+    def hierarchical_crew(self) -> Crew:
+        agents = {agent_name: self.agent(agent_name) for agent_name in AGENT_TOOLS}
+        manager = self.manager_agent()
+
+        reasoning_task = Task(
+            description="Synthesize the provided context from other agents to answer the user's original query: '{master_query}'. Formulate a cohesive, insightful final answer explaining the 'why' and 'what if'.",
+            expected_output="A detailed, insightful, and well-structured final answer.",
+            agent=agents["market_reasoning_agent"],
+        )
+
+        manager_task = Task(
+            description="Analyze the user's complex query: '{master_query}'. Create a step-by-step plan. First, delegate data-gathering tasks to your specialist agents. CRITICAL: Once data is gathered, you MUST delegate a final synthesis task to the 'MarketReasoningAgent' using the context from the previous tasks.",
+            expected_output="A final, comprehensive report synthesized by the MarketReasoningAgent.",
+            agent=manager,
+        )
+
+        return Crew(
+            agents=[*agents.values(), manager],
+            tasks=[
+                *(
+                    self.task(task_name, agent=agents[agent_name])
+                    for task_name, agent_name in TASK_AGENTS.items()
+                ),
+                reasoning_task,
+                manager_task,
+            ],
+            process=Process.hierarchical,
+            manager_llm=self.manager_llm,
+            verbose=1,
+        )
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_crew_registry() -> CrewRegistry:
+    """Returns the process-wide registry, building it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = CrewRegistry()
+    return _registry
+
 
 @CrewBase
 class MarketmindsCrewService:
+    """crewai project definition, kept for the `crewai` CLI and main.py.
+
+    Every part is taken from the shared registry; request handlers should use
+    ``get_crew_registry()`` directly.
+    """
+
     agents_config = get_config_path("agents.yaml")
     tasks_config = get_config_path("tasks.yaml")
 
     @tool
     def news_search_tool(self) -> NewsSearchTool:
-        return NewsSearchTool()
+        return get_crew_registry().tools["news_search_tool"]
 
     @tool
     def polygon_quote_tool(self) -> PolygonQuoteTool:
-        return PolygonQuoteTool()
+        return get_crew_registry().tools["polygon_quote_tool"]
 
     @tool
     def yfinance_tool(self) -> YFinanceTool:
-        return YFinanceTool()
+        return get_crew_registry().tools["yfinance_tool"]
+
+    @tool
+    def stock_historical_tool(self) -> StockHistoricalTool:
+        return get_crew_registry().tools["stock_historical_tool"]
 
     @tool
     def alpha_vantage_profile_tool(self) -> AlphaVantageProfileTool:
-        return AlphaVantageProfileTool()
+        return get_crew_registry().tools["alpha_vantage_profile_tool"]
 
     @tool
     def alpha_vantage_financials_tool(self) -> AlphaVantageFinancialsTool:
-        return AlphaVantageFinancialsTool()
+        return get_crew_registry().tools["alpha_vantage_financials_tool"]
 
     @tool
     def knowledge_base_tool(self) -> RAGTool:
-        return RAGTool()
+        return get_crew_registry().tools["knowledge_base_tool"]
 
     @tool
     def coingecko_crypto_profile_tool(self) -> CryptoInfoTool:
-        return CryptoInfoTool()
+        return get_crew_registry().tools["coingecko_crypto_profile_tool"]
 
     @tool
     def coincap_crypto_price_tool(self) -> CoinCapQuoteTool:
-        return CoinCapQuoteTool()
+        return get_crew_registry().tools["coincap_crypto_price_tool"]
 
     @tool
     def crypto_historical_tool(self) -> CryptoHistoricalTool:
-        return CryptoHistoricalTool()
+        return get_crew_registry().tools["crypto_historical_tool"]
 
     @tool
     def fred_economic_tool(self) -> FREDEconomicTool:
-        return FREDEconomicTool()
+        return get_crew_registry().tools["fred_economic_tool"]
 
     @tool
     def world_bank_economic_tool(self) -> WorldBankEconomicTool:
-        return WorldBankEconomicTool()
+        return get_crew_registry().tools["world_bank_economic_tool"]
 
     @tool
     def twelve_data_quote_tool(self) -> TwelveDataQuoteTool:
-        return TwelveDataQuoteTool()
+        return get_crew_registry().tools["twelve_data_quote_tool"]
 
     @tool
     def fmp_quote_tool(self) -> FMPQuoteTool:
-        return FMPQuoteTool()
+        return get_crew_registry().tools["fmp_quote_tool"]
 
     @tool
     def alpha_vantage_market_quote_tool(self) -> AlphaVantageMarketQuoteTool:
-        return AlphaVantageMarketQuoteTool()
+        return get_crew_registry().tools["alpha_vantage_market_quote_tool"]
+
+    @tool
+    def batch_quote_tool(self) -> BatchQuoteTool:
+        return get_crew_registry().tools["batch_quote_tool"]
+
+    @tool
+    def stock_data_tool(self) -> StockDataTool:
+        return get_crew_registry().tools["stock_data_tool"]
+
+    @tool
+    def market_quote_tool(self) -> MarketQuoteTool:
+        return get_crew_registry().tools["market_quote_tool"]
+
+    @tool
+    def crypto_quote_tool(self) -> CryptoQuoteTool:
+        return get_crew_registry().tools["crypto_quote_tool"]
+
+    @tool
+    def economic_data_tool(self) -> EconomicDataTool:
+        return get_crew_registry().tools["economic_data_tool"]
 
     @agent
     def news_and_sentiment_agent(self) -> Agent:
-        return Agent(
-            config=self.agents_config["news_and_sentiment_agent"],
-            tools=[self.news_search_tool()],
-        )
+        return get_crew_registry().agent("news_and_sentiment_agent")
 
     @agent
     def stock_analyst_agent(self) -> Agent:
-        return Agent(
-            config=self.agents_config["stock_analyst_agent"],
-            tools=[
-                self.polygon_quote_tool(),
-                self.yfinance_tool(),
-                self.alpha_vantage_profile_tool(),
-                self.alpha_vantage_financials_tool(),
-            ],
-        )
+        return get_crew_registry().agent("stock_analyst_agent")
 
     @agent
     def research_analyst_agent(self) -> Agent:
-        return Agent(
-            config=self.agents_config["research_analyst_agent"],
-            tools=[self.knowledge_base_tool()],
-        )
+        return get_crew_registry().agent("research_analyst_agent")
 
     @agent
     def crypto_analyst_agent(self) -> Agent:
-        return Agent(
-            config=self.agents_config["crypto_analyst_agent"],
-            tools=[
-                self.coingecko_crypto_profile_tool(),
-                self.crypto_historical_tool(),
-                self.coincap_crypto_price_tool(),
-            ],
-        )
+        return get_crew_registry().agent("crypto_analyst_agent")
 
     @agent
     def economic_indicator_agent(self) -> Agent:
-        return Agent(
-            config=self.agents_config["economic_indicator_agent"],
-            tools=[self.fred_economic_tool(), self.world_bank_economic_tool()],
-        )
+        return get_crew_registry().agent("economic_indicator_agent")
 
     @agent
     def global_markets_agent(self) -> Agent:
-        return Agent(
-            config=self.agents_config["global_markets_agent"],
-            tools=[
-                self.twelve_data_quote_tool(),
-                self.fmp_quote_tool(),
-                self.alpha_vantage_market_quote_tool(),
-            ],
-        )
+        return get_crew_registry().agent("global_markets_agent")
 
     @agent
     def market_reasoning_agent(self) -> Agent:
-        return Agent(
-            config=self.agents_config["market_reasoning_agent"], llm=shared_llm
-        )
+        return get_crew_registry().agent("market_reasoning_agent")
 
     @agent
     def manager_agent(self) -> Agent:
-        return Agent(
-            role="Lead Research Coordinator",
-            goal="Manage a team of agents to answer complex user queries.",
-            backstory="You are the central hub, an expert at understanding user intent and delegating tasks to the correct specialist.",
-            allow_delegation=True,
-            verbose=True,
-            llm=shared_llm,
-        )
+        return get_crew_registry().manager_agent()
 
     @task
     def news_summary_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["news_summary_task"],
-            agent=self.news_and_sentiment_agent(),
-        )
+        return get_crew_registry().task("news_summary_task", agent=self.news_and_sentiment_agent())
 
     @task
     def financial_analysis_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["financial_analysis_task"],
-            agent=self.stock_analyst_agent(),
-        )
+        return get_crew_registry().task("financial_analysis_task", agent=self.stock_analyst_agent())
 
     @task
     def research_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["research_task"],
-            agent=self.research_analyst_agent(),
-        )
+        return get_crew_registry().task("research_task", agent=self.research_analyst_agent())
 
     @task
     def crypto_analysis_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["crypto_analysis_task"],
-            agent=self.crypto_analyst_agent(),
-        )
+        return get_crew_registry().task("crypto_analysis_task", agent=self.crypto_analyst_agent())
 
     @task
     def economic_analysis_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["economic_analysis_task"],
-            agent=self.economic_indicator_agent(),
-        )
+        return get_crew_registry().task("economic_analysis_task", agent=self.economic_indicator_agent())
 
     @task
     def global_market_analysis_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["global_market_analysis_task"],
-            agent=self.global_markets_agent(),
-        )
+        return get_crew_registry().task("global_market_analysis_task", agent=self.global_markets_agent())
 
     @task
     def crypto_historical_analysis_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["crypto_historical_analysis_task"],
-            agent=self.crypto_analyst_agent(),
-        )
+        return get_crew_registry().task("crypto_historical_analysis_task", agent=self.crypto_analyst_agent())
 
     @crew
     def hierarchical_crew(self) -> Crew:
-        reasoning_task = Task(
-            description="Synthesize the provided context from other agents to answer the user's original query: '{master_query}'. Formulate a cohesive, insightful final answer explaining the 'why' and 'what if'.",
-            expected_output="A detailed, insightful, and well-structured final answer.",
-            agent=self.market_reasoning_agent(),
-        )
-
-        manager_task = Task(
-            description="Analyze the user's complex query: '{master_query}'. Create a step-by-step plan. First, delegate data-gathering tasks to your specialist agents. CRITICAL: Once data is gathered, you MUST delegate a final synthesis task to the 'MarketReasoningAgent' using the context from the previous tasks.",
-            expected_output="A final, comprehensive report synthesized by the MarketReasoningAgent.",
-            agent=self.manager_agent(),
-        )
-
-        return Crew(
-            agents=self.agents,
-            tasks=[
-                self.news_summary_task(),
-                self.financial_analysis_task(),
-                self.research_task(),
-                self.crypto_analysis_task(),
-                self.economic_analysis_task(),
-                self.global_market_analysis_task(),
-                self.crypto_historical_analysis_task(),
-                reasoning_task,
-                manager_task,
-            ],
-            process=Process.hierarchical,
-            manager_llm=ChatOpenAI(model="gpt-4o-mini"),
-            verbose=1,
-        )
+        return get_crew_registry().hierarchical_crew()
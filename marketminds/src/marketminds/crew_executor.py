@@ -0,0 +1,106 @@
+"""Bounded executor for crew runs started from async code.
+
+``Crew.kickoff`` blocks for tens of seconds, so async callers hand it to a
+dedicated thread pool instead of the event loop's default executor. Admission
+is decided up front: a run is rejected with ``CrewExecutorOverloaded`` when all
+workers are busy and the wait queue is full, and with
+``UserConcurrencyLimitExceeded`` when the same user already has
+``CREW_PER_USER_LIMIT`` runs in flight. The API maps these to 503 and 429.
+"""
+import asyncio
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Callable, Dict, Optional
+
+CREW_EXECUTOR_WORKERS = int(os.getenv("CREW_EXECUTOR_WORKERS", "4"))
+CREW_EXECUTOR_QUEUE_SIZE = int(os.getenv("CREW_EXECUTOR_QUEUE_SIZE", "16"))
+CREW_PER_USER_LIMIT = int(os.getenv("CREW_PER_USER_LIMIT", "2"))
+# Suggested client back-off when a run is shed.
+CREW_RETRY_AFTER_SECONDS = int(os.getenv("CREW_RETRY_AFTER_SECONDS", "15"))
+
+
+class CrewExecutorOverloaded(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+class UserConcurrencyLimitExceeded(Exception):
+    """The user already has the maximum number of crew runs in flight."""
+
+
+class CrewExecutor:
+    def __init__(
+        self,
+        workers: int = CREW_EXECUTOR_WORKERS,
+        queue_size: int = CREW_EXECUTOR_QUEUE_SIZE,
+        per_user_limit: int = CREW_PER_USER_LIMIT,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.per_user_limit = per_user_limit
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crew-run")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._per_user: Counter = Counter()
+        self._counters = dict.fromkeys(["admitted", "rejected_overloaded", "rejected_user_limit"], 0)
+
+    def _reserve(self, user: Optional[str]) -> None:
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                self._counters["rejected_overloaded"] += 1
+                raise CrewExecutorOverloaded(
+                    "The analysis service is at capacity. Please retry shortly."
+                )
+            if user is not None and self._per_user[user] >= self.per_user_limit:
+                self._counters["rejected_user_limit"] += 1
+                raise UserConcurrencyLimitExceeded(
+                    f"You already have {self.per_user_limit} analyses running. "
+                    "Wait for one to finish and try again."
+                )
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+            if user is not None:
+                self._per_user[user] += 1
+
+    def _release(self, user: Optional[str]) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if user is not None:
+                self._per_user[user] -= 1
+                if not self._per_user[user]:
+                    del self._per_user[user]
+
+    async def run(self, fn: Callable, *args: Any, user: Optional[str] = None) -> Any:
+        """Runs ``fn(*args)`` on a crew worker in the caller's context.
+
+        The slot is held until the worker finishes, even if the caller stops
+        waiting, because a started crew cannot be interrupted.
+        """
+        self._reserve(user)
+        try:
+            future = self._pool.submit(copy_context().run, fn, *args)
+        except BaseException:
+            self._release(user)
+            raise
+        future.add_done_callback(lambda _: self._release(user))
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = self._in_flight
+            stats["running"] = min(self._in_flight, self.workers)
+            stats["queued"] = max(0, self._in_flight - self.workers)
+            stats["users_in_flight"] = len(self._per_user)
+        stats.update(
+            workers=self.workers, queue_size=self.queue_size, per_user_limit=self.per_user_limit
+        )
+        return stats
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+crew_executor = CrewExecutor()
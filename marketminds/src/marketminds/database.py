@@ -1,13 +1,160 @@
 import os
-from sqlalchemy import create_engine, Column, String
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event, Column, DateTime, Float, Integer, String, Text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
+from . import metrics
+
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Without DATABASE_URL a local SQLite file stands in for Postgres.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./marketminds.sqlite3")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=_ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+
+class PoolMetrics:
+    """Checkout wait times and saturation for one connection pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1024)  # recent checkout waits, seconds
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+
+    def record(self, wait: float, checked_out: int, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self._waits.append(wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def stats(self, pool: Optional[QueuePool]) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "mean_wait_ms": self.total_wait / self.checkouts * 1000 if self.checkouts else 0.0,
+                "p95_wait_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+                "peak_checked_out": self.peak_checked_out,
+            }
+        if isinstance(pool, QueuePool):
+            capacity = _capacity(pool)
+            stats.update(
+                pool_size=pool.size(),
+                max_overflow=DB_MAX_OVERFLOW,
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                saturation=pool.checkedout() / capacity if capacity else 0.0,
+            )
+        return stats
+
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+
+def _capacity(pool: QueuePool) -> int:
+    """Connections the pool can hand out: its size plus the configured overflow (-1 means unbounded)."""
+    return pool.size() + max(DB_MAX_OVERFLOW, 0)
+
+
+class _TimedPoolMixin:
+    """Records how long each checkout waited for a connection, and the pool's usage on checkout and checkin."""
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The checkin event fires before the connection is back in the pool, so it is not counted.
+        event.listen(self, "checkin", lambda *_: self._report_usage(returning=1))
+
+    def _report_usage(self, returning: int = 0) -> None:
+        metrics.set_pool_usage(self.metrics.name, max(self.checkedout() - returning, 0), _capacity(self))
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            wait = time.perf_counter() - start
+            self.metrics.record(wait, self.checkedout(), timed_out=True)
+            metrics.observe_pool_checkout(self.metrics.name, wait, timed_out=True)
+            raise
+        wait = time.perf_counter() - start
+        self.metrics.record(wait, self.checkedout())
+        metrics.observe_pool_checkout(self.metrics.name, wait)
+        self._report_usage()
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics = sync_pool_metrics
 
-engine = create_engine(DATABASE_URL)
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+def _engine_options(url: str, poolclass) -> Dict[str, Any]:
+    parsed = make_url(url)
+    options: Dict[str, Any] = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            # An in-memory database lives in one connection; keep the default pool.
+            return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -16,7 +163,35 @@ class UserDB(Base):
     username = Column(String, primary_key=True, index=True)
     hashed_password = Column(String)
 
-Base.metadata.create_all(bind=engine)
+class OutboxEventDB(Base):
+    """An event to deliver to a webhook, written in the same transaction as the change it describes."""
+    __tablename__ = "outbox_events"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String, nullable=False, index=True)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, delivered, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Float, nullable=False, default=time.time, index=True)  # epoch seconds
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    delivered_at = Column(DateTime(timezone=True))
+
+class FundamentalsDB(Base):
+    """A provider's company data for one fiscal period, e.g. an overview or income statement."""
+    __tablename__ = "fundamentals"
+    source = Column(String, primary_key=True)  # e.g. alpha_vantage_overview, yfinance_info
+    ticker = Column(String, primary_key=True)
+    fiscal_period = Column(String, primary_key=True)  # latest period the payload covers, YYYY-MM-DD
+    payload = Column(Text, nullable=False)  # JSON
+    fetched_at = Column(Float, nullable=False)  # epoch seconds
+    expires_at = Column(Float, nullable=False, index=True)
+    next_earnings_at = Column(Float)
+
+
+def init_db():
+    """Creates missing tables. Run at startup or once per deploy (python -m marketminds.database)."""
+    Base.metadata.create_all(bind=engine)
+
 
 def get_db():
     """Dependency to get a database session."""
@@ -24,4 +199,56 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+_async_engine = None
+_async_session_factory = None
+_async_lock = threading.Lock()
+
+
+def get_async_engine():
+    """Builds the async engine on first use, so the async driver is only needed if it is used."""
+    global _async_engine, _async_session_factory
+    with _async_lock:
+        if _async_engine is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+            options = _engine_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool)
+            if make_url(ASYNC_DATABASE_URL).get_backend_name() == "sqlite":
+                options.pop("connect_args", None)
+            _async_engine = create_async_engine(ASYNC_DATABASE_URL, **options)
+            _async_session_factory = async_sessionmaker(
+                _async_engine, autoflush=False, expire_on_commit=False
+            )
+        return _async_engine
+
+
+def AsyncSessionLocal():
+    """Async counterpart of ``SessionLocal``."""
+    get_async_engine()
+    return _async_session_factory()
+
+
+async def get_async_db():
+    """Dependency to get an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_engines():
+    engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {
+        "sync": sync_pool_metrics.stats(engine.pool),
+        "async": async_pool_metrics.stats(_async_engine.pool if _async_engine is not None else None),
+    }
+
+
+if __name__ == "__main__":
+    init_db()
+    print(f"Database schema is up to date at {make_url(DATABASE_URL).render_as_string(hide_password=True)}")
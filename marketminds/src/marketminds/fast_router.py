@@ -0,0 +1,109 @@
+"""Keyword pre-classifier for the master router.
+
+Trivial requests ("price of Bitcoin", "news on Tesla") can be routed without an
+LLM round trip. ``classify`` maps a query onto the same labels as ``RouteQuery``
+and returns a confidence; the chain only trusts it above
+``FAST_ROUTER_THRESHOLD`` and otherwise asks the LLM router.
+"""
+import re
+from typing import Optional, Tuple
+
+_NEWS = re.compile(
+    r"\b(news|headlines?|sentiment|press releases?|announcements?|happening with)\b"
+)
+_FINANCIALS = re.compile(
+    r"\b(financials?|income statements?|balance sheets?|cash flows?|revenues?|earnings|"
+    r"profits?|net income|fundamentals?|market cap|stock price|share price|stock quote)\b"
+)
+_RESEARCH = re.compile(
+    r"\b((value|growth|index|dividend|momentum|passive|active|income|contrarian) "
+    r"(investing|investment|funds?|strateg(y|ies))|investment (strateg(y|ies)|philosoph(y|ies)|concepts?)|"
+    r"investing strateg(y|ies)|dollar[- ]cost averaging|diversification|asset allocation|explain|"
+    r"what does .+ mean)\b"
+)
+_CRYPTO = re.compile(
+    r"\b(bitcoin|btc|ethereum|eth|ether|solana|dogecoin|doge|cardano|xrp|ripple|litecoin|"
+    r"ltc|polkadot|bnb|tether|usdt|usdc|avalanche|avax|chainlink|shiba inu|tron|"
+    r"crypto|cryptocurrency|cryptocurrencies|altcoins?)\b"
+)
+_HISTORICAL = re.compile(
+    r"\b(charts?|historical|history|\d+[- ]days?|(past|last) (\d+ )?(days?|weeks?|months?|year))\b"
+)
+_ECONOMIC = re.compile(
+    r"\b(gdp|inflation|cpi|unemployment|jobless|interest rates?|fed funds|economy|"
+    r"economic indicators?|recession|payrolls|pce)\b"
+)
+_GLOBAL_MARKET = re.compile(
+    r"(\b(gold|silver|oil|crude|brent|wti|natural gas|copper|platinum|forex|fx|"
+    r"exchange rate|xau|xag|nasdaq|dow jones|dow|ftse|nikkei|dax|commodit(y|ies)|"
+    r"euro|yen|pound sterling|indices)\b|\b[a-z]{3}/[a-z]{3}\b|s&p|\bindex\b(?! funds?))"
+)
+_REASONING = re.compile(
+    r"\b(why|what if|impact|affect|affects|effect of|how will|how would|implications?|"
+    r"outlook|forecast|predict)\b"
+)
+
+# Routes for combinations of the core domains, keyed by the set that matched.
+_COMBINED_ROUTES = {
+    frozenset({"news", "financials", "research"}): "full_analysis",
+    frozenset({"news", "financials"}): "news_and_financials",
+    frozenset({"news", "research"}): "news_and_research",
+    frozenset({"financials", "research"}): "financials_and_research",
+    frozenset({"news", "crypto"}): "news_and_crypto",
+    frozenset({"financials", "crypto"}): "financials_and_crypto",
+}
+_SINGLE_ROUTES = {
+    "news": "news_analysis",
+    "financials": "financial_analysis",
+    "research": "knowledge_base_query",
+    "crypto": "crypto_analysis",
+    "economic": "economic_analysis",
+    "global_market": "global_market_quote",
+}
+
+HIGH_CONFIDENCE = 0.9
+LOW_CONFIDENCE = 0.5
+
+
+def classify(query: str) -> Tuple[Optional[str], float]:
+    """Returns (route, confidence); route is None when nothing matched."""
+    text = query.lower()
+    matched = {
+        name
+        for name, pattern in (
+            ("news", _NEWS),
+            ("financials", _FINANCIALS),
+            ("research", _RESEARCH),
+            ("crypto", _CRYPTO),
+            ("economic", _ECONOMIC),
+            ("global_market", _GLOBAL_MARKET),
+        )
+        if pattern.search(text)
+    }
+
+    if _REASONING.search(text):
+        # "why", "outlook" or "impact" also appear in plain questions ("What is
+        # the outlook for Bitcoin?"), and the reasoning crew is the most
+        # expensive route, so the LLM router always makes this call.
+        return "reasoning_query", LOW_CONFIDENCE
+
+    if "crypto" in matched and _HISTORICAL.search(text):
+        others = matched - {"crypto"}
+        return "crypto_historical", HIGH_CONFIDENCE if not others else LOW_CONFIDENCE
+
+    if not matched:
+        return None, 0.0
+
+    if len(matched) == 1:
+        return _SINGLE_ROUTES[next(iter(matched))], HIGH_CONFIDENCE
+
+    route = _COMBINED_ROUTES.get(frozenset(matched))
+    if route:
+        return route, HIGH_CONFIDENCE
+
+    # Several domains in a combination there is no chain for (e.g. news about
+    # gold): offer the closest combined route but leave the call to the LLM.
+    for combination, route in _COMBINED_ROUTES.items():
+        if combination <= matched:
+            return route, LOW_CONFIDENCE
+    return _SINGLE_ROUTES[sorted(matched)[0]], LOW_CONFIDENCE
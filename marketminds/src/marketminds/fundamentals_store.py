@@ -0,0 +1,128 @@
+"""Persistent store for company fundamentals (profiles, income statements).
+
+Rows in the ``fundamentals`` table are keyed by (source, ticker, fiscal period)
+and hold the provider's JSON payload. Fundamentals only change when a company
+reports, so an entry stays valid until shortly after the next expected earnings
+date, within ``FUNDAMENTALS_MIN_TTL_HOURS`` and ``FUNDAMENTALS_MAX_TTL_DAYS``.
+Tools call the provider only on a miss, which protects the small Alpha Vantage
+quota.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+
+from .database import FundamentalsDB, SessionLocal
+
+FUNDAMENTALS_STORE_ENABLED = os.getenv("FUNDAMENTALS_STORE_ENABLED", "true").lower() == "true"
+FUNDAMENTALS_MAX_TTL_DAYS = float(os.getenv("FUNDAMENTALS_MAX_TTL_DAYS", "30"))
+# Lower bound, so a report that is late does not cause a refetch on every request.
+FUNDAMENTALS_MIN_TTL_HOURS = float(os.getenv("FUNDAMENTALS_MIN_TTL_HOURS", "24"))
+# Time after an earnings date for providers to pick up the new figures.
+FUNDAMENTALS_EARNINGS_GRACE_HOURS = float(os.getenv("FUNDAMENTALS_EARNINGS_GRACE_HOURS", "24"))
+
+DAY_SECONDS = 86400.0
+# Companies usually report within about six weeks of a period's end.
+REPORTING_LAG_DAYS = 30
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def period_end(value: Any) -> Optional[date]:
+    """Parses a fiscal period end given as 'YYYY-MM-DD' or epoch seconds."""
+    if value in (None, "", "None"):
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc).date()
+        return date.fromisoformat(str(value)[:10])
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def expected_report(period: Optional[date], period_days: int) -> Optional[float]:
+    """Epoch seconds when the period after ``period`` is likely to be reported."""
+    if period is None:
+        return None
+    period_start = datetime(period.year, period.month, period.day, tzinfo=timezone.utc).timestamp()
+    return period_start + (period_days + REPORTING_LAG_DAYS) * DAY_SECONDS
+
+
+def _expires_at(now: float, next_earnings_at: Optional[float]) -> float:
+    max_ttl = FUNDAMENTALS_MAX_TTL_DAYS * DAY_SECONDS
+    if next_earnings_at is None:
+        return now + max_ttl
+    until_refresh = next_earnings_at + FUNDAMENTALS_EARNINGS_GRACE_HOURS * 3600 - now
+    return now + min(max_ttl, max(FUNDAMENTALS_MIN_TTL_HOURS * 3600, until_refresh))
+
+
+def get(source: str, ticker: str) -> Optional[Any]:
+    """The newest unexpired payload for ``ticker`` from ``source``, or None."""
+    if not FUNDAMENTALS_STORE_ENABLED:
+        return None
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(FundamentalsDB)
+            .where(FundamentalsDB.source == source, FundamentalsDB.ticker == ticker.upper())
+            .order_by(FundamentalsDB.fetched_at.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+    except Exception as e:
+        # A store that is unavailable should cost a provider call, not the answer.
+        print(f"WARNING: Could not read {source} fundamentals for {ticker}: {e}")
+        row = None
+    finally:
+        db.close()
+    if row is None or row.expires_at <= time.time():
+        _count("misses")
+        return None
+    _count("hits")
+    return json.loads(row.payload)
+
+
+def put(
+    source: str, ticker: str, fiscal_period: Optional[date], payload: Any, next_earnings_at: Optional[float] = None
+) -> None:
+    if not FUNDAMENTALS_STORE_ENABLED:
+        return
+    now = time.time()
+    db = SessionLocal()
+    try:
+        db.merge(
+            FundamentalsDB(
+                source=source,
+                ticker=ticker.upper(),
+                fiscal_period=fiscal_period.isoformat() if fiscal_period else "unknown",
+                payload=json.dumps(payload),
+                fetched_at=now,
+                expires_at=_expires_at(now, next_earnings_at),
+                next_earnings_at=next_earnings_at,
+            )
+        )
+        db.commit()
+        _count("stored")
+    except Exception as e:
+        db.rollback()
+        print(f"WARNING: Could not store {source} fundamentals for {ticker}: {e}")
+    finally:
+        db.close()
+
+
+def stats() -> Dict[str, Any]:
+    with _counters_lock:
+        stats = dict(_counters)
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    stats["hit_ratio"] = stats.get("hits", 0) / lookups if lookups else 0.0
+    return stats
@@ -0,0 +1,209 @@
+"""On-disk columnar price history, one directory per (source, asset, interval).
+
+Each series is stored as ``timestamps.npy``, ``prices.npy`` and ``volumes.npy``
+plus a small ``meta.json``, and read back memory-mapped. Every series has one
+fixed sampling interval: fetched points are reduced to the last point in each
+interval before they are merged, so a backfill and later tail refreshes (which
+some providers return at a finer granularity) never mix in one series.
+
+``window`` answers "the last N days" from disk and only asks the provider for
+what is missing: the range after the last stored point once it is older than
+``HISTORY_REFRESH_SECONDS``, and older history when a longer window is
+requested than has been stored. Each write goes to a new version directory and
+is published by replacing the ``CURRENT`` pointer file, so readers always see
+one complete version. Writers hold a file lock as well as a thread lock, so
+several server processes can share the store.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .timeseries import DAY_MS, PriceSeries
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized.
+    fcntl = None
+
+HISTORY_STORE_DIR = os.getenv("HISTORY_STORE_DIR", "./storage/history")
+# How old the newest stored point may be before the tail is refreshed.
+HISTORY_REFRESH_SECONDS = float(os.getenv("HISTORY_REFRESH_SECONDS", "300"))
+
+# fetch(start_ms, end_ms) -> PriceSeries covering that range (possibly empty).
+RangeFetcher = Callable[[int, int], PriceSeries]
+
+_COLUMNS = ("timestamps", "prices", "volumes")
+_POINTER = "CURRENT"
+# Versions kept besides the current one, for readers that resolved the pointer just before a swap.
+_KEEP_VERSIONS = 1
+
+
+def _empty() -> PriceSeries:
+    return PriceSeries(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+
+class HistoryStore:
+    def __init__(self, root: str = HISTORY_STORE_DIR, refresh_seconds: float = HISTORY_REFRESH_SECONDS):
+        self.root = root
+        self.refresh_seconds = refresh_seconds
+        self._locks: Dict[Tuple[str, str, int], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._stats = {"local_reads": 0, "tail_fetches": 0, "backfills": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _path(self, source: str, asset: str, interval_ms: int) -> str:
+        safe_asset = re.sub(r"[^a-z0-9._-]", "_", asset.lower())
+        return os.path.join(self.root, source, safe_asset, f"{interval_ms // 1000}s")
+
+    def _lock(self, source: str, asset: str, interval_ms: int) -> threading.Lock:
+        key = (source, asset.lower(), interval_ms)
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def _file_lock(self, path: str) -> Iterator[None]:
+        """Serializes writers of one series across processes (e.g. uvicorn workers)."""
+        os.makedirs(path, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self, source: str, asset: str, interval_ms: int = DAY_MS) -> Tuple[PriceSeries, Dict]:
+        """Returns the stored series (memory-mapped) and its metadata."""
+        path = self._path(source, asset, interval_ms)
+        for _ in range(3):
+            try:
+                with open(os.path.join(path, _POINTER), "r", encoding="utf-8") as file:
+                    version = os.path.join(path, file.read().strip())
+                with open(os.path.join(version, "meta.json"), "r", encoding="utf-8") as file:
+                    meta = json.load(file)
+                columns = [np.load(os.path.join(version, f"{name}.npy"), mmap_mode="r") for name in _COLUMNS]
+            except FileNotFoundError:
+                # No pointer yet, or the version it named was removed after a newer write; look again.
+                if not os.path.exists(os.path.join(path, _POINTER)):
+                    return _empty(), {}
+                continue
+            # Stored arrays are already sorted and de-duplicated.
+            return PriceSeries.from_sorted(*columns), meta
+        return _empty(), {}
+
+    def _write(self, path: str, series: PriceSeries, meta: Dict) -> None:
+        name = f"v{time.time_ns()}-{os.getpid()}"
+        version = os.path.join(path, name)
+        os.makedirs(version)
+        volumes = series.volumes if series.volumes is not None else np.full(len(series), np.nan)
+        for column, values in zip(_COLUMNS, (series.timestamps, series.prices, volumes)):
+            np.save(os.path.join(version, f"{column}.npy"), np.ascontiguousarray(values))
+        with open(os.path.join(version, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+        tmp = os.path.join(path, f"{_POINTER}.tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp, "w", encoding="utf-8") as file:
+            file.write(name)
+        os.replace(tmp, os.path.join(path, _POINTER))
+
+        # Version names sort by creation time; memory maps of removed files stay valid.
+        versions = sorted(entry for entry in os.listdir(path) if entry.startswith("v") and entry != name)
+        for old in versions[: max(0, len(versions) - _KEEP_VERSIONS)]:
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+    @staticmethod
+    def _merge(stored: PriceSeries, new: PriceSeries) -> PriceSeries:
+        """Union on timestamp; new points win over stored ones at the same time."""
+        stored_volumes = stored.volumes if stored.volumes is not None else np.full(len(stored), np.nan)
+        new_volumes = new.volumes if new.volumes is not None else np.full(len(new), np.nan)
+        timestamps = np.concatenate([new.timestamps, stored.timestamps])
+        prices = np.concatenate([new.prices, stored.prices])
+        volumes = np.concatenate([new_volumes, stored_volumes])
+        timestamps, first = np.unique(timestamps, return_index=True)
+        return PriceSeries(timestamps, prices[first], volumes[first])
+
+    def window(
+        self, source: str, asset: str, days: float, fetch: RangeFetcher, interval_ms: int = DAY_MS
+    ) -> PriceSeries:
+        """The last ``days`` of history at ``interval_ms`` spacing, fetching only ranges not yet stored.
+
+        ``interval_ms`` should be no finer than what ``fetch`` returns for a
+        ``days``-long range; finer points are reduced to one per interval.
+        """
+        now_ms = int(time.time() * 1000)
+        start_ms = now_ms - int(days * DAY_MS)
+        path = self._path(source, asset, interval_ms)
+        with self._lock(source, asset, interval_ms), self._file_lock(path):
+            stored, meta = self.load(source, asset, interval_ms)
+            covered_from = meta.get("covered_from_ms")
+            fetched_at = meta.get("fetched_at_ms", 0)
+
+            # Older pieces never overwrite stored buckets, newer ones do (the last bucket is still filling).
+            older = newer = None
+            if not len(stored) or covered_from is None or stored.timestamps[-1] < start_ms:
+                # Nothing stored, or nothing inside the window: start over rather than bridge the gap.
+                stored = _empty()
+                newer = fetch(start_ms, now_ms)
+                covered_from = start_ms
+                self._count("backfills")
+            else:
+                if start_ms < covered_from:
+                    older = fetch(start_ms, covered_from)
+                    covered_from = start_ms
+                    self._count("backfills")
+                if now_ms - fetched_at > self.refresh_seconds * 1000:
+                    newer = fetch(int(stored.timestamps[-1]), now_ms)
+                    self._count("tail_fetches")
+
+            if older is None and newer is None:
+                self._count("local_reads")
+                return stored.since(start_ms)
+
+            merged = stored
+            if older is not None:
+                merged = self._merge(older.at_interval(interval_ms), merged)
+            if newer is not None:
+                merged = self._merge(merged, newer.at_interval(interval_ms))
+            self._write(
+                path,
+                merged,
+                {
+                    "covered_from_ms": covered_from,
+                    "fetched_at_ms": now_ms,
+                    "interval_ms": interval_ms,
+                    "points": len(merged),
+                },
+            )
+            stored, _ = self.load(source, asset, interval_ms)
+
+        return stored.since(start_ms)
+
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
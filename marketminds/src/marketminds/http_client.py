@@ -0,0 +1,339 @@
+"""Process-wide HTTP client layer shared by every data-provider tool.
+
+One ``httpx.Client`` (and one ``httpx.AsyncClient`` per event loop) is kept for
+the whole process so connections to each provider host are pooled and kept
+alive between tool calls instead of paying a new TCP+TLS handshake every time.
+
+Requests to providers with strict quotas go through a token bucket per
+provider, which makes callers wait for a token instead of spending quota on
+"API limit reached" answers. Concurrent identical GETs (same URL and params)
+are coalesced into one upstream call whose response every caller shares.
+"""
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import metrics
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+# HTTP/2 is used when the optional `h2` package is installed, unless disabled.
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and (
+    importlib.util.find_spec("h2") is not None
+)
+
+# Free-tier quotas as (requests, per seconds). Override with RATE_LIMIT_<PROVIDER>="5/60",
+# or "off" to disable one.
+DEFAULT_RATE_LIMITS = {
+    "alpha_vantage": (5, 60),
+    "coingecko": (30, 60),
+    "newsapi": (100, 86400),
+    "fred": (120, 60),
+    "polygon": (5, 60),
+    "twelve_data": (8, 60),
+    "fmp": (250, 86400),
+}
+PROVIDER_HOSTS = {
+    "www.alphavantage.co": "alpha_vantage",
+    "api.coingecko.com": "coingecko",
+    "newsapi.org": "newsapi",
+    "api.stlouisfed.org": "fred",
+    "api.polygon.io": "polygon",
+    "api.twelvedata.com": "twelve_data",
+    "financialmodelingprep.com": "fmp",
+}
+# A request that would have to wait longer than this for a token fails instead.
+HTTP_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("HTTP_RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+HTTP_COALESCE_ENABLED = os.getenv("HTTP_COALESCE_ENABLED", "true").lower() == "true"
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        "timeout": httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "http2": HTTP2_ENABLED,
+        "follow_redirects": True,
+    }
+
+
+def get_client() -> httpx.Client:
+    """Returns the shared synchronous client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        with _lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(**_client_options())
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the shared async client for the running event loop.
+
+    An ``AsyncClient`` cannot be shared across event loops, so one is kept per
+    loop and dropped together with it.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider's token bucket cannot grant a request in time."""
+
+
+class TokenBucket:
+    """Grants ``rate`` requests per ``per`` seconds with bursts up to ``rate``.
+
+    Callers reserve a token up front, possibly driving the balance negative, and
+    then sleep until their token is due, so waiting requests are served in
+    arrival order without holding the lock while they wait.
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.capacity = float(rate)
+        self.refill_per_second = rate / per
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float, cost: float = 1.0) -> float:
+        """Returns how long to wait for ``cost`` tokens, or raises if that exceeds ``max_wait``."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.refill_per_second)
+            self._updated_at = now
+            wait = max(0.0, (cost - self._tokens) / self.refill_per_second)
+            if wait > max_wait:
+                raise RateLimitExceeded(f"rate limit reached, next request allowed in {wait:.1f}s")
+            self._tokens -= cost
+            return wait
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            elapsed = time.monotonic() - self._updated_at
+            return min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+
+
+def _rate_limits() -> Dict[str, Tuple[int, float]]:
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for provider in limits:
+        override = os.getenv(f"RATE_LIMIT_{provider.upper()}")
+        if override:
+            if override.lower() in ("off", "0", "none"):
+                limits[provider] = None
+            else:
+                count, _, seconds = override.partition("/")
+                limits[provider] = (int(count), float(seconds or 60))
+    return {provider: limit for provider, limit in limits.items() if limit}
+
+
+_buckets: Dict[str, TokenBucket] = {
+    provider: TokenBucket(*limit) for provider, limit in _rate_limits().items()
+}
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _count(name: str, amount: float = 1) -> None:
+    with _counters_lock:
+        _counters[name] += amount
+
+
+def _provider(url: str) -> Optional[str]:
+    return PROVIDER_HOSTS.get(urlsplit(url).hostname or "")
+
+
+def _reserve(provider: Optional[str], cost: float = 1.0) -> float:
+    """Takes ``cost`` tokens for ``provider``; returns the seconds to wait before sending."""
+    bucket = _buckets.get(provider)
+    if bucket is None:
+        return 0.0
+    try:
+        wait = bucket.reserve(HTTP_RATE_LIMIT_MAX_WAIT_SECONDS, cost)
+    except RateLimitExceeded as e:
+        _count("rate_limit_rejected")
+        raise RateLimitExceeded(f"{provider} {e}") from None
+    if wait > 0:
+        _count("rate_limit_waits")
+        _count("rate_limit_wait_seconds", wait)
+        metrics.observe("rate_limit_wait", provider, wait)
+    return wait
+
+
+def spare_tokens(provider: str) -> Optional[float]:
+    """Tokens ``provider`` could spend right now without waiting; None if it is not rate-limited."""
+    bucket = _buckets.get(provider)
+    return None if bucket is None else bucket.tokens
+
+
+def _request_key(url: str, params: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> Tuple:
+    items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None))
+    return url, items, repr(sorted(kwargs.items()))
+
+
+_inflight: Dict[Tuple, Future] = {}
+_inflight_lock = threading.Lock()
+_async_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, asyncio.Task]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _single_flight(key: Tuple, call: Callable[[], httpx.Response]) -> httpx.Response:
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        _count("coalesced")
+        return future.result()
+    try:
+        response = call()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(response)
+        return response
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _checked(provider: str, response: httpx.Response) -> httpx.Response:
+    metrics.count_response(provider, response.status_code)
+    response.raise_for_status()
+    return response
+
+
+def _send(url: str, params: Optional[Dict[str, Any]], kwargs: Dict[str, Any], cost: float = 1.0) -> httpx.Response:
+    provider = _provider(url)
+    wait = _reserve(provider, cost)
+    if wait:
+        time.sleep(wait)
+    _count("requests")
+    provider = provider or "other"
+    with metrics.span("http", provider):
+        try:
+            response = get_client().get(url, params=params, **kwargs)
+        except httpx.HTTPError:
+            metrics.count_response(provider, "error")
+            raise
+        return _checked(provider, response)
+
+
+async def _asend(url: str, params: Optional[Dict[str, Any]], kwargs: Dict[str, Any], cost: float = 1.0) -> httpx.Response:
+    provider = _provider(url)
+    wait = _reserve(provider, cost)
+    if wait:
+        await asyncio.sleep(wait)
+    _count("requests")
+    provider = provider or "other"
+    with metrics.span("http", provider):
+        try:
+            response = await get_async_client().get(url, params=params, **kwargs)
+        except httpx.HTTPError:
+            metrics.count_response(provider, "error")
+            raise
+        return _checked(provider, response)
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, *, cost: float = 1.0, **kwargs) -> httpx.Response:
+    """GETs a URL on the shared client and raises for non-2xx responses.
+
+    Identical concurrent calls share one request and its response. ``cost`` is
+    the number of rate-limit tokens the call spends, for endpoints that bill
+    per symbol rather than per request.
+    """
+    if not HTTP_COALESCE_ENABLED:
+        return _send(url, params, kwargs, cost)
+    return _single_flight(_request_key(url, params, kwargs), lambda: _send(url, params, kwargs, cost))
+
+
+async def aget(url: str, params: Optional[Dict[str, Any]] = None, *, cost: float = 1.0, **kwargs) -> httpx.Response:
+    """Async counterpart of ``get``."""
+    if not HTTP_COALESCE_ENABLED:
+        return await _asend(url, params, kwargs, cost)
+    inflight = _async_inflight.setdefault(asyncio.get_running_loop(), {})
+    key = _request_key(url, params, kwargs)
+    task = inflight.get(key)
+    if task is None:
+        # The request runs as its own task, so one caller being cancelled
+        # does not cancel it for the others.
+        task = asyncio.ensure_future(_asend(url, params, kwargs, cost))
+        inflight[key] = task
+
+        def finished(done: asyncio.Task) -> None:
+            inflight.pop(key, None)
+            if not done.cancelled():
+                done.exception()  # retrieved here in case every caller was cancelled
+
+        task.add_done_callback(finished)
+    else:
+        _count("coalesced")
+    return await asyncio.shield(task)
+
+
+def post(url: str, json: Any = None, **kwargs) -> httpx.Response:
+    """POSTs JSON on the shared client and raises for non-2xx responses."""
+    response = get_client().post(url, json=json, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+async def apost(url: str, json: Any = None, **kwargs) -> httpx.Response:
+    """Async counterpart of ``post``."""
+    response = await get_async_client().post(url, json=json, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+def stats() -> Dict[str, Any]:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        **counters,
+        "buckets": {provider: round(bucket.tokens, 2) for provider, bucket in _buckets.items()},
+    }
+
+
+def close() -> None:
+    """Closes the shared sync client; the next call opens a fresh one."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose() -> None:
+    """Closes the async client bound to the running event loop."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
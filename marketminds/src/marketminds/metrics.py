@@ -0,0 +1,242 @@
+"""Latency metrics for the chat pipeline, exported for Prometheus.
+
+``span`` times a stage of a request (routing, entity extraction, answering,
+a crew task, an LLM call, a tool call or a provider HTTP request). Each stage
+is recorded in one ``marketminds_stage_duration_seconds`` histogram, labelled
+by stage, a name (router, task, model, tool or provider), the request's route
+and the outcome. ``current_route`` is set once a request has been routed, so
+the stages under it are tagged without passing the route around. Crew tasks
+and LLM calls are timed from the crewai event bus. Database pool checkout
+waits, checked-out connections and saturation are exported per pool as well.
+
+With ``METRICS_OTEL_ENABLED`` every span is also sent as an OpenTelemetry span
+to the OTLP endpoint configured with the standard ``OTEL_EXPORTER_OTLP_*``
+variables. That needs the ``otel`` extra (``pip install .[otel]``).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+from crewai.events import (
+    LLMCallCompletedEvent,
+    LLMCallFailedEvent,
+    LLMCallStartedEvent,
+    TaskCompletedEvent,
+    TaskFailedEvent,
+    TaskStartedEvent,
+    crewai_event_bus,
+)
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_OTEL_ENABLED = os.getenv("METRICS_OTEL_ENABLED", "false").lower() == "true"
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+current_route: ContextVar[str] = ContextVar("marketminds_route", default="none")
+
+STAGE_SECONDS = Histogram(
+    "marketminds_stage_duration_seconds",
+    "Time spent in each stage of a chat request.",
+    ["stage", "name", "route", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+PROVIDER_RESPONSES = Counter(
+    "marketminds_provider_responses_total",
+    "Responses from data providers, by HTTP status ('error' when no response arrived).",
+    ["provider", "status"],
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "marketminds_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection, by pool; outcome is 'timeout' when none came.",
+    ["pool", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "marketminds_db_pool_checked_out",
+    "Database connections currently checked out, by pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_SATURATION = Gauge(
+    "marketminds_db_pool_saturation",
+    "Checked-out connections as a fraction of pool size plus overflow, by pool.",
+    ["pool"],
+    multiprocess_mode="livemax",
+)
+
+
+def _tracer():
+    if not METRICS_OTEL_ENABLED:
+        return None
+    # Imported only when enabled: OpenTelemetry is an optional dependency (see pyproject).
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    # A provider of our own, so crewai's telemetry settings do not affect it.
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "marketminds")}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    return provider.get_tracer("marketminds")
+
+
+tracer = _tracer()
+
+
+def observe(stage: str, name: str, seconds: float, outcome: str = "ok", route: Optional[str] = None) -> None:
+    if METRICS_ENABLED:
+        STAGE_SECONDS.labels(stage, name or "", route or current_route.get(), outcome).observe(seconds)
+
+
+@contextmanager
+def span(stage: str, name: str = "", **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Times the block as ``stage``; the yielded dict can set ``name`` and ``route`` once known.
+
+    The outcome is "error" when the block raises.
+    """
+    labels: Dict[str, Any] = {"name": name}
+    if not METRICS_ENABLED:
+        yield labels
+        return
+    otel = None
+    if tracer is not None:
+        otel = tracer.start_span(f"{stage} {name}".strip(), attributes={"route": current_route.get(), **attributes})
+    outcome = "ok"
+    started = time.perf_counter()
+    try:
+        if otel is None:
+            yield labels
+        else:
+            from opentelemetry import trace
+
+            with trace.use_span(otel, end_on_exit=False):
+                yield labels
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        observe(stage, labels["name"], time.perf_counter() - started, outcome, labels.get("route"))
+        if otel is not None:
+            otel.update_name(f"{stage} {labels['name']}".strip())
+            otel.set_attribute("outcome", outcome)
+            if labels.get("route"):
+                otel.set_attribute("route", labels["route"])
+            otel.end()
+
+
+@contextmanager
+def routed(route: str) -> Iterator[None]:
+    """Tags the spans inside the block with ``route``."""
+    token = current_route.set(route)
+    try:
+        yield
+    finally:
+        current_route.reset(token)
+
+
+def count_response(provider: str, status: Any) -> None:
+    if METRICS_ENABLED:
+        PROVIDER_RESPONSES.labels(provider, str(status)).inc()
+
+
+def observe_pool_checkout(pool: str, seconds: float, timed_out: bool = False) -> None:
+    if METRICS_ENABLED:
+        DB_POOL_WAIT_SECONDS.labels(pool, "timeout" if timed_out else "ok").observe(seconds)
+
+
+def set_pool_usage(pool: str, checked_out: int, capacity: int) -> None:
+    if METRICS_ENABLED:
+        DB_POOL_CHECKED_OUT.labels(pool).set(checked_out)
+        DB_POOL_SATURATION.labels(pool).set(checked_out / capacity if capacity else 0.0)
+
+
+class _OpenSpans:
+    """Spans started and finished by separate crewai events, keyed by the caller."""
+
+    def __init__(self, limit: int = 1000):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._spans: "OrderedDict[Hashable, Tuple[str, str, str, float, Any]]" = OrderedDict()
+
+    def start(self, key: Hashable, stage: str, name: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        route = current_route.get()
+        otel = tracer.start_span(f"{stage} {name}", attributes={"route": route}) if tracer is not None else None
+        with self._lock:
+            self._spans[key] = (stage, name, route, time.perf_counter(), otel)
+            # A start whose finish event never came should not be kept forever.
+            while len(self._spans) > self.limit:
+                self._spans.popitem(last=False)
+
+    def finish(self, key: Hashable, outcome: str) -> None:
+        with self._lock:
+            entry = self._spans.pop(key, None)
+        if entry is None:
+            return
+        stage, name, route, started, otel = entry
+        observe(stage, name, time.perf_counter() - started, outcome, route)
+        if otel is not None:
+            otel.set_attribute("outcome", outcome)
+            otel.end()
+
+
+_open_spans = _OpenSpans()
+
+
+def _task_key(event) -> Tuple:
+    return ("task", id(event.task))
+
+
+def _llm_key(event) -> Tuple:
+    return ("llm", event.agent_id, threading.get_ident())
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _on_task_started(source, event):
+    _open_spans.start(_task_key(event), "task", getattr(event.task, "name", None) or "task")
+
+
+@crewai_event_bus.on(TaskCompletedEvent)
+def _on_task_completed(source, event):
+    _open_spans.finish(_task_key(event), "ok")
+
+
+@crewai_event_bus.on(TaskFailedEvent)
+def _on_task_failed(source, event):
+    _open_spans.finish(_task_key(event), "error")
+
+
+@crewai_event_bus.on(LLMCallStartedEvent)
+def _on_llm_call_started(source, event):
+    _open_spans.start(_llm_key(event), "llm", event.model or "unknown")
+
+
+@crewai_event_bus.on(LLMCallCompletedEvent)
+def _on_llm_call_completed(source, event):
+    _open_spans.finish(_llm_key(event), "ok")
+
+
+@crewai_event_bus.on(LLMCallFailedEvent)
+def _on_llm_call_failed(source, event):
+    _open_spans.finish(_llm_key(event), "error")
+
+
+def render() -> bytes:
+    """The metrics in the Prometheus text format.
+
+    Under several worker processes (``PROMETHEUS_MULTIPROC_DIR`` set) the
+    values of all of them are merged.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
@@ -0,0 +1,223 @@
+"""Transactional outbox for webhook notifications.
+
+Signup writes an ``OutboxEventDB`` row with ``enqueue`` before committing the
+new user, so the event exists exactly when the user does. ``OutboxDispatcher``
+runs in the background and POSTs due events to the webhook for their type.
+Each event is sent as its own payload (``{"email": ...}`` for a signup), as the
+n8n workflows expect. With ``OUTBOX_WEBHOOK_BATCHING=true`` it instead waits a
+moment so a burst of signups shares a request, sent as ``{"events": [...]}``.
+Events are only written while their webhook URL is set. Failed deliveries are retried with exponential backoff and jitter, and an event
+is dead-lettered after ``OUTBOX_MAX_ATTEMPTS`` tries.
+
+Several server processes can dispatch the same table: on Postgres each batch is
+claimed with ``FOR UPDATE SKIP LOCKED`` in a short transaction that counts the
+attempt and moves ``next_attempt_at`` ``OUTBOX_CLAIM_SECONDS`` ahead. The POST
+then runs with no transaction or pooled connection held, and its outcome is
+written in a second transaction. Events of a process that dies mid-delivery
+become due again once the claim runs out.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import http_client
+from .database import AsyncSessionLocal, OutboxEventDB
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "5"))
+# With batching, how long to wait after a new event for others to join its batch.
+OUTBOX_LINGER_SECONDS = float(os.getenv("OUTBOX_LINGER_SECONDS", "0.5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "2"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "600"))
+OUTBOX_WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_WEBHOOK_TIMEOUT_SECONDS", "10"))
+# Send due events as one {"events": [...]} request instead of one request per event.
+# The receiving workflow must read the list; see "Automation with n8n" in the README.
+OUTBOX_WEBHOOK_BATCHING = os.getenv("OUTBOX_WEBHOOK_BATCHING", "false").lower() == "true"
+# How long claimed events stay invisible to other dispatchers; keep it well above the webhook timeout.
+OUTBOX_CLAIM_SECONDS = float(os.getenv("OUTBOX_CLAIM_SECONDS", "60"))
+
+USER_SIGNUP = "user.signup"
+
+# Environment variable holding the webhook URL for each event type.
+WEBHOOK_URL_ENV = {
+    USER_SIGNUP: "N8N_ONBOARDING_WEBHOOK_URL",
+}
+
+
+def enqueue(db, event_type: str, payload: Dict[str, Any]) -> Optional[OutboxEventDB]:
+    """Adds an event to ``db``'s transaction; it is stored only if the caller commits.
+
+    Nothing is written while the event type has no webhook URL, so a
+    deployment without one does not accumulate undeliverable events.
+    """
+    if not os.getenv(WEBHOOK_URL_ENV[event_type]):
+        return None
+    event = OutboxEventDB(event_type=event_type, payload=json.dumps(payload))
+    db.add(event)
+    return event
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter for the ``attempts``-th failure."""
+    ceiling = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class OutboxDispatcher:
+    def __init__(self):
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._warned_unconfigured = set()
+        self.counters = Counter()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self) -> None:
+        """Tells the dispatcher new events were committed."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL_SECONDS)
+                if OUTBOX_WEBHOOK_BATCHING:
+                    await asyncio.sleep(OUTBOX_LINGER_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Keep going while full batches come back.
+                while await self.dispatch_once() >= OUTBOX_BATCH_SIZE:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ERROR: Outbox dispatch failed: {e}")
+
+    async def dispatch_once(self) -> int:
+        """Delivers one batch of due events per event type; returns how many were handled."""
+        handled = 0
+        async with AsyncSessionLocal() as db:
+            for event_type, url_env in WEBHOOK_URL_ENV.items():
+                webhook_url = os.getenv(url_env)
+                if not webhook_url:
+                    if event_type not in self._warned_unconfigured:
+                        print(f"WARNING: {url_env} not set; keeping '{event_type}' events in the outbox.")
+                        self._warned_unconfigured.add(event_type)
+                    continue
+                handled += await self._dispatch_type(db, event_type, webhook_url)
+        return handled
+
+    async def _dispatch_type(self, db: AsyncSession, event_type: str, webhook_url: str) -> int:
+        events = await self._claim(db, event_type)
+        if not events:
+            return 0
+
+        if OUTBOX_WEBHOOK_BATCHING:
+            body = {
+                "events": [
+                    {
+                        "id": event.id,
+                        "type": event.event_type,
+                        "created_at": event.created_at.isoformat() if event.created_at else None,
+                        **json.loads(event.payload),
+                    }
+                    for event in events
+                ]
+            }
+            deliveries = [(events, body)]
+        else:
+            deliveries = [([event], json.loads(event.payload)) for event in events]
+        await asyncio.gather(
+            *(self._deliver(event_type, webhook_url, batch, body) for batch, body in deliveries)
+        )
+        await db.commit()
+        return len(events)
+
+    async def _deliver(
+        self, event_type: str, webhook_url: str, events: List[OutboxEventDB], body: Dict[str, Any]
+    ) -> None:
+        try:
+            await http_client.apost(webhook_url, json=body, timeout=OUTBOX_WEBHOOK_TIMEOUT_SECONDS)
+        except Exception as e:
+            self._record_failure(events, e)
+        else:
+            delivered_at = datetime.now(timezone.utc)
+            for event in events:
+                event.status = "delivered"
+                event.delivered_at = delivered_at
+            self.counters["delivered"] += len(events)
+            self.counters["batches"] += 1
+            print(f"INFO: Delivered {len(events)} '{event_type}' event(s) to webhook.")
+
+    async def _claim(self, db: AsyncSession, event_type: str) -> List[OutboxEventDB]:
+        """Takes a batch of due events for this process and commits, releasing the row locks."""
+        now = time.time()
+        events: List[OutboxEventDB] = list(
+            (
+                await db.execute(
+                    select(OutboxEventDB)
+                    .where(
+                        OutboxEventDB.event_type == event_type,
+                        OutboxEventDB.status == "pending",
+                        OutboxEventDB.next_attempt_at <= now,
+                    )
+                    .order_by(OutboxEventDB.id)
+                    .limit(OUTBOX_BATCH_SIZE)
+                    .with_for_update(skip_locked=True)
+                )
+            ).scalars()
+        )
+        for event in events:
+            # Counted up front, so an event that keeps killing its dispatcher is still dead-lettered.
+            event.attempts += 1
+            event.next_attempt_at = now + OUTBOX_CLAIM_SECONDS
+        await db.commit()
+        return events
+
+    def _record_failure(self, events: List[OutboxEventDB], error: Exception) -> None:
+        self.counters["failed_batches"] += 1
+        for event in events:
+            event.last_error = str(error)[:1000]
+            if event.attempts >= OUTBOX_MAX_ATTEMPTS:
+                event.status = "dead"
+                self.counters["dead_lettered"] += 1
+            else:
+                event.next_attempt_at = time.time() + backoff_seconds(event.attempts)
+        print(
+            f"ERROR: Failed to deliver {len(events)} outbox event(s) "
+            f"(attempt {events[0].attempts}): {error}"
+        )
+
+    async def stats(self) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(
+                select(OutboxEventDB.status, func.count()).group_by(OutboxEventDB.status)
+            )
+            by_status = {status: count for status, count in rows}
+        return {"events": by_status, **self.counters}
+
+
+outbox_dispatcher = OutboxDispatcher()
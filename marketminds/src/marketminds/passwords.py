@@ -0,0 +1,94 @@
+"""Argon2 password hashing, run off the event loop.
+
+Argon2 is deliberately slow and memory-hungry, so async endpoints use
+``ahash_password`` and ``averify_and_update``. They run the work on a small
+process pool and admit at most ``PASSWORD_HASH_CONCURRENCY`` jobs at once;
+further logins wait their turn instead of piling onto the pool. Worker
+processes import only this module, which is why it must not import the
+database or crew modules.
+
+Cost parameters come from ``ARGON2_*``. Stored hashes made with other
+parameters still verify, and ``averify_and_update`` returns a fresh hash for
+them so the login can replace the stored one.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+# 0 runs password work inline on the calling thread (the old behaviour).
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(max(1, PASSWORD_HASH_WORKERS))))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash); new_hash is set when the stored hash is outdated."""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_semaphores = {}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # forkserver keeps the server's threads and memory out of the workers.
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+    return _pool
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+    return semaphore
+
+
+async def _run(fn, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    async with _get_semaphore():
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+
+
+async def ahash_password(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def averify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update, password, hashed_password)
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,349 @@
+"""Pre-warms provider caches for the most requested entities.
+
+``popularity`` counts the tickers, coins and market symbols that the router and
+the entity extractor resolve, with counts fading over
+``PREWARM_POPULARITY_HALF_LIFE_HOURS``. ``PrewarmScheduler`` runs in the
+background. At the start of each window in ``PREWARM_WINDOWS`` (local times in
+``PREWARM_TIMEZONE``, e.g. the half hour before the US open) it refreshes news,
+fundamentals, history and quotes for the top ``PREWARM_TOP_N`` entities. For
+the rest of the window it keeps only their quotes fresh, since quotes expire
+within a minute.
+
+Everything goes through the agents' own tools, so the warmed entries are the
+ones a chat request looks up: the quote cache, the fundamentals store and the
+history store.
+
+Under several worker processes only the one holding the ``PREWARM_LOCK_PATH``
+file lock runs the schedule, so the providers see one warm-up, not one per
+worker. It ranks entities by the requests it served itself, and only its own
+in-memory quote cache is warmed; the fundamentals and history stores are shared
+by all workers. Full warm-ups, scheduled or requested through the API, are at
+least ``PREWARM_MIN_FULL_INTERVAL_SECONDS`` apart in each process.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker runs its own schedule.
+    fcntl = None
+
+from .batch_quotes import CRYPTO, MARKET, STOCK
+from .tools.crypto_economic_tools import CryptoHistoricalTool, CryptoQuoteTool
+from .tools.custom_tool import NewsSearchTool
+from .tools.market_data_tools import MarketQuoteTool
+from .tools.stock_analysis_tools import StockDataTool, StockHistoricalTool, YFinanceTool
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "25"))
+# Comma-separated HH:MM-HH:MM windows in PREWARM_TIMEZONE.
+PREWARM_WINDOWS = os.getenv("PREWARM_WINDOWS", "09:25-09:45")
+PREWARM_TIMEZONE = os.getenv("PREWARM_TIMEZONE", "America/New_York")
+PREWARM_WEEKDAYS_ONLY = os.getenv("PREWARM_WEEKDAYS_ONLY", "true").lower() == "true"
+PREWARM_QUOTE_INTERVAL_SECONDS = float(os.getenv("PREWARM_QUOTE_INTERVAL_SECONDS", "45"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "4"))
+PREWARM_HISTORY_DAYS = int(os.getenv("PREWARM_HISTORY_DAYS", "30"))
+PREWARM_HISTORY_MAX_DAYS = int(os.getenv("PREWARM_HISTORY_MAX_DAYS", "365"))
+PREWARM_POPULARITY_HALF_LIFE_HOURS = float(os.getenv("PREWARM_POPULARITY_HALF_LIFE_HOURS", "72"))
+PREWARM_MAX_TRACKED = int(os.getenv("PREWARM_MAX_TRACKED", "2000"))
+PREWARM_LOCK_PATH = os.getenv("PREWARM_LOCK_PATH", "./storage/prewarm.lock")
+# How often a worker that is not running the schedule checks whether it can take over.
+PREWARM_LEADER_RETRY_SECONDS = float(os.getenv("PREWARM_LEADER_RETRY_SECONDS", "60"))
+PREWARM_MIN_FULL_INTERVAL_SECONDS = float(os.getenv("PREWARM_MIN_FULL_INTERVAL_SECONDS", "600"))
+
+# Extractor placeholders for "no such entity in this question".
+_MISSING = {"", "n/a", "na", "none", "null", "unknown", "not specified"}
+
+
+def _clean(value: Any) -> Optional[str]:
+    if not isinstance(value, str) or value.strip().lower() in _MISSING:
+        return None
+    return value.strip()
+
+
+@dataclass
+class Entity:
+    kind: str  # STOCK, CRYPTO or MARKET
+    symbol: str  # ticker, CoinGecko id or market symbol
+    label: Optional[str] = None  # company or coin name, used as the news query
+    days: Optional[int] = None  # longest history window asked for
+    score: float = 0.0
+
+
+class PopularityTracker:
+    """Request counts per entity with exponential decay.
+
+    Instead of decaying every count over time, each new request is weighted by
+    ``2 ** (age / half_life)`` against a fixed epoch, so newer requests weigh
+    more and the counts can be compared as they are.
+    """
+
+    def __init__(
+        self,
+        half_life_hours: float = PREWARM_POPULARITY_HALF_LIFE_HOURS,
+        max_tracked: int = PREWARM_MAX_TRACKED,
+    ):
+        self.half_life = half_life_hours * 3600
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._epoch = time.time()
+        self._entities: Dict[Tuple[str, str], Entity] = {}
+
+    def _weight(self, now: float) -> float:
+        exponent = (now - self._epoch) / self.half_life
+        if exponent > 64:
+            # Rebase before the weights overflow; relative scores are unchanged.
+            scale = 2.0 ** -exponent
+            for entity in self._entities.values():
+                entity.score *= scale
+            self._epoch = now
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def _add(self, kind: str, symbol: str, label: Optional[str], days: Optional[int], weight: float) -> None:
+        entity = self._entities.get((kind, symbol))
+        if entity is None:
+            entity = self._entities[(kind, symbol)] = Entity(kind, symbol)
+        entity.score += weight
+        entity.label = label or entity.label
+        if days:
+            entity.days = max(entity.days or 0, min(days, PREWARM_HISTORY_MAX_DAYS))
+
+    def record(self, entities: Optional[Dict[str, Any]]) -> None:
+        """Counts the entities from one routed or extracted request."""
+        if not entities:
+            return
+        days = entities.get("days") if isinstance(entities.get("days"), int) else None
+        found = []
+        ticker = _clean(entities.get("company_ticker"))
+        if ticker:
+            found.append((STOCK, ticker.upper(), _clean(entities.get("company")), days))
+        coin = _clean(entities.get("coin_id")) or _clean(entities.get("crypto_name"))
+        if coin:
+            found.append((CRYPTO, coin.lower(), _clean(entities.get("crypto_name")), days))
+        market = _clean(entities.get("market_symbol"))
+        if market:
+            found.append((MARKET, market.upper(), None, None))
+        if not found:
+            return
+        with self._lock:
+            weight = self._weight(time.time())
+            for kind, symbol, label, entity_days in found:
+                self._add(kind, symbol, label, entity_days, weight)
+            if len(self._entities) > self.max_tracked:
+                ranked = sorted(self._entities.items(), key=lambda item: item[1].score, reverse=True)
+                self._entities = dict(ranked[: self.max_tracked])
+
+    def top(self, n: int = PREWARM_TOP_N) -> List[Entity]:
+        """The ``n`` most requested entities; ``score`` is their decayed request count."""
+        with self._lock:
+            ranked = sorted(self._entities.values(), key=lambda entity: entity.score, reverse=True)
+            scale = 2.0 ** -((time.time() - self._epoch) / self.half_life)
+            return [Entity(**{**vars(entity), "score": entity.score * scale}) for entity in ranked[:n]]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entities)
+
+
+def parse_windows(spec: str) -> List[Tuple[dt_time, dt_time]]:
+    """'09:15-09:45,15:30-16:00' -> [(start, end), ...]; bad entries are skipped with a warning."""
+    windows = []
+    for part in filter(None, (item.strip() for item in spec.split(","))):
+        try:
+            start, end = (dt_time.fromisoformat(value.strip()) for value in part.split("-"))
+        except ValueError:
+            print(f"WARNING: Ignoring malformed pre-warm window '{part}'.")
+            continue
+        windows.append((start, end))
+    return windows
+
+
+def _warm_calls(entity: Entity, full: bool) -> List[Tuple[str, Any, Dict[str, Any]]]:
+    """(kind of data, tool, arguments) for each cache ``entity`` should have filled."""
+    days = entity.days or PREWARM_HISTORY_DAYS
+    calls = []
+    if entity.kind == STOCK:
+        calls.append(("quotes", StockDataTool(), {"ticker": entity.symbol}))
+        if full:
+            calls.append(("fundamentals", YFinanceTool(), {"ticker": entity.symbol}))
+            calls.append(("history", StockHistoricalTool(), {"ticker": entity.symbol, "days": days}))
+    elif entity.kind == CRYPTO:
+        calls.append(("quotes", CryptoQuoteTool(), {"coin_name": entity.label or entity.symbol}))
+        if full:
+            calls.append(("history", CryptoHistoricalTool(), {"coin_id": entity.symbol, "days": days}))
+    else:
+        calls.append(("quotes", MarketQuoteTool(), {"symbol": entity.symbol}))
+    if full and entity.label and os.getenv("NEWS_API_KEY"):
+        calls.append(("news", NewsSearchTool(), {"search_query": entity.label}))
+    return calls
+
+
+class PrewarmScheduler:
+    def __init__(self, tracker: PopularityTracker, windows: List[Tuple[dt_time, dt_time]], timezone: str):
+        self.tracker = tracker
+        self.windows = windows
+        self.timezone = ZoneInfo(timezone)
+        self._task: Optional[asyncio.Task] = None
+        self.counters = Counter()
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.leader = False
+        self._lock_file = None
+        self._last_full_started: Optional[float] = None
+
+    def start(self) -> None:
+        if self._task is None and self.windows:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_file is not None:
+            # Closing the file releases the lock for another worker.
+            self._lock_file.close()
+            self._lock_file = None
+            self.leader = False
+
+    def _acquire_leadership(self) -> bool:
+        """Takes the cross-process lock without waiting; True if this worker now runs the schedule."""
+        if fcntl is None:
+            return True
+        lock_dir = os.path.dirname(PREWARM_LOCK_PATH)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        lock_file = open(PREWARM_LOCK_PATH, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _active_day(self, day: datetime) -> bool:
+        return not PREWARM_WEEKDAYS_ONLY or day.weekday() < 5
+
+    def current_window(self, now: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """The window ``now`` falls in, as (start, end) datetimes, or None."""
+        if not self._active_day(now):
+            return None
+        for start, end in self.windows:
+            start_at = datetime.combine(now.date(), start, tzinfo=self.timezone)
+            end_at = datetime.combine(now.date(), end, tzinfo=self.timezone)
+            if start_at <= now < end_at:
+                return start_at, end_at
+        return None
+
+    def next_window_start(self, now: datetime) -> Optional[datetime]:
+        for offset in range(8):
+            day = (now + timedelta(days=offset)).date()
+            if not self._active_day(datetime.combine(day, dt_time(), tzinfo=self.timezone)):
+                continue
+            starts = sorted(
+                datetime.combine(day, start, tzinfo=self.timezone) for start, _ in self.windows
+            )
+            for start_at in starts:
+                if start_at > now:
+                    return start_at
+        return None
+
+    async def _run(self) -> None:
+        while not self._acquire_leadership():
+            await asyncio.sleep(PREWARM_LEADER_RETRY_SECONDS)
+        self.leader = True
+        print(f"INFO: This worker (pid {os.getpid()}) runs the cache pre-warm schedule.")
+        warmed_window = None
+        while True:
+            now = datetime.now(self.timezone)
+            window = self.current_window(now)
+            if window is None:
+                next_start = self.next_window_start(now)
+                if next_start is None:
+                    return
+                await asyncio.sleep(max(1.0, (next_start - now).total_seconds()))
+                continue
+            try:
+                # The first run of a window refreshes everything, later ones only quotes.
+                await self.warm(full=window != warmed_window)
+                warmed_window = window
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ERROR: Cache pre-warm failed: {e}")
+            await asyncio.sleep(PREWARM_QUOTE_INTERVAL_SECONDS)
+
+    def seconds_until_full_warm(self) -> float:
+        """How long until another full warm-up is allowed; 0 if it is allowed now."""
+        if self._last_full_started is None:
+            return 0.0
+        return max(0.0, self._last_full_started + PREWARM_MIN_FULL_INTERVAL_SECONDS - time.monotonic())
+
+    async def warm(self, full: bool = True, top_n: int = PREWARM_TOP_N) -> Dict[str, Any]:
+        """Refreshes the caches for the ``top_n`` most popular entities now."""
+        if full:
+            self._last_full_started = time.monotonic()
+        entities = self.tracker.top(top_n)
+        semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        outcomes = Counter()
+
+        async def call(kind: str, tool, kwargs: Dict[str, Any]) -> None:
+            async with semaphore:
+                try:
+                    await tool._cached_afetch(**kwargs)
+                except Exception as e:
+                    outcomes[f"{kind}_failed"] += 1
+                    print(f"WARNING: Pre-warming {kind} with {tool.name} {kwargs} failed: {e}")
+                else:
+                    outcomes[kind] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(call(kind, tool, kwargs) for entity in entities for kind, tool, kwargs in _warm_calls(entity, full))
+        )
+        self.counters["full_runs" if full else "quote_runs"] += 1
+        self.counters.update(outcomes)
+        self.last_run = {
+            "at": datetime.now(self.timezone).isoformat(),
+            "full": full,
+            "entities": [f"{entity.kind}:{entity.symbol}" for entity in entities],
+            "calls": dict(outcomes),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if full:
+            print(f"INFO: Pre-warmed caches for {len(entities)} entities in {self.last_run['seconds']}s.")
+        return self.last_run
+
+    def stats(self) -> Dict[str, Any]:
+        now = datetime.now(self.timezone)
+        next_start = self.next_window_start(now)
+        return {
+            "enabled": self._task is not None,
+            "leader": self.leader,
+            "tracked_entities": len(self.tracker),
+            "top": [
+                {"kind": entity.kind, "symbol": entity.symbol, "score": round(entity.score, 3)}
+                for entity in self.tracker.top(PREWARM_TOP_N)
+            ],
+            "in_window": self.current_window(now) is not None,
+            "next_window_start": next_start.isoformat() if next_start else None,
+            "last_run": self.last_run,
+            "counters": dict(self.counters),
+        }
+
+
+popularity = PopularityTracker()
+prewarm_scheduler = PrewarmScheduler(
+    popularity, parse_windows(PREWARM_WINDOWS) if PREWARM_ENABLED else [], PREWARM_TIMEZONE
+)
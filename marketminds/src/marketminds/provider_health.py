@@ -0,0 +1,152 @@
+"""Per-provider health used to order and skip data providers.
+
+Each provider gets an EWMA of its call latency and error rate and a circuit
+breaker. After ``PROVIDER_BREAKER_FAILURES`` consecutive failures the breaker
+opens and the provider is skipped for ``PROVIDER_BREAKER_COOLDOWN_SECONDS``;
+then a single trial call is let through, and its outcome closes or re-opens
+the breaker.
+
+``order`` ranks providers by expected cost: EWMA latency plus a penalty per
+unit of error rate, plus a small bias per position in the configured order so
+the preferred provider keeps first place unless it is clearly worse. The error
+rate fades with ``PROVIDER_ERROR_HALF_LIFE_SECONDS`` while a provider is not
+called, so one that was demoted gets tried first again once it has had time to
+recover.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+PROVIDER_EWMA_ALPHA = float(os.getenv("PROVIDER_EWMA_ALPHA", "0.2"))
+PROVIDER_BREAKER_FAILURES = int(os.getenv("PROVIDER_BREAKER_FAILURES", "3"))
+PROVIDER_BREAKER_COOLDOWN_SECONDS = float(os.getenv("PROVIDER_BREAKER_COOLDOWN_SECONDS", "30"))
+# Latency assumed for a provider that has not been called yet.
+PROVIDER_LATENCY_PRIOR_SECONDS = float(os.getenv("PROVIDER_LATENCY_PRIOR_SECONDS", "1.0"))
+PROVIDER_ERROR_PENALTY_SECONDS = float(os.getenv("PROVIDER_ERROR_PENALTY_SECONDS", "5.0"))
+PROVIDER_ORDER_BIAS_SECONDS = float(os.getenv("PROVIDER_ORDER_BIAS_SECONDS", "0.25"))
+PROVIDER_ERROR_HALF_LIFE_SECONDS = float(os.getenv("PROVIDER_ERROR_HALF_LIFE_SECONDS", "60"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.latency: Optional[float] = None  # EWMA, seconds
+        self.error_rate = 0.0  # EWMA of 0/1 outcomes
+        self.updated_at = time.monotonic()
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; reserves the trial call of a half-open breaker."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= PROVIDER_BREAKER_COOLDOWN_SECONDS:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def _decayed_error_rate(self) -> float:
+        idle = time.monotonic() - self.updated_at
+        return self.error_rate * 0.5 ** (idle / PROVIDER_ERROR_HALF_LIFE_SECONDS)
+
+    def _observe_latency(self, latency: float) -> None:
+        alpha = PROVIDER_EWMA_ALPHA
+        self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+
+    def _observe(self, latency: float, failed: bool) -> None:
+        self._observe_latency(latency)
+        self.error_rate = PROVIDER_EWMA_ALPHA * float(failed) + (1 - PROVIDER_EWMA_ALPHA) * self._decayed_error_rate()
+        self.updated_at = time.monotonic()
+        self.calls += 1
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._observe(latency, failed=False)
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self, latency: float) -> None:
+        with self._lock:
+            self._observe(latency, failed=True)
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= PROVIDER_BREAKER_FAILURES:
+                if self.state != OPEN:
+                    print(f"WARNING: Circuit breaker opened for provider '{self.name}'.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def record_abandoned(self, elapsed: float) -> None:
+        """A call cancelled after losing a hedge: it took at least ``elapsed``, with no verdict."""
+        with self._lock:
+            self._observe_latency(elapsed)
+            self._trial_in_flight = False
+
+    def score(self, position: int) -> float:
+        with self._lock:
+            latency = self.latency if self.latency is not None else PROVIDER_LATENCY_PRIOR_SECONDS
+            error_rate = self._decayed_error_rate()
+        return latency + error_rate * PROVIDER_ERROR_PENALTY_SECONDS + position * PROVIDER_ORDER_BIAS_SECONDS
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "ewma_latency_ms": self.latency * 1000 if self.latency is not None else None,
+                "ewma_error_rate": self._decayed_error_rate(),
+                "consecutive_failures": self.consecutive_failures,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
+
+
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+# Fallback outcomes across all chains: hedged, hedge_skipped, fell_back, losers_running, exhausted.
+_events = Counter()
+
+
+def get_health(name: str) -> ProviderHealth:
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = _health[name] = ProviderHealth(name)
+        return health
+
+
+def order(names: Sequence[str]) -> List[str]:
+    """``names`` (in configured preference order) ranked by observed health."""
+    return sorted(names, key=lambda name: (get_health(name).score(names.index(name)), names.index(name)))
+
+
+def count(event: str) -> None:
+    with _health_lock:
+        _events[event] += 1
+
+
+def stats() -> Dict[str, Dict]:
+    with _health_lock:
+        providers = dict(_health)
+        events = dict(_events)
+    return {
+        "providers": {name: health.stats() for name, health in sorted(providers.items())},
+        "events": events,
+    }
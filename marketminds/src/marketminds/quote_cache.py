@@ -0,0 +1,200 @@
+"""In-process quote cache shared by the market and crypto price tools and news search.
+
+Entries are keyed by (provider, normalized symbol) and expire after a
+per-provider TTL. Within ``QUOTE_CACHE_STALE_SECONDS`` past expiry a stale value
+is still served immediately while a single background refresh replaces it.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Seconds a quote stays fresh, per provider. Override with QUOTE_CACHE_TTL_<PROVIDER>.
+DEFAULT_PROVIDER_TTLS = {
+    "polygon": 60.0,  # previous-day aggregates, they only move once a day
+    "twelve_data": 15.0,
+    "fmp": 15.0,
+    "alpha_vantage": 60.0,
+    "coingecko": 30.0,
+    "coincap": 10.0,
+    "batch": 15.0,  # per-symbol quotes from /api/v1/quotes and the batch quote tool
+    "newsapi": 900.0,  # news searches; the free NewsAPI plan allows 100 requests a day
+}
+QUOTE_CACHE_DEFAULT_TTL_SECONDS = float(os.getenv("QUOTE_CACHE_DEFAULT_TTL_SECONDS", "30"))
+QUOTE_CACHE_MAX_ENTRIES = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "2048"))
+QUOTE_CACHE_STALE_SECONDS = float(os.getenv("QUOTE_CACHE_STALE_SECONDS", "120"))
+
+
+def _provider_ttls() -> Dict[str, float]:
+    ttls = dict(DEFAULT_PROVIDER_TTLS)
+    for provider in ttls:
+        override = os.getenv(f"QUOTE_CACHE_TTL_{provider.upper()}")
+        if override:
+            ttls[provider] = float(override)
+    return ttls
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Maps 'eur/usd', 'EURUSD' and ' EUR-USD ' to the same key."""
+    return re.sub(r"[\s/_-]", "", symbol).upper()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+    refreshing: bool = False
+
+
+class QuoteCache:
+    """Bounded LRU of provider responses with stale-while-revalidate."""
+
+    def __init__(
+        self,
+        max_entries: int = QUOTE_CACHE_MAX_ENTRIES,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = QUOTE_CACHE_DEFAULT_TTL_SECONDS,
+        stale_seconds: float = QUOTE_CACHE_STALE_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else _provider_ttls()
+        self.default_ttl = default_ttl
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="quote-refresh")
+        self._refresh_tasks: set = set()
+        self._counters = dict.fromkeys(
+            ["hits", "stale_hits", "misses", "refreshes", "refresh_failures", "evictions"], 0
+        )
+
+    def ttl(self, provider: str) -> float:
+        return self.ttls.get(provider, self.default_ttl)
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[Optional[_Entry], bool]:
+        """Returns (entry, needs_refresh) and updates counters; entry is None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                ttl = self.ttl(key[0])
+                if age <= ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry, False
+                if age <= ttl + self.stale_seconds:
+                    self._entries.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    needs_refresh = not entry.refreshing
+                    entry.refreshing = True
+                    return entry, needs_refresh
+                del self._entries[key]
+            self._counters["misses"] += 1
+            return None, False
+
+    def _store(self, key: Tuple[str, str], value: Any) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(value=value, fetched_at=time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _refresh_failed(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._counters["refresh_failures"] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refreshing = False
+
+    def _refresh(self, key: Tuple[str, str], fetch: Callable[[], Any]) -> None:
+        try:
+            value = fetch()
+        except Exception as e:
+            print(f"WARNING: Background quote refresh failed for {key}: {e}")
+            self._refresh_failed(key)
+            return
+        self._store(key, value)
+        with self._lock:
+            self._counters["refreshes"] += 1
+
+    async def _arefresh(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            value = await fetch()
+        except Exception as e:
+            print(f"WARNING: Background quote refresh failed for {key}: {e}")
+            self._refresh_failed(key)
+            return
+        self._store(key, value)
+        with self._lock:
+            self._counters["refreshes"] += 1
+
+    def get_or_fetch(self, provider: str, symbol: str, fetch: Callable[[], Any]) -> Any:
+        """Returns the cached value or calls ``fetch``; exceptions are not cached."""
+        key = (provider, normalize_symbol(symbol))
+        entry, needs_refresh = self._lookup(key)
+        if entry is None:
+            value = fetch()
+            self._store(key, value)
+            return value
+        if needs_refresh:
+            self._refresh_pool.submit(self._refresh, key, fetch)
+        return entry.value
+
+    async def aget_or_fetch(
+        self, provider: str, symbol: str, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Async counterpart of ``get_or_fetch``; refreshes run as event-loop tasks."""
+        key = (provider, normalize_symbol(symbol))
+        entry, needs_refresh = self._lookup(key)
+        if entry is None:
+            value = await fetch()
+            self._store(key, value)
+            return value
+        if needs_refresh:
+            task = asyncio.create_task(self._arefresh(key, fetch))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        return entry.value
+
+    def get(self, provider: str, symbol: str) -> Optional[Any]:
+        """Returns a fresh cached value, or None; for callers that fetch many symbols at once."""
+        key = (provider, normalize_symbol(symbol))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.fetched_at <= self.ttl(provider):
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry.value
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, provider: str, symbol: str, value: Any) -> None:
+        self._store((provider, normalize_symbol(symbol)), value)
+
+    def invalidate(self, provider: str, symbol: str) -> None:
+        with self._lock:
+            self._entries.pop((provider, normalize_symbol(symbol)), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size, for sizing the cache."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+quote_cache = QuoteCache()
@@ -0,0 +1,206 @@
+"""Response cache for the master chat chain.
+
+Answers are keyed by (route, normalized entities) so "latest NVIDIA news" and
+"what's the news on Nvidia" share one crew run. When a request was routed by the
+keyword fast path there are no entities yet, and the normalized question text is
+used instead. With ``RESPONSE_CACHE_SEMANTIC`` enabled, a miss is also matched
+against earlier questions on the same route by embedding similarity.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .vector_store import CachedQueryEmbeddings, get_embedding_cache
+
+# Seconds an answer stays valid, by how fast the underlying data moves.
+QUOTE_TTL = 30.0
+NEWS_TTL = 300.0
+FUNDAMENTALS_TTL = 900.0
+KNOWLEDGE_TTL = 3 * 24 * 3600.0
+
+DEFAULT_ROUTE_TTLS = {
+    "crypto_analysis": QUOTE_TTL,
+    "global_market_quote": QUOTE_TTL,
+    "financials_and_crypto": QUOTE_TTL,
+    "news_analysis": NEWS_TTL,
+    "news_and_financials": NEWS_TTL,
+    "news_and_research": NEWS_TTL,
+    "news_and_crypto": QUOTE_TTL,
+    "full_analysis": NEWS_TTL,
+    "reasoning_query": NEWS_TTL,
+    "financial_analysis": FUNDAMENTALS_TTL,
+    "financials_and_research": FUNDAMENTALS_TTL,
+    "crypto_historical": FUNDAMENTALS_TTL,
+    "economic_analysis": 6 * 3600.0,
+    "knowledge_base_query": KNOWLEDGE_TTL,
+}
+
+# Entity fields that determine the answer for each route.
+ROUTE_KEY_FIELDS = {
+    "news_analysis": ["company"],
+    "financial_analysis": ["company_ticker"],
+    "knowledge_base_query": ["research_query"],
+    "crypto_analysis": ["crypto_name"],
+    "economic_analysis": ["indicator_name"],
+    "global_market_quote": ["market_symbol"],
+    "crypto_historical": ["coin_id", "days"],
+    "news_and_financials": ["company", "company_ticker"],
+    "news_and_research": ["company", "research_query"],
+    "financials_and_research": ["company_ticker", "research_query"],
+    "news_and_crypto": ["company", "crypto_name"],
+    "financials_and_crypto": ["company_ticker", "crypto_name"],
+    "full_analysis": ["company", "company_ticker", "research_query"],
+}
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+
+_FILLER_WORDS = {
+    "a", "an", "the", "on", "for", "of", "about", "me", "please", "give", "get", "show",
+    "tell", "what", "whats", "what's", "is", "are", "latest", "current", "recent", "and",
+}
+
+
+def _route_ttls() -> Dict[str, float]:
+    ttls = dict(DEFAULT_ROUTE_TTLS)
+    for route in ttls:
+        override = os.getenv(f"RESPONSE_CACHE_TTL_{route.upper()}")
+        if override:
+            ttls[route] = float(override)
+    return ttls
+
+
+def normalize_text(text: str) -> str:
+    """Order- and filler-insensitive form of a short question or entity."""
+    words = (re.sub(r"'s$", "", w).strip(".'") for w in re.findall(r"[a-z0-9/^.$&']+", text.lower()))
+    return " ".join(sorted(w for w in words if w and w not in _FILLER_WORDS))
+
+
+def cache_key(route: str, entities: Optional[Dict], question: str) -> Tuple:
+    fields = ROUTE_KEY_FIELDS.get(route)
+    if entities and fields:
+        return (route, "entities", tuple(normalize_text(str(entities.get(f, ""))) for f in fields))
+    return (route, "text", normalize_text(question))
+
+
+def is_cacheable(result: Dict) -> bool:
+    """Skips answers where a task (or one branch of a fan-out) reported an error."""
+    output = result.get("output")
+    if isinstance(output, str):
+        return not any(part.startswith("Error") for part in output.split("\n\n---\n\n"))
+    return output is not None
+
+
+@dataclass
+class _Entry:
+    route: str
+    value: Dict[str, Any]
+    expires_at: float
+    vector: Optional[np.ndarray] = None
+
+
+class ResponseCache:
+    """Bounded LRU of chat answers with per-route TTLs."""
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttls: Optional[Dict[str, float]] = None,
+        semantic: bool = RESPONSE_CACHE_SEMANTIC,
+        similarity: float = RESPONSE_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else _route_ttls()
+        self.semantic = semantic
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._embeddings: Optional[CachedQueryEmbeddings] = None
+        self._counters = dict.fromkeys(["hits", "semantic_hits", "misses", "stores", "evictions"], 0)
+
+    @property
+    def embeddings(self) -> CachedQueryEmbeddings:
+        if self._embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            self._embeddings = CachedQueryEmbeddings(OpenAIEmbeddings(), get_embedding_cache())
+        return self._embeddings
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry.value
+            if entry is not None:
+                del self._entries[key]
+            return None
+
+    def find_similar(self, route: str, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if entry.route == route and entry.vector is not None and entry.expires_at > now
+            ]
+            if not candidates:
+                return None
+            scores = np.stack([entry.vector for _, entry in candidates]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                return None
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self._counters["semantic_hits"] += 1
+            return entry.value
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self._counters["misses"] += 1
+
+    def put(self, key: Tuple, route: str, value: Dict[str, Any], vector: Optional[np.ndarray] = None) -> None:
+        ttl = self.ttls.get(route, NEWS_TTL)
+        with self._lock:
+            self._entries[key] = _Entry(route, value, time.monotonic() + ttl, vector)
+            self._entries.move_to_end(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def embed(self, question: str) -> np.ndarray:
+        return self._unit(self.embeddings.embed_query(question))
+
+    async def aembed(self, question: str) -> np.ndarray:
+        return self._unit(await self.embeddings.aembed_query(question))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["semantic"] = self.semantic
+        return stats
+
+
+response_cache = ResponseCache()
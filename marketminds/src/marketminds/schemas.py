@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, List, Optional
 
 
 class Token(BaseModel):
@@ -21,3 +21,17 @@ class UserInDB(User):
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
+
+
+class QuoteBatchRequest(BaseModel):
+    symbols: List[str] = Field(
+        ...,
+        min_length=1,
+        description="Stocks, forex pairs, commodities, indices or crypto; prefix with 'stock:', 'market:' or 'crypto:' to set the asset class.",
+    )
+
+
+class QuoteBatchResponse(BaseModel):
+    quotes: Dict[str, Dict[str, Any]]
+    errors: Dict[str, str]
+    requested: int
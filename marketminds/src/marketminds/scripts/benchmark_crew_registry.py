@@ -0,0 +1,114 @@
+"""Compares per-request crew construction cost with and without the registry.
+
+"before" builds a ``MarketmindsCrewService`` the way every request used to
+(YAML parsing, all tools, a new RAG tool with its own Chroma client and
+embeddings); "after" binds a fresh task/agent onto the prebuilt registry.
+Nothing is sent to OpenAI, so a placeholder key is enough.
+
+    python -m marketminds.scripts.benchmark_crew_registry --iterations 50
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+
+from crewai import Agent, Crew, Process, Task
+from crewai.project import CrewBase, agent, task, tool
+
+from marketminds.crew import (
+    AGENT_TOOLS,
+    TASK_AGENTS,
+    TOOL_CLASSES,
+    get_config_path,
+    get_crew_registry,
+)
+
+TASK_NAMES = ["news_summary_task", "financial_analysis_task", "research_task"]
+
+
+def _legacy_service_class():
+    """Rebuilds the pre-registry service: a new instance of every tool per service."""
+
+    def make_tool(tool_class):
+        return tool(lambda self: tool_class())
+
+    def make_agent(agent_name):
+        return agent(
+            lambda self: Agent(
+                config=self.agents_config[agent_name],
+                tools=[getattr(self, tool_name)() for tool_name in AGENT_TOOLS[agent_name]],
+            )
+        )
+
+    def make_task(task_name):
+        return task(
+            lambda self: Task(
+                config=self.tasks_config[task_name],
+                agent=getattr(self, TASK_AGENTS[task_name])(),
+            )
+        )
+
+    namespace = {
+        "agents_config": get_config_path("agents.yaml"),
+        "tasks_config": get_config_path("tasks.yaml"),
+    }
+    namespace.update({name: make_tool(cls) for name, cls in TOOL_CLASSES.items()})
+    namespace.update({name: make_agent(name) for name in AGENT_TOOLS})
+    namespace.update({name: make_task(name) for name in TASK_AGENTS})
+    service_class = type("LegacyMarketmindsCrewService", (), namespace)
+    service_class.__module__ = "marketminds.crew"
+    return CrewBase(service_class)
+
+
+def _time(build, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:<8} mean {statistics.mean(samples):8.2f} ms | "
+        f"median {statistics.median(samples):8.2f} ms | p95 {p95:8.2f} ms"
+    )
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    legacy_service = _legacy_service_class()
+
+    def before():
+        service = legacy_service()
+        tasks = [getattr(service, task_name)() for task_name in TASK_NAMES]
+        Crew(agents=[t.agent for t in tasks], tasks=tasks, process=Process.sequential)
+
+    def after():
+        registry = get_crew_registry()
+        tasks = [registry.task(task_name) for task_name in TASK_NAMES]
+        Crew(agents=[t.agent for t in tasks], tasks=tasks, process=Process.sequential)
+
+    # Warm imports and the registry so only steady-state request cost is measured.
+    before()
+    start = time.perf_counter()
+    get_crew_registry()
+    print(f"Registry startup cost: {(time.perf_counter() - start) * 1000:.2f} ms (paid once)")
+
+    print(f"--- Per-request construction of {', '.join(TASK_NAMES)} ({args.iterations} runs) ---")
+    before_mean = _report("before", _time(before, args.iterations))
+    after_mean = _report("after", _time(after, args.iterations))
+    print(f"Speed-up: {before_mean / after_mean:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
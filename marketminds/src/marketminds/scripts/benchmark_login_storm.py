@@ -0,0 +1,131 @@
+"""Login throughput and chat latency during a burst of logins.
+
+Runs the FastAPI app in-process (httpx ASGI transport, SQLite database, chat
+chain replaced by a 10 ms stub) and fires ``--logins`` concurrent /token
+requests while a probe sends an /api/v1/chat request every 50 ms. It does
+this twice: once with argon2 inline on the event loop (the old behaviour) and
+once on the password process pool. While the loop is busy hashing, chat
+latency grows with the storm.
+
+    python -m marketminds.scripts.benchmark_login_storm --logins 64 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/login_storm.sqlite3")
+
+import httpx
+
+from marketminds import auth, passwords, schemas, server
+from marketminds.database import SessionLocal, init_db
+
+PASSWORD = "correct horse battery staple"
+PROBE_INTERVAL = 0.05
+
+
+class _StubChain:
+    async def ainvoke(self, input, config=None):
+        await asyncio.sleep(0.01)
+        return {"output": "stub", "cached": False}
+
+
+def _create_users(count: int):
+    init_db()
+    hashed_password = passwords.hash_password(PASSWORD)
+    db = SessionLocal()
+    try:
+        for i in range(count):
+            email = f"storm{i}@example.com"
+            if auth.get_user(db, username=email) is None:
+                auth.create_user(
+                    db, schemas.UserCreate(email=email, password=PASSWORD), hashed_password=hashed_password
+                )
+    finally:
+        db.close()
+
+
+def _percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _storm(client: httpx.AsyncClient, logins: int, chat_headers: dict):
+    stop = asyncio.Event()
+    chat_latencies = []
+
+    async def probe():
+        # Chats are due every PROBE_INTERVAL seconds. Latency counts from when a
+        # chat was due, so time the event loop spent blocked is included.
+        due = time.perf_counter()
+        while not stop.is_set():
+            due += PROBE_INTERVAL
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            response = await client.post("/api/v1/chat", json={"input": "ping"}, headers=chat_headers)
+            response.raise_for_status()
+            chat_latencies.append((time.perf_counter() - due) * 1000)
+
+    async def login(i: int):
+        response = await client.post(
+            "/token", data={"username": f"storm{i}@example.com", "password": PASSWORD}
+        )
+        response.raise_for_status()
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    return elapsed, chat_latencies
+
+
+async def _run_mode(label: str, workers: int, logins: int):
+    passwords.shutdown()
+    passwords.PASSWORD_HASH_WORKERS = workers
+    passwords.PASSWORD_HASH_CONCURRENCY = max(1, workers)
+    passwords._semaphores.clear()
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        token = auth.create_access_token({"sub": "storm0@example.com"})
+        headers = {"Authorization": f"Bearer {token}"}
+        # Warm the principal cache and, in pool mode, start the worker processes.
+        await client.post("/api/v1/chat", json={"input": "ping"}, headers=headers)
+        await client.post("/token", data={"username": "storm0@example.com", "password": PASSWORD})
+
+        elapsed, latencies = await _storm(client, logins, headers)
+
+    print(
+        f"{label:<14} logins/s {logins / elapsed:7.1f} | chat p50 {statistics.median(latencies):8.1f} ms | "
+        f"p95 {_percentile(latencies, 0.95):8.1f} ms | max {max(latencies):8.1f} ms | probes {len(latencies)}"
+    )
+
+
+async def main_async(args):
+    print(
+        f"argon2 t={passwords.ARGON2_TIME_COST} m={passwords.ARGON2_MEMORY_COST}KiB "
+        f"p={passwords.ARGON2_PARALLELISM}; {args.logins} concurrent logins"
+    )
+    await _run_mode("inline", 0, args.logins)
+    await _run_mode(f"pool({args.workers})", args.workers, args.logins)
+    passwords.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark logins and chat latency under a login storm.")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=passwords.PASSWORD_HASH_WORKERS or 4)
+    args = parser.parse_args()
+
+    server.MasterChain = _StubChain()
+    _create_users(args.logins)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
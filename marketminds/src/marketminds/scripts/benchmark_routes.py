@@ -0,0 +1,296 @@
+"""Offline benchmark of every MasterBranch route, with fake OpenAI and provider APIs.
+
+Starts the stub server from ``benchmark_stubs`` and points ``ChatOpenAI``,
+``OpenAIEmbeddings`` and the crewai LLMs at it through ``OPENAI_BASE_URL``. The
+shared HTTP client sends every provider request there, and ``yfinance.Ticker``
+is replaced by a fake. The full ``MasterChain`` then runs (routing, extraction,
+crews, tools, caches) without keys or network. The response cache, chat
+coalescing and the provider rate limits are off, so every request does the
+full work.
+
+For each route it reports:
+
+* latency: p50 / p95 / mean of ``--iterations`` sequential requests;
+* allocations: peak traced memory and the number of memory blocks allocated
+  during one request (``tracemalloc``, in a separate pass because tracing slows
+  everything down);
+* throughput: requests per second with ``--concurrency`` requests in flight.
+
+Results are written to ``--results-dir`` as JSON named after the time and
+git commit. With ``--compare`` (default: the newest earlier result) each route
+is compared against it, and a p50 or throughput change worse than
+``--max-regression`` is flagged. ``--fail-on-regression`` turns a flagged
+route into a non-zero exit status.
+
+    python -m marketminds.scripts.benchmark_routes --iterations 5 --llm-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import weakref
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from marketminds.scripts.benchmark_stubs import (
+    QUERIES,
+    AsyncRedirectTransport,
+    FakeTicker,
+    RedirectTransport,
+    StubServer,
+)
+
+RATE_LIMITED_PROVIDERS = ("ALPHA_VANTAGE", "COINGECKO", "NEWSAPI", "FRED", "POLYGON", "TWELVE_DATA", "FMP")
+
+
+def _configure_environment(stub: StubServer, workdir: str) -> None:
+    """Settings that must be in place before the app modules are imported."""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark-placeholder",
+        "OPENAI_BASE_URL": stub.openai_base_url,
+        "OPENAI_API_BASE": stub.openai_base_url,
+        "DATABASE_URL": f"sqlite:///{workdir}/benchmark.sqlite3",
+        "CHROMA_DB_DIR": f"{workdir}/chroma",
+        "EMBEDDING_CACHE_PATH": f"{workdir}/embedding_cache.sqlite3",
+        "HISTORY_STORE_DIR": f"{workdir}/history",
+        "RESPONSE_CACHE_ENABLED": "false",
+        "CHAT_COALESCING_ENABLED": "false",
+        "PREWARM_ENABLED": "false",
+        "METRICS_OTEL_ENABLED": "false",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+        # Skips crewai's first-run "view your execution traces?" prompt, which
+        # waits 20 s for input after every crew.
+        "CREWAI_TESTING": "true",
+    })
+    for key in ("NEWS_API_KEY", "POLYGON_API_KEY", "ALPHA_VANTAGE_API_KEY", "FRED_API_KEY",
+                "TWELVE_DATA_API_KEY", "FMP_API_KEY", "COINGECKO_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+    for provider in RATE_LIMITED_PROVIDERS:
+        os.environ[f"RATE_LIMIT_{provider}"] = "off"
+
+
+def _route_providers_to(stub: StubServer) -> None:
+    """Replaces the shared HTTP clients with ones that send every request to the stub."""
+    from marketminds import http_client
+    from marketminds.tools import stock_analysis_tools
+
+    # Plain HTTP/1.1: the stub speaks no TLS, so no HTTP/2 either.
+    options = {**http_client._client_options(), "http2": False}
+    limits = options.pop("limits")
+    client = httpx.Client(transport=RedirectTransport(stub.port, limits=limits), **options)
+    async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def get_async_client() -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if loop not in async_clients:
+            async_clients[loop] = httpx.AsyncClient(
+                transport=AsyncRedirectTransport(stub.port, limits=limits), **options
+            )
+        return async_clients[loop]
+
+    http_client.get_client = lambda: client
+    http_client.get_async_client = get_async_client
+    FakeTicker.latency = stub.provider_latency
+    stock_analysis_tools.yf.Ticker = FakeTicker
+
+
+def _reset_caches() -> None:
+    """Drops cached results and stored history so every request reaches the (stub) providers again."""
+    from marketminds.quote_cache import quote_cache
+    from marketminds.timeseries import series_cache
+    from marketminds.vector_store import get_vector_store
+
+    quote_cache.clear()
+    series_cache.clear()
+    shutil.rmtree(os.environ["HISTORY_STORE_DIR"], ignore_errors=True)
+    get_vector_store(os.environ["CHROMA_DB_DIR"]).clear_results()
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _ask(chain, route: str, user: str) -> Dict[str, Any]:
+    question = QUERIES[route][0]
+    result = await chain.ainvoke({"input": question}, config={"configurable": {"session_id": user}})
+    output = result.get("output")
+    if not output or str(output).startswith("Error"):
+        raise RuntimeError(f"{route}: unexpected output {str(output)[:200]!r}")
+    return result
+
+
+async def _latency(chain, route: str, iterations: int, cold: bool) -> Dict[str, float]:
+    samples = []
+    for i in range(iterations):
+        if cold:
+            _reset_caches()
+        started = time.perf_counter()
+        await _ask(chain, route, f"latency-{i}")
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": statistics.median(samples),
+        "p95_ms": _percentile(samples, 0.95),
+        "mean_ms": statistics.mean(samples),
+    }
+
+
+async def _allocations(chain, route: str, cold: bool) -> Dict[str, float]:
+    if cold:
+        _reset_caches()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        await _ask(chain, route, "allocations")
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0)
+    return {"peak_kib": peak / 1024, "allocated_blocks": blocks}
+
+
+async def _throughput(chain, route: str, requests: int, concurrency: int, cold: bool) -> Dict[str, float]:
+    if cold:
+        _reset_caches()
+    queue = iter(range(requests))
+
+    async def worker(n: int):
+        # Each worker is its own user, so the per-user crew limit does not apply.
+        for _ in queue:
+            await _ask(chain, route, f"throughput-{n}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return {"requests_per_second": requests / (time.perf_counter() - started)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _previous_result(results_dir: Path, current: Path) -> Optional[Path]:
+    earlier = sorted(path for path in results_dir.glob("*.json") if path != current)
+    return earlier[-1] if earlier else None
+
+
+def _compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Prints per-route changes against ``baseline``; returns the routes that regressed."""
+    print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+    regressed = []
+    for route, current in results["routes"].items():
+        previous = baseline["routes"].get(route)
+        if previous is None:
+            continue
+        latency = current["p50_ms"] / previous["p50_ms"] - 1
+        throughput = current["requests_per_second"] / previous["requests_per_second"] - 1
+        flag = latency > max_regression or throughput < -max_regression
+        if flag:
+            regressed.append(route)
+        print(
+            f"{'REGRESSED' if flag else 'ok':<9} {route:<24} p50 {latency:+7.1%} | "
+            f"throughput {throughput:+7.1%} | blocks {current['allocated_blocks'] - previous['allocated_blocks']:+d}"
+        )
+    return regressed
+
+
+async def main_async(args, chain) -> Dict[str, Dict[str, float]]:
+    routes = args.routes or list(QUERIES)
+    # One unmeasured pass so imports, registries and connection pools are in place.
+    for route in routes:
+        await _ask(chain, route, "warmup")
+
+    results = {}
+    for route in routes:
+        stats = await _latency(chain, route, args.iterations, args.cold)
+        stats.update(await _allocations(chain, route, args.cold))
+        stats.update(await _throughput(chain, route, args.requests, args.concurrency, args.cold))
+        results[route] = stats
+        print(
+            f"{route:<24} p50 {stats['p50_ms']:8.1f} ms | p95 {stats['p95_ms']:8.1f} ms | "
+            f"peak {stats['peak_kib']:8.0f} KiB | blocks {stats['allocated_blocks']:7d} | "
+            f"{stats['requests_per_second']:6.2f} req/s"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every chat route against local stubs.")
+    parser.add_argument("--routes", nargs="*", choices=list(QUERIES), help="Routes to run (default: all).")
+    parser.add_argument("--iterations", type=int, default=5, help="Sequential requests per route for latency.")
+    parser.add_argument("--requests", type=int, default=8, help="Requests per route for throughput.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight for throughput.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per fake OpenAI response.")
+    parser.add_argument("--provider-latency", type=float, default=0.02, help="Seconds per fake provider response.")
+    parser.add_argument("--cold", action="store_true", help="Clear caches and stored history before every request.")
+    parser.add_argument("--results-dir", default="./storage/benchmarks")
+    parser.add_argument("--compare", help="Result file to compare with (default: the newest earlier one).")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    stub = StubServer(args.llm_latency, args.provider_latency).start()
+    workdir = tempfile.mkdtemp(prefix="marketminds-benchmark-")
+    _configure_environment(stub, workdir)
+
+    from marketminds.chain import MasterChain
+    from marketminds.database import init_db
+
+    init_db()
+    _route_providers_to(stub)
+    try:
+        routes = asyncio.run(main_async(args, MasterChain))
+    finally:
+        stub.stop()
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    results = {
+        "commit": _git_commit(),
+        "timestamp": timestamp,
+        "python": platform.python_version(),
+        "settings": {
+            key: getattr(args, key)
+            for key in ("iterations", "requests", "concurrency", "llm_latency", "provider_latency", "cold")
+        },
+        "stub_requests": stub.requests,
+        "routes": routes,
+    }
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{timestamp}_{results['commit']}.json"
+    path.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {path}")
+
+    baseline_path = Path(args.compare) if args.compare else _previous_result(results_dir, path)
+    if baseline_path is None:
+        return
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("settings") != results["settings"]:
+        print(f"WARNING: {baseline_path} was run with different settings: {baseline.get('settings')}")
+    regressed = _compare(results, baseline, args.max_regression)
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+"""Local stand-ins for OpenAI and the market data providers, for offline benchmarks.
+
+``StubServer`` is a threaded HTTP server on 127.0.0.1 that answers:
+
+* ``/v1/chat/completions`` and ``/v1/embeddings`` like the OpenAI API. The
+  router and extractor get the route and entities recorded for each benchmark
+  question in ``QUERIES``. Agents call their first tool once, then give a final
+  answer, and the manager delegates once to the first coworker. Embeddings are
+  derived from a hash of the text.
+* Polygon, CoinGecko, CoinCap, FRED, World Bank, NewsAPI, Twelve Data, FMP and
+  Alpha Vantage, with responses shaped like the real ones. Requests are matched
+  on their original ``Host`` header, so the data tools are pointed at the
+  server by ``RedirectTransport`` on the shared HTTP client rather than by
+  changing their URLs.
+
+Every response waits ``llm_latency`` or ``provider_latency`` seconds first.
+``FakeTicker`` replaces ``yfinance.Ticker``, with the same provider latency.
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import numpy as np
+import pandas as pd
+
+EMBEDDING_DIMENSIONS = 1536
+
+# One question per MasterBranch route, with what the router should extract.
+QUERIES: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "news_analysis": ("What is the latest news on Apple?", {"company": "Apple", "company_ticker": "AAPL"}),
+    "financial_analysis": (
+        "Give me a fundamental analysis of Apple's financials.",
+        {"company": "Apple", "company_ticker": "AAPL"},
+    ),
+    "knowledge_base_query": (
+        "Explain the principles of value investing.",
+        {"research_query": "principles of value investing"},
+    ),
+    "news_and_financials": (
+        "Headlines and earnings for Microsoft.",
+        {"company": "Microsoft", "company_ticker": "MSFT"},
+    ),
+    "news_and_research": (
+        "Tesla sentiment and explain growth investing.",
+        {"company": "Tesla", "company_ticker": "TSLA", "research_query": "growth investing"},
+    ),
+    "financials_and_research": (
+        "Amazon's balance sheet and what is index fund investing?",
+        {"company": "Amazon", "company_ticker": "AMZN", "research_query": "index fund investing"},
+    ),
+    "full_analysis": (
+        "Full analysis of Nvidia: news, financials and a momentum investing primer.",
+        {"company": "Nvidia", "company_ticker": "NVDA", "research_query": "momentum investing"},
+    ),
+    "crypto_analysis": ("How much is one Ethereum worth right now?", {"crypto_name": "Ethereum", "coin_id": "ethereum"}),
+    "economic_analysis": ("Current inflation rate in the US", {"indicator_name": "inflation"}),
+    "global_market_quote": ("EUR/USD exchange rate", {"market_symbol": "EUR/USD"}),
+    "crypto_historical": (
+        "Bitcoin price history over the last 90 days",
+        {"crypto_name": "Bitcoin", "coin_id": "bitcoin", "days": 90},
+    ),
+    "news_and_crypto": ("Any news about Solana?", {"company": "Solana", "crypto_name": "Solana", "coin_id": "solana"}),
+    "financials_and_crypto": (
+        "Coinbase revenue and the price of Ethereum",
+        {"company": "Coinbase", "company_ticker": "COIN", "crypto_name": "Ethereum", "coin_id": "ethereum"},
+    ),
+    "reasoning_query": (
+        "Why did tech stocks fall after the Fed meeting?",
+        {"research_query": "tech stocks and the Fed meeting"},
+    ),
+}
+
+# Arguments an agent passes to each tool it might call first.
+TOOL_ARGUMENTS = {
+    "Stock Data Tool": lambda e: {"ticker": e.get("company_ticker") or "AAPL"},
+    "Stock Historical Price Data": lambda e: {"ticker": e.get("company_ticker") or "AAPL", "days": e.get("days") or 30},
+    "Batch Quote Tool": lambda e: {"symbols": [e.get("company_ticker") or "AAPL", "MSFT"]},
+    "Financial News Search Tool": lambda e: {"search_query": e.get("company") or e.get("crypto_name") or "markets"},
+    "Knowledge Base Search": lambda e: {"query": e.get("research_query") or "investing"},
+    "Crypto Profile and Price Tool": lambda e: {"coin_name": e.get("crypto_name") or "Bitcoin"},
+    "Cryptocurrency Historical Chart Data": lambda e: {"coin_id": e.get("coin_id") or "bitcoin", "days": e.get("days") or 30},
+    "Economic Indicator Tool": lambda e: {"indicator_name": e.get("indicator_name") or "gdp"},
+    "Market Quote Tool": lambda e: {"symbol": e.get("market_symbol") or "EUR/USD"},
+}
+
+_ENTITY_FIELDS = (
+    "company", "company_ticker", "research_query", "crypto_name", "coin_id", "indicator_name", "market_symbol",
+)
+
+
+def _entities_for(text: str) -> Tuple[str, Dict[str, Any]]:
+    """The route and full entity set for the benchmark question found in ``text``."""
+    for route, (question, entities) in QUERIES.items():
+        if question.lower() in text.lower():
+            return route, {**{field: "" for field in _ENTITY_FIELDS}, "days": 30, **entities}
+    return "news_analysis", {**{field: "" for field in _ENTITY_FIELDS}, "days": 30}
+
+
+def _seed(*parts: Any) -> int:
+    return zlib.crc32("|".join(map(str, parts)).encode())
+
+
+def _price(symbol: str, base: float = 100.0) -> float:
+    return round(base * (0.5 + (_seed(symbol) % 1000) / 500), 4)
+
+
+# ---------------------------------------------------------------- fake OpenAI
+
+
+def _text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _schema_name(body: Dict[str, Any]) -> Optional[str]:
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return response_format["json_schema"].get("name")
+    for tool in body.get("tools") or []:
+        return tool.get("function", {}).get("name")
+    return None
+
+
+def _structured(body: Dict[str, Any], schema: str, text: str) -> Dict[str, Any]:
+    route, entities = _entities_for(text)
+    payload = {**entities, "route": route} if schema == "RoutedInputs" else (
+        {"route": route} if schema == "RouteQuery" else entities
+    )
+    if body.get("response_format"):
+        return {"role": "assistant", "content": json.dumps(payload)}
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {
+                "id": f"call_{_seed(text) % 10**8}",
+                "type": "function",
+                "function": {"name": schema, "arguments": json.dumps(payload)},
+            }
+        ],
+    }
+
+
+def _agent_reply(text: str) -> str:
+    """A ReAct step: call the first known tool once, then answer."""
+    _, entities = _entities_for(text)
+    # The format instructions in the system prompt contain a placeholder observation.
+    observations = [o for o in text.split("Observation:")[1:] if not o.startswith(" the result of the action")]
+    if observations:
+        summary = " ".join(observations[-1].strip().splitlines()[:3])[:400]
+        return f"Thought: I now know the final answer\nFinal Answer: Based on the data: {summary}"
+    tools = [tool.strip() for tool in re.findall(r"Tool Name: (.+)", text)]
+    if entities.get("days"):
+        # A history question: the historical tool rather than the current quote.
+        tools.sort(key=lambda tool: "Historical" not in tool)
+    for tool in tools:
+        if tool in TOOL_ARGUMENTS:
+            arguments = TOOL_ARGUMENTS[tool](entities)
+            return f"Thought: I should look this up.\nAction: {tool}\nAction Input: {json.dumps(arguments)}"
+        if tool.startswith("Delegate work to coworker"):
+            coworkers = re.findall(r"one of the following coworkers: (.+)", text)
+            coworker = coworkers[0].split(",")[0].strip() if coworkers else ""
+            arguments = {"task": "Summarize the relevant data.", "context": "Benchmark request.", "coworker": coworker}
+            return f"Thought: I should delegate.\nAction: {tool}\nAction Input: {json.dumps(arguments)}"
+    return "Thought: I now know the final answer\nFinal Answer: A concise benchmark answer."
+
+
+def chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    text = _text(body.get("messages", []))
+    schema = _schema_name(body)
+    message = _structured(body, schema, text) if schema else {"role": "assistant", "content": _agent_reply(text)}
+    prompt_tokens = len(text) // 4
+    completion_tokens = len(message.get("content") or "") // 4 + 1
+    return {
+        "id": f"chatcmpl-{_seed(text, time.time_ns())}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _stream_chunks(completion: Dict[str, Any]) -> List[Dict[str, Any]]:
+    message = completion["choices"][0]["message"]
+    base = {key: completion[key] for key in ("id", "created", "model")}
+    content = message.get("content") or ""
+    chunks = [
+        {**base, "object": "chat.completion.chunk",
+         "choices": [{"index": 0, "delta": {"content": content[i:i + 16]}, "finish_reason": None}]}
+        for i in range(0, len(content), 16)
+    ]
+    chunks.append({**base, "object": "chat.completion.chunk",
+                   "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": completion["usage"]})
+    return chunks
+
+
+def _embed(item: Any) -> List[float]:
+    digest = hashlib.sha256(json.dumps(item).encode()).digest()
+    vector = np.random.default_rng(int.from_bytes(digest[:8], "little")).standard_normal(EMBEDDING_DIMENSIONS)
+    return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+
+def embeddings(body: Dict[str, Any]) -> Dict[str, Any]:
+    inputs = body.get("input")
+    if isinstance(inputs, str) or (isinstance(inputs, list) and inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    return {
+        "object": "list",
+        "data": [{"object": "embedding", "index": i, "embedding": _embed(item)} for i, item in enumerate(inputs)],
+        "model": body.get("model", "text-embedding-ada-002"),
+        "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+    }
+
+
+# ------------------------------------------------------------- data providers
+
+
+def _polygon(path: str, params: Dict[str, str]) -> Any:
+    if "/grouped/" in path:
+        return {"resultsCount": 3, "results": [
+            {"T": ticker, "o": _price(ticker), "h": _price(ticker) * 1.02, "l": _price(ticker) * 0.98,
+             "c": _price(ticker) * 1.01, "v": 1_000_000 + _seed(ticker) % 10**6}
+            for ticker in ("AAPL", "MSFT", "NVDA", "AMZN", "TSLA", "COIN")
+        ]}
+    ticker = path.split("/ticker/")[1].split("/")[0]
+    price = _price(ticker)
+    return {"ticker": ticker, "resultsCount": 1, "results": [
+        {"o": price, "h": round(price * 1.02, 2), "l": round(price * 0.98, 2), "c": round(price * 1.01, 2),
+         "v": 50_000_000 + _seed(ticker) % 10**7}
+    ]}
+
+
+def _coin_data(coin_id: str) -> Dict[str, Any]:
+    return {
+        "id": coin_id, "symbol": coin_id[:3], "name": coin_id.capitalize(),
+        "description": {"en": f"{coin_id.capitalize()} is a decentralized digital currency. It is widely traded."},
+        "market_data": {"current_price": {"usd": _price(coin_id, 2000)}, "market_cap": {"usd": 10**11 + _seed(coin_id)}},
+    }
+
+
+def _coingecko(path: str, params: Dict[str, str]) -> Any:
+    if path.endswith("/search"):
+        query = params.get("query", "bitcoin").lower()
+        return {"coins": [{"id": query, "name": query.capitalize(), "symbol": query[:3].upper()}]}
+    if path.endswith("/simple/price"):
+        return {coin: {"usd": _price(coin, 2000), "usd_24h_change": 1.5, "usd_24h_vol": 1e9}
+                for coin in params.get("ids", "").split(",") if coin}
+    if "/market_chart/range" in path:
+        coin_id = path.split("/coins/")[1].split("/")[0]
+        start, end = int(float(params["from"])), int(float(params["to"]))
+        step = 86400 if end - start > 90 * 86400 else 3600
+        stamps = range(start - start % step + step, end + 1, step)
+        base = _price(coin_id, 2000)
+        prices = [[t * 1000, round(base * (1 + 0.1 * math.sin(t / 864000)), 2)] for t in stamps]
+        return {"prices": prices, "total_volumes": [[t, 1e9] for t, _ in prices]}
+    return _coin_data(path.rsplit("/", 1)[1])
+
+
+def _coincap(path: str, params: Dict[str, str]) -> Any:
+    def asset(coin_id: str) -> Dict[str, Any]:
+        return {"id": coin_id, "name": coin_id.capitalize(), "symbol": coin_id[:3].upper(),
+                "priceUsd": str(_price(coin_id, 2000)), "changePercent24Hr": "1.2", "volumeUsd24Hr": "1000000000"}
+
+    if "ids" in params:
+        return {"data": [asset(coin_id) for coin_id in params["ids"].split(",")]}
+    return {"data": asset(path.rsplit("/", 1)[1])}
+
+
+def _fred(path: str, params: Dict[str, str]) -> Any:
+    return {"observations": [{"date": "2026-09-01", "value": str(round(_price(params.get("series_id", "GDP"), 3), 3))}]}
+
+
+def _world_bank(path: str, params: Dict[str, str]) -> Any:
+    parts = path.split("/")
+    country, indicator = parts[parts.index("country") + 1], parts[-1]
+    return [{"page": 1, "pages": 1}, [{
+        "indicator": {"id": indicator, "value": indicator}, "country": {"id": country, "value": country},
+        "date": "2025", "value": _price(country + indicator, 10**12),
+    }]]
+
+
+def _newsapi(path: str, params: Dict[str, str]) -> Any:
+    query = params.get("q", "markets")
+    return {"status": "ok", "totalResults": 5, "articles": [
+        {"title": f"{query}: headline {i}", "source": {"name": "Benchmark Wire"},
+         "description": f"Story {i} about {query} and the market's reaction.", "publishedAt": "2026-10-17T12:00:00Z"}
+        for i in range(1, 6)
+    ]}
+
+
+def _twelve_quote(symbol: str) -> Dict[str, Any]:
+    price = _price(symbol, 1.0)
+    return {"symbol": symbol, "close": str(price), "change": "0.0042", "percent_change": "0.38", "volume": "0"}
+
+
+def _twelve_data(path: str, params: Dict[str, str]) -> Any:
+    symbols = params.get("symbol", "").split(",")
+    if len(symbols) == 1:
+        return _twelve_quote(symbols[0])
+    return {symbol: _twelve_quote(symbol) for symbol in symbols}
+
+
+def _fmp(path: str, params: Dict[str, str]) -> Any:
+    return [
+        {"symbol": symbol, "price": _price(symbol), "change": 1.23, "changesPercentage": 0.8,
+         "dayHigh": _price(symbol) * 1.02, "dayLow": _price(symbol) * 0.98, "volume": 1_000_000}
+        for symbol in path.rsplit("/", 1)[1].split(",")
+    ]
+
+
+def _alpha_vantage(path: str, params: Dict[str, str]) -> Any:
+    function, symbol = params.get("function"), params.get("symbol", "AAPL")
+    if function == "OVERVIEW":
+        return {"Symbol": symbol, "Name": f"{symbol} Inc.", "Industry": "Technology",
+                "Description": f"{symbol} designs and sells products worldwide.", "LatestQuarter": "2026-06-30"}
+    if function == "INCOME_STATEMENT":
+        return {"symbol": symbol, "annualReports": [
+            {"fiscalDateEnding": "2025-12-31", "totalRevenue": "391035000000", "netIncome": "93736000000"}
+        ]}
+    return {"Global Quote": {"01. symbol": symbol, "05. price": str(_price(symbol)), "09. change": "0.51"}}
+
+
+PROVIDERS: Dict[str, Callable[[str, Dict[str, str]], Any]] = {
+    "api.polygon.io": _polygon,
+    "api.coingecko.com": _coingecko,
+    "api.coincap.io": _coincap,
+    "api.stlouisfed.org": _fred,
+    "api.worldbank.org": _world_bank,
+    "newsapi.org": _newsapi,
+    "api.twelvedata.com": _twelve_data,
+    "financialmodelingprep.com": _fmp,
+    "www.alphavantage.co": _alpha_vantage,
+}
+
+
+class StubServer:
+    """The fake OpenAI and provider APIs on a local port, served from a background thread."""
+
+    def __init__(self, llm_latency: float = 0.05, provider_latency: float = 0.02):
+        self.llm_latency = llm_latency
+        self.provider_latency = provider_latency
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="benchmark-stubs", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: Any) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, chunks: List[Dict[str, Any]]) -> None:
+                data = b"".join(f"data: {json.dumps(chunk)}\n\n".encode() for chunk in chunks) + b"data: [DONE]\n\n"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                time.sleep(stub.llm_latency)
+                if self.path.endswith("/embeddings"):
+                    stub.count("openai_embeddings")
+                    return self._send(200, embeddings(body))
+                if self.path.endswith("/chat/completions"):
+                    stub.count("openai_chat")
+                    completion = chat_completion(body)
+                    if body.get("stream"):
+                        return self._send_stream(_stream_chunks(completion))
+                    return self._send(200, completion)
+                self._send(404, {"error": {"message": f"no stub for POST {self.path}"}})
+
+            def do_GET(self):
+                host = (self.headers.get("Host") or "").split(":")[0]
+                handler = PROVIDERS.get(host)
+                if handler is None:
+                    return self._send(404, {"error": f"no stub for {host}"})
+                url = urlsplit(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                time.sleep(stub.provider_latency)
+                stub.count(host)
+                self._send(200, handler(url.path, params))
+
+        return Handler
+
+
+def _redirect(request: httpx.Request, port: int) -> None:
+    # The Host header keeps the provider's name, which is what the stub matches on.
+    request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=port)
+
+
+class RedirectTransport(httpx.HTTPTransport):
+    """Sends every request to the stub server."""
+
+    def __init__(self, port: int, **kwargs):
+        super().__init__(**kwargs)
+        self.port = port
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _redirect(request, self.port)
+        return super().handle_request(request)
+
+
+class AsyncRedirectTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, port: int, **kwargs):
+        super().__init__(**kwargs)
+        self.port = port
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _redirect(request, self.port)
+        return await super().handle_async_request(request)
+
+
+class FakeTicker:
+    """``yfinance.Ticker`` with generated profile, quote and daily history."""
+
+    latency = 0.02
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker.upper()
+        price = _price(self.ticker)
+        self.fast_info = SimpleNamespace(
+            market_cap=price * 15e9, previous_close=price, day_high=price * 1.02, day_low=price * 0.98
+        )
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return {
+            "longName": f"{self.ticker} Inc.", "sector": "Technology", "industry": "Consumer Electronics",
+            "longBusinessSummary": f"{self.ticker} designs and sells products worldwide.",
+            "totalRevenue": 391035000000, "netIncomeToCommon": 93736000000,
+            "mostRecentQuarter": 1782777600,
+            "earningsTimestamp": int((datetime.now(timezone.utc) + timedelta(days=20)).timestamp()),
+        }
+
+    def history(self, start: datetime, end: datetime, interval: str = "1d") -> pd.DataFrame:
+        time.sleep(self.latency)
+        days = pd.bdate_range(start.date(), end.date() - timedelta(days=1), tz="UTC")
+        base = _price(self.ticker)
+        closes = [base * (1 + 0.05 * math.sin(day.timestamp() / 864000)) for day in days]
+        return pd.DataFrame({"Close": closes, "Volume": [1_000_000.0] * len(days)}, index=days)
@@ -0,0 +1,122 @@
+"""Measures the fast-path router against labelled queries.
+
+Two sets are reported separately. The tuning set is the router prompt's own
+EXAMPLES block plus paraphrases of the same intents; the keyword rules were
+written against it, so it only shows that they still cover those intents. The
+held-out set was written apart from the rules, in the way users phrase things
+(terse, lowercase, generic words like "outlook"), and is the one to judge the
+rules by. ``--held-out`` adds labelled queries from a JSONL file of
+``{"query": ..., "route": ...}`` lines, e.g. sampled from production logs.
+
+For each query the fast path either answers (confidence at or above the
+threshold) or defers to the LLM router; the report shows accuracy on the
+answered queries and how often the LLM call was avoided. No API keys needed.
+
+    python -m marketminds.scripts.evaluate_router --threshold 0.8 --held-out labelled.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Tuple
+
+from marketminds.fast_router import classify
+from marketminds.templates import ROUTER_EXAMPLES
+
+PARAPHRASES = [
+    ("price of Bitcoin", "crypto_analysis"),
+    ("news on Tesla", "news_analysis"),
+    ("latest NVIDIA news", "news_analysis"),
+    ("what's the news on Nvidia", "news_analysis"),
+    ("Show me Apple's income statement", "financial_analysis"),
+    ("AAPL revenue and net income", "financial_analysis"),
+    ("Explain dollar-cost averaging", "knowledge_base_query"),
+    ("What are the principles of value investing?", "knowledge_base_query"),
+    ("How much is one Ethereum worth right now?", "crypto_analysis"),
+    ("Current inflation rate in the US", "economic_analysis"),
+    ("What's Germany's GDP?", "economic_analysis"),
+    ("EUR/USD exchange rate", "global_market_quote"),
+    ("Where is the NASDAQ trading today?", "global_market_quote"),
+    ("Bitcoin price history over the last 90 days", "crypto_historical"),
+    ("Headlines and earnings for Microsoft", "news_and_financials"),
+    ("Tesla sentiment and explain growth investing", "news_and_research"),
+    ("Amazon's balance sheet and what is index fund investing", "financials_and_research"),
+    ("Any news about Solana?", "news_and_crypto"),
+    ("Coinbase revenue and the price of Ethereum", "financials_and_crypto"),
+    ("Why did tech stocks fall after the Fed meeting?", "reasoning_query"),
+    ("What if inflation keeps rising, how will growth stocks be affected?", "reasoning_query"),
+    ("How will higher interest rates impact Bitcoin?", "reasoning_query"),
+]
+
+TUNING_QUERIES = list(ROUTER_EXAMPLES) + PARAPHRASES
+
+HELD_OUT_QUERIES = [
+    ("tsla news today", "news_analysis"),
+    ("Is there any recent news about Amazon layoffs?", "news_analysis"),
+    ("show me microsoft's cash flow statement", "financial_analysis"),
+    ("What was Nvidia's revenue last quarter?", "financial_analysis"),
+    ("What's the market cap of Apple?", "financial_analysis"),
+    ("what is diversification", "knowledge_base_query"),
+    ("Can you explain asset allocation for a beginner?", "knowledge_base_query"),
+    ("eth price", "crypto_analysis"),
+    ("How much is Dogecoin trading at?", "crypto_analysis"),
+    ("What is the outlook for Bitcoin?", "crypto_analysis"),
+    ("Show me the Solana chart for the past 30 days", "crypto_historical"),
+    ("What's the US unemployment rate right now?", "economic_analysis"),
+    ("Is the economy heading into a recession?", "economic_analysis"),
+    ("What's the price of crude oil?", "global_market_quote"),
+    ("USD/JPY rate", "global_market_quote"),
+    ("How is the S&P 500 doing today?", "global_market_quote"),
+    ("Apple headlines and its latest earnings", "news_and_financials"),
+    ("Latest Bitcoin headlines", "news_and_crypto"),
+    ("Why is Nvidia stock down today?", "reasoning_query"),
+    ("What would a rate cut mean for tech stocks?", "reasoning_query"),
+    ("Predict where Tesla's stock goes next year", "reasoning_query"),
+]
+
+
+def load_labelled(path: str) -> List[Tuple[str, str]]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [(row["query"], row["route"]) for row in map(json.loads, file) if row]
+
+
+def evaluate(name: str, queries: List[Tuple[str, str]], threshold: float) -> bool:
+    """Prints one line per query and a summary; True if every answered query was right."""
+    answered = correct = 0
+    for query, expected in queries:
+        route, confidence = classify(query)
+        if confidence >= threshold:
+            answered += 1
+            correct += route == expected
+            outcome = "ok " if route == expected else "BAD"
+        else:
+            outcome = "llm"
+        print(f"[{outcome}] {confidence:.2f} {str(route):<24} expected {expected:<24} {query}")
+
+    total = len(queries)
+    accuracy = correct / answered if answered else 0.0
+    print(f"--- Fast-path router: {name} ---")
+    print(f"Labelled queries: {total}")
+    print(f"LLM router avoided: {answered}/{total} ({answered / total:.0%})")
+    print(f"Fast-path accuracy: {correct}/{answered} ({accuracy:.0%})\n")
+    return correct == answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the fast-path router.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("FAST_ROUTER_THRESHOLD", "0.8")),
+    )
+    parser.add_argument("--held-out", help="JSONL file of extra labelled queries to add to the held-out set.")
+    args = parser.parse_args()
+
+    held_out = HELD_OUT_QUERIES + (load_labelled(args.held_out) if args.held_out else [])
+    tuning_ok = evaluate(f"tuning set ({len(ROUTER_EXAMPLES)} from the router prompt)", TUNING_QUERIES, args.threshold)
+    held_out_ok = evaluate("held-out set", held_out, args.threshold)
+    return 0 if tuning_ok and held_out_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
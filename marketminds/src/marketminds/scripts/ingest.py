@@ -1,16 +1,111 @@
+import hashlib
+import json
 import os
+import shutil
+from datetime import datetime
 from dotenv import load_dotenv
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain_chroma import Chroma
 
 load_dotenv()
 
-PERSIST_DIRECTORY = "./storage"
+# The live index is STORAGE_ROOT/current, a symlink to one of STORAGE_ROOT/versions/*.
+# CHROMA_DB_DIR defaults to ./storage/current, so the server reads it as is.
+STORAGE_ROOT = os.getenv("INGEST_STORAGE_ROOT", "./storage")
+CURRENT_LINK = os.path.join(STORAGE_ROOT, "current")
+VERSIONS_DIR = os.path.join(STORAGE_ROOT, "versions")
+MANIFEST_FILE = "manifest.json"
+# Files of the single index that used to live directly in STORAGE_ROOT.
+LEGACY_INDEX_FILE = "chroma.sqlite3"
 
 KNOWLEDGE_BASE_DIR = "./knowledge_base"
 
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+KEEP_VERSIONS = int(os.getenv("INGEST_KEEP_VERSIONS", "2"))
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(index_dir: str) -> dict:
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_manifest(index_dir: str, manifest: dict):
+    with open(os.path.join(index_dir, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def chunk_document(document, text_splitter):
+    """Splits a document and gives every chunk a content-derived ID.
+
+    The ID hashes the source, the chunk text and how many identical chunks came
+    before it in the same file, so unchanged chunks keep their ID when other
+    parts of the file are edited.
+    """
+    source = document.metadata["source"]
+    seen = {}
+    chunks = {}
+    for chunk in text_splitter.split_documents([document]):
+        content_hash = sha256(chunk.page_content)
+        occurrence = seen.get(content_hash, 0)
+        seen[content_hash] = occurrence + 1
+        chunks[sha256(f"{source}\0{content_hash}\0{occurrence}")] = chunk
+    return chunks
+
+
+def swap_current(version_dir: str):
+    """Atomically repoints CURRENT_LINK at version_dir."""
+    tmp_link = f"{CURRENT_LINK}.tmp-{os.getpid()}"
+    os.symlink(os.path.relpath(version_dir, STORAGE_ROOT), tmp_link)
+    os.replace(tmp_link, CURRENT_LINK)
+
+
+def prune_versions(keep_dir: str):
+    versions = sorted(
+        os.path.join(VERSIONS_DIR, name) for name in os.listdir(VERSIONS_DIR)
+    )
+    stale = [path for path in versions if os.path.realpath(path) != os.path.realpath(keep_dir)]
+    for path in stale[: max(0, len(stale) - (KEEP_VERSIONS - 1))]:
+        print(f"Removing old index version: {path}")
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_legacy_index():
+    """Deletes the index older versions of this script built directly in STORAGE_ROOT.
+
+    Its chunks have random IDs and no manifest, so it cannot be updated
+    incrementally; the first run builds a fresh version instead.
+    """
+    legacy_file = os.path.join(STORAGE_ROOT, LEGACY_INDEX_FILE)
+    if not os.path.exists(legacy_file):
+        return
+    print(f"Removing the old unversioned index in {STORAGE_ROOT}")
+    os.remove(legacy_file)
+    # Chroma keeps each collection's vectors in a directory named after its UUID.
+    for name in os.listdir(STORAGE_ROOT):
+        path = os.path.join(STORAGE_ROOT, name)
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, "header.bin")):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def set_aside_unmanaged_current():
+    """Moves a plain CURRENT_LINK directory (e.g. created by a server started before the first run) out of the way."""
+    if os.path.isdir(CURRENT_LINK) and not os.path.islink(CURRENT_LINK):
+        aside = f"{CURRENT_LINK}.unmanaged-{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+        print(f"{CURRENT_LINK} is not a symlink managed by this script; moving it to {aside}")
+        os.replace(CURRENT_LINK, aside)
+
+
 def main():
     print("--- Starting Data Ingestion ---")
 
@@ -23,27 +118,81 @@ def main():
 
     print(f"Loaded {len(documents)} document(s).")
 
-    print("Splitting documents into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    texts = text_splitter.split_documents(documents)
-    print(f"Split into {len(texts)} chunks.")
+    set_aside_unmanaged_current()
+    if os.path.exists(CURRENT_LINK) and not os.path.islink(CURRENT_LINK):
+        print(f"Error: {CURRENT_LINK} must be a symlink managed by this script. Move it away and re-run.")
+        return
 
-    print("Creating embeddings with OpenAI")
-    embeddings = OpenAIEmbeddings()
+    embeddings = OpenAIEmbeddings(chunk_size=EMBED_BATCH_SIZE)
+    settings = {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embedding_model": embeddings.model,
+    }
 
-    if os.path.exists(PERSIST_DIRECTORY):
-        print("Deleting old vector store...")
-        import shutil
-        shutil.rmtree(PERSIST_DIRECTORY)
+    live_dir = os.path.realpath(CURRENT_LINK) if os.path.islink(CURRENT_LINK) else None
+    old_manifest = load_manifest(live_dir) if live_dir else {}
+    if old_manifest.get("settings") != settings:
+        if old_manifest:
+            print("Chunking or embedding settings changed; rebuilding from scratch.")
+        old_manifest = {}
+    old_files = old_manifest.get("files", {})
 
-    print(f"Creating and persisting vector store at: {PERSIST_DIRECTORY}")
-    db = Chroma.from_documents(
-        texts, 
-        embeddings, 
-        persist_directory=PERSIST_DIRECTORY
-    )
-    db.persist()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    new_files = {}
+    chunks_to_add = {}
+    ids_to_delete = []
+    for document in documents:
+        source = document.metadata["source"]
+        file_hash = sha256(document.page_content)
+        previous = old_files.get(source)
+        if previous and previous["sha256"] == file_hash:
+            new_files[source] = previous
+            continue
+        chunks = chunk_document(document, text_splitter)
+        old_ids = set(previous["chunk_ids"]) if previous else set()
+        chunks_to_add.update({cid: c for cid, c in chunks.items() if cid not in old_ids})
+        ids_to_delete.extend(old_ids - chunks.keys())
+        new_files[source] = {"sha256": file_hash, "chunk_ids": sorted(chunks)}
+
+    for source in old_files.keys() - new_files.keys():
+        print(f"Removed from knowledge base: {source}")
+        ids_to_delete.extend(old_files[source]["chunk_ids"])
+
+    if old_manifest and not chunks_to_add and not ids_to_delete:
+        print("Knowledge base is unchanged; the live index is up to date.")
+        print("--- Ingestion Complete ---")
+        return
+
+    print(f"{len(chunks_to_add)} chunk(s) to embed, {len(ids_to_delete)} chunk(s) to delete.")
+
+    # Build the next version beside the live one; the server keeps reading the
+    # live index until the symlink swap below.
+    version_dir = os.path.join(VERSIONS_DIR, datetime.now().strftime("%Y%m%dT%H%M%S%f"))
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    if old_manifest:
+        print(f"Copying live index {live_dir} -> {version_dir}")
+        shutil.copytree(live_dir, version_dir)
+    else:
+        print(f"Creating new vector store at: {version_dir}")
+        os.makedirs(version_dir)
+
+    db = Chroma(persist_directory=version_dir, embedding_function=embeddings)
+    if ids_to_delete:
+        db.delete(ids=ids_to_delete)
+
+    pending = list(chunks_to_add.items())
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        batch = pending[start : start + EMBED_BATCH_SIZE]
+        print(f"Embedding chunks {start + 1}-{start + len(batch)} of {len(pending)}")
+        db.add_documents([chunk for _, chunk in batch], ids=[cid for cid, _ in batch])
+
+    write_manifest(version_dir, {"settings": settings, "files": new_files})
+    swap_current(version_dir)
+    print(f"Live index now points at: {version_dir}")
+    prune_versions(version_dir)
+    remove_legacy_index()
     print("--- Ingestion Complete ---")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,14 +1,19 @@
+import math
 import os
-import requests
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from typing import Annotated, Dict
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from langserve import add_routes
+from sse_starlette.sse import EventSourceResponse
 from dotenv import load_dotenv
 
-from . import auth, schemas
+from . import auth, fundamentals_store, http_client, metrics, passwords, provider_health, schemas
+from .batch_quotes import QUOTE_BATCH_MAX_SYMBOLS, afetch_quotes
+from .coalescing import run_coalescer
 from .chain import (
     NewsAnalysisChain, FinancialAnalysisChain, KnowledgeSearchChain,
     CryptoAnalysisChain, EconomicAnalysisChain, GlobalMarketChain, CryptoHistoricalChain,
@@ -16,7 +21,16 @@ from .chain import (
     NewsAndCryptoChain, FinancialsAndCryptoChain, FullAnalysisChain, MasterChain,
     SimpleInput
 )
-from .database import get_db
+from .crew_executor import (
+    CREW_RETRY_AFTER_SECONDS, CrewExecutorOverloaded, UserConcurrencyLimitExceeded, crew_executor
+)
+from .database import dispose_engines, get_async_db, init_db, pool_stats
+from .history_store import get_history_store
+from .outbox import outbox_dispatcher
+from .prewarm import prewarm_scheduler
+from .quote_cache import quote_cache
+from .response_cache import response_cache
+from .streaming import stream_chain
 from .tools.custom_tool import NewsSearchTool
 
 load_dotenv()
@@ -27,28 +41,61 @@ app = FastAPI(
 )
 app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:3000", "https://marketminds-omega.vercel.app"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
-def trigger_onboarding_webhook(user_data: dict):
-    webhook_url = os.getenv("N8N_ONBOARDING_WEBHOOK_URL")
-    if webhook_url:
-        try:
-            payload = {"email": user_data.get("email")}
-            requests.post(webhook_url, json=payload)
-            print(f"INFO: Triggered onboarding webhook for {user_data.get('email')}")
-        except Exception as e:
-            print(f"ERROR: Failed to trigger n8n onboarding webhook. Error: {e}")
+DB_CREATE_SCHEMA_ON_STARTUP = os.getenv("DB_CREATE_SCHEMA_ON_STARTUP", "true").lower() == "true"
+
+@app.on_event("startup")
+def create_schema():
+    # Deployments that migrate separately (python -m marketminds.database) can turn this off.
+    if DB_CREATE_SCHEMA_ON_STARTUP:
+        init_db()
+
+@app.on_event("startup")
+async def start_outbox_dispatcher():
+    outbox_dispatcher.start()
+
+@app.on_event("shutdown")
+async def stop_outbox_dispatcher():
+    await outbox_dispatcher.stop()
+
+@app.on_event("startup")
+async def start_prewarm_scheduler():
+    prewarm_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_prewarm_scheduler():
+    await prewarm_scheduler.stop()
+
+@app.on_event("shutdown")
+async def close_database():
+    await dispose_engines()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    http_client.close()
+    await http_client.aclose()
+
+@app.on_event("shutdown")
+def shutdown_worker_pools():
+    crew_executor.shutdown()
+    passwords.shutdown()
 
 security = HTTPBearer()
-async def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)], db: Session = Depends(get_db)):
-    """Decodes the JWT token and fetches the user from the PostgreSQL database."""
+async def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)]) -> schemas.User:
+    """Decodes the JWT token and resolves the user, from the principal cache when possible."""
     token = credentials.credentials
     username = auth.decode_access_token(token)
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    
-    user = auth.get_user(db, username=username) # This now calls the database function
+
+    if auth.AUTH_TRUST_TOKEN_CLAIMS:
+        return schemas.User(username=username)
+
+    user = auth.principal_cache.get(username)
+    if user is None:
+        user = await auth.load_principal(username)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    
+
     return user
 
 def get_session_info(user: Annotated[schemas.User, Depends(get_current_user)]) -> Dict:
@@ -59,21 +106,34 @@ def read_root():
     return {"message": "Welcome to MarketMinds v4.0. Go to /docs to see all endpoints."}
 
 @app.post("/signup", response_model=schemas.User, tags=["Authentication"])
-async def signup(user_in: schemas.UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    db_user = auth.get_user(db, username=user_in.email)
+async def signup(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await auth.aget_user(db, username=user_in.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    auth.create_user(db=db, user=user_in)
-    background_tasks.add_task(trigger_onboarding_webhook, {"email": user_in.email})
+    # Give the connection back to the pool while the password is hashed.
+    await db.close()
+    hashed_password = await passwords.ahash_password(user_in.password)
+    try:
+        await auth.acreate_user(db=db, user=user_in, hashed_password=hashed_password)
+    except IntegrityError:
+        # A concurrent signup for the same email committed while this one was hashing.
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
+    outbox_dispatcher.notify()
     return schemas.User(username=user_in.email)
 
 @app.post("/token", response_model=schemas.Token, tags=["Authentication"])
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth.get_user(db, username=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await auth.aget_user(db, username=form_data.username)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password")
+    await db.close()
+    valid, new_hash = await passwords.averify_and_update(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password")
-    
+    if new_hash:
+        await auth.aupdate_password_hash(db, user.username, new_hash)
+
     access_token = auth.create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -85,6 +145,86 @@ def get_news_for_automation(search_query: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/internal/quote-cache", tags=["Internal Automation"])
+def get_quote_cache_stats():
+    return quote_cache.stats()
+
+@app.get("/api/internal/response-cache", tags=["Internal Automation"])
+def get_response_cache_stats():
+    return response_cache.stats()
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Stage latency histograms and provider response counters in the Prometheus format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/internal/chat-coalescing", tags=["Internal Automation"])
+def get_chat_coalescing_stats():
+    return run_coalescer.stats()
+
+@app.get("/api/internal/crew-executor", tags=["Internal Automation"])
+def get_crew_executor_stats():
+    return crew_executor.stats()
+
+@app.get("/api/internal/db-pool", tags=["Internal Automation"])
+def get_db_pool_stats():
+    return pool_stats()
+
+@app.get("/api/internal/history-store", tags=["Internal Automation"])
+def get_history_store_stats():
+    return get_history_store().stats
+
+@app.get("/api/internal/fundamentals-store", tags=["Internal Automation"])
+def get_fundamentals_store_stats():
+    return fundamentals_store.stats()
+
+@app.get("/api/internal/http-client", tags=["Internal Automation"])
+def get_http_client_stats():
+    return http_client.stats()
+
+@app.get("/api/internal/prewarm", tags=["Internal Automation"])
+def get_prewarm_stats():
+    return prewarm_scheduler.stats()
+
+@app.post("/api/internal/prewarm", tags=["Internal Automation"])
+async def run_prewarm(current_user: Annotated[schemas.User, Depends(get_current_user)]):
+    """Warms the caches for the most requested entities now, outside the schedule.
+
+    Each run spends provider quota, so runs are spaced by PREWARM_MIN_FULL_INTERVAL_SECONDS.
+    """
+    retry_after = prewarm_scheduler.seconds_until_full_warm()
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="A pre-warm ran recently; try again later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    return await prewarm_scheduler.warm()
+
+@app.get("/api/internal/providers", tags=["Internal Automation"])
+def get_provider_health():
+    return provider_health.stats()
+
+@app.get("/api/internal/outbox", tags=["Internal Automation"])
+async def get_outbox_stats():
+    return await outbox_dispatcher.stats()
+
+@app.exception_handler(CrewExecutorOverloaded)
+async def crew_executor_overloaded_handler(request, exc: CrewExecutorOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(CREW_RETRY_AFTER_SECONDS)},
+    )
+
+@app.exception_handler(UserConcurrencyLimitExceeded)
+async def user_concurrency_limit_handler(request, exc: UserConcurrencyLimitExceeded):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(CREW_RETRY_AFTER_SECONDS)},
+    )
+
 add_routes(app, NewsAnalysisChain, path="/api/v1/agents/news")
 add_routes(app, FinancialAnalysisChain, path="/api/v1/agents/financials")
 add_routes(app, KnowledgeSearchChain, path="/api/v1/agents/research")
@@ -99,6 +239,16 @@ add_routes(app, NewsAndCryptoChain, path="/api/v1/agents/news_and_crypto")
 add_routes(app, FinancialsAndCryptoChain, path="/api/v1/agents/financials_and_crypto")
 add_routes(app, FullAnalysisChain, path="/api/v1/agents/full_analysis")
 
+@app.post("/api/v1/quotes", response_model=schemas.QuoteBatchResponse, tags=["Market Data"])
+async def get_quotes(
+    request: schemas.QuoteBatchRequest,
+    current_user: Annotated[schemas.User, Depends(get_current_user)]
+):
+    """Latest quotes for a list of symbols, fetched with the providers' multi-symbol endpoints."""
+    if len(request.symbols) > QUOTE_BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=422, detail=f"At most {QUOTE_BATCH_MAX_SYMBOLS} symbols per request.")
+    return await afetch_quotes(request.symbols)
+
 @app.post("/api/v1/chat", tags=["Master Conversational AI"])
 async def chat(
     request: SimpleInput,
@@ -108,6 +258,21 @@ async def chat(
         config = {"configurable": {"session_id": current_user.username}}
         response = await MasterChain.ainvoke({"input": request.input}, config=config)
         return response
+    except (CrewExecutorOverloaded, UserConcurrencyLimitExceeded):
+        raise
     except Exception as e:
         print(f"An error occurred in the chat endpoint: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/chat/stream", tags=["Master Conversational AI"])
+async def chat_stream(
+    request: SimpleInput,
+    current_user: Annotated[schemas.User, Depends(get_current_user)]
+):
+    """Same as /api/v1/chat, sent as server-sent events while the crew works.
+
+    Events: route, task_started, task_completed, task_failed, tool_started,
+    tool_finished, tool_failed and token, then a final result or error.
+    """
+    config = {"configurable": {"session_id": current_user.username}}
+    return EventSourceResponse(stream_chain(MasterChain, {"input": request.input}, config))
\ No newline at end of file
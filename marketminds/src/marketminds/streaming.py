@@ -0,0 +1,227 @@
+"""Server-sent events for the streaming chat endpoint.
+
+``stream_chain`` runs a chain with a per-request ``ChatEventStream`` bound in a
+context variable. The chain and the crewai event bus push events into it from
+whatever thread the crew runs on: the chosen route, tasks starting and
+finishing, tool calls, and the tokens of each agent's final answer. Context
+variables follow ``asyncio`` tasks and langchain's executor hops; thread pools
+the chain submits to directly must copy the context themselves.
+
+A crew run shared by several requests is bound to an ``EventFanout`` instead,
+which forwards every event to each subscribed request's stream and replays
+what a late subscriber missed.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from crewai.events import (
+    LLMCallStartedEvent,
+    LLMStreamChunkEvent,
+    TaskCompletedEvent,
+    TaskFailedEvent,
+    TaskStartedEvent,
+    ToolUsageErrorEvent,
+    ToolUsageFinishedEvent,
+    ToolUsageStartedEvent,
+    crewai_event_bus,
+)
+from langchain_core.runnables import Runnable
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+class _FinalAnswerFilter:
+    """Tracks each LLM call's text so only what follows "Final Answer:" is sent as tokens."""
+
+    # Whether agents should use the token-streaming LLMs.
+    streaming = True
+
+    def __init__(self):
+        # Text of LLM calls still waiting for their final-answer marker, by
+        # (agent, thread); None once the marker has been seen.
+        self._pending: Dict[tuple, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def start_llm_call(self, agent_id: Any) -> None:
+        with self._lock:
+            self._pending[(agent_id, threading.get_ident())] = ""
+
+    def final_answer_text(self, agent_id: Any, chunk: str) -> str:
+        """Returns the part of ``chunk`` that belongs to the final answer, if any."""
+        key = (agent_id, threading.get_ident())
+        with self._lock:
+            buffered = self._pending.get(key, "")
+            if buffered is None:
+                return chunk
+            buffered += chunk
+            marker = buffered.find(FINAL_ANSWER_MARKER)
+            if marker < 0:
+                self._pending[key] = buffered
+                return ""
+            self._pending[key] = None
+            return buffered[marker + len(FINAL_ANSWER_MARKER):].lstrip()
+
+
+class ChatEventStream(_FinalAnswerFilter):
+    """Thread-safe queue of events for one streaming request."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[Dict[str, str]]]" = asyncio.Queue()
+        self.closed = False
+
+    def emit(self, event: str, **data: Any) -> None:
+        if self.closed:
+            return
+        message = {"event": event, "data": json.dumps(data, default=str)}
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+class EventFanout(_FinalAnswerFilter):
+    """Forwards the events of one shared run to every subscribed stream."""
+
+    def __init__(self, streaming: bool, history: int = 2000):
+        super().__init__()
+        self.streaming = streaming
+        self._subscribers: List[ChatEventStream] = []
+        self._history: deque = deque(maxlen=history)
+        self._fanout_lock = threading.Lock()
+
+    def subscribe(self, stream: ChatEventStream) -> None:
+        """Adds ``stream``, first replaying the events it missed."""
+        with self._fanout_lock:
+            for event, data in self._history:
+                stream.emit(event, **data)
+            self._subscribers.append(stream)
+
+    def unsubscribe(self, stream: ChatEventStream) -> None:
+        with self._fanout_lock:
+            if stream in self._subscribers:
+                self._subscribers.remove(stream)
+
+    def emit(self, event: str, **data: Any) -> None:
+        with self._fanout_lock:
+            self._history.append((event, data))
+            subscribers = list(self._subscribers)
+        for stream in subscribers:
+            stream.emit(event, **data)
+
+
+current_stream: ContextVar[Optional[Union[ChatEventStream, EventFanout]]] = ContextVar(
+    "marketminds_chat_stream", default=None
+)
+
+
+def is_streaming() -> bool:
+    stream = current_stream.get()
+    return stream is not None and stream.streaming
+
+
+def emit(event: str, **data: Any) -> None:
+    """Sends an event to the current request's stream; a no-op outside one."""
+    stream = current_stream.get()
+    if stream is not None:
+        stream.emit(event, **data)
+
+
+def _task_name(task: Any) -> Optional[str]:
+    return getattr(task, "name", None) or getattr(task, "description", None)
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _on_task_started(source, event):
+    emit("task_started", task=_task_name(event.task))
+
+
+@crewai_event_bus.on(TaskCompletedEvent)
+def _on_task_completed(source, event):
+    emit("task_completed", task=_task_name(event.task), output=getattr(event.output, "raw", None))
+
+
+@crewai_event_bus.on(TaskFailedEvent)
+def _on_task_failed(source, event):
+    emit("task_failed", task=_task_name(event.task), error=event.error)
+
+
+@crewai_event_bus.on(ToolUsageStartedEvent)
+def _on_tool_started(source, event):
+    emit("tool_started", tool=event.tool_name, args=event.tool_args, agent=event.agent_role)
+
+
+@crewai_event_bus.on(ToolUsageFinishedEvent)
+def _on_tool_finished(source, event):
+    emit("tool_finished", tool=event.tool_name, agent=event.agent_role, from_cache=event.from_cache)
+
+
+@crewai_event_bus.on(ToolUsageErrorEvent)
+def _on_tool_error(source, event):
+    emit("tool_failed", tool=event.tool_name, agent=event.agent_role, error=str(event.error))
+
+
+@crewai_event_bus.on(LLMCallStartedEvent)
+def _on_llm_call_started(source, event):
+    stream = current_stream.get()
+    if stream is not None:
+        stream.start_llm_call(event.agent_id)
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _on_llm_chunk(source, event):
+    stream = current_stream.get()
+    if stream is None or event.tool_call is not None:
+        return
+    text = stream.final_answer_text(event.agent_id, event.chunk)
+    if text:
+        stream.emit("token", text=text, agent=event.agent_role, task=event.task_name)
+
+
+async def stream_chain(
+    chain: Runnable, input: Dict, config: Optional[Dict] = None
+) -> AsyncIterator[Dict[str, str]]:
+    """Runs ``chain`` and yields its events in ``sse_starlette`` format.
+
+    The last event is ``result`` (the chain output) or ``error``.
+    """
+    stream = ChatEventStream(asyncio.get_running_loop())
+
+    async def run():
+        try:
+            result = await chain.ainvoke(input, config=config)
+            output = result.get("output")
+            stream.emit(
+                "result",
+                output=output if isinstance(output, str) else str(output),
+                cached=result.get("cached", False),
+            )
+        except Exception as e:
+            print(f"An error occurred in the chat stream: {e}")
+            stream.emit("error", detail=str(e))
+        finally:
+            stream.close()
+
+    token = current_stream.set(stream)
+    try:
+        # The task copies the current context, so the crew sees this stream.
+        run_task = asyncio.create_task(run())
+    finally:
+        current_stream.reset(token)
+
+    try:
+        while (message := await stream.queue.get()) is not None:
+            yield message
+    finally:
+        # Client went away: stop forwarding events. Crew threads already
+        # running finish on their own.
+        stream.closed = True
+        if not run_task.done():
+            run_task.cancel()
@@ -1,11 +1,8 @@
+import re
+
 from langchain_core.prompts import ChatPromptTemplate
 
-# This is the final, fully-featured "brain" prompt.
-MASTER_ROUTER_PROMPT = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """You are an expert at routing an investor's request to the correct specialized workflow.
+MASTER_ROUTER_SYSTEM_PROMPT = """You are an expert at routing an investor's request to the correct specialized workflow.
     Based on the user's query, you must select the best chain to handle the request. You have the following options:
 
     - `news_analysis`: For questions ONLY about recent news or market sentiment.
@@ -40,6 +37,30 @@ MASTER_ROUTER_PROMPT = ChatPromptTemplate.from_messages(
     User Query: "Get me the financials for Coinbase and the current price of Bitcoin." -> ROUTE: financials_and_crypto
     
     User Query: "Give me a full report on NVIDIA including news, financials, and also explain what value investing means." -> ROUTE: full_analysis
+    """
+
+# This is the final, fully-featured "brain" prompt.
+MASTER_ROUTER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", MASTER_ROUTER_SYSTEM_PROMPT),
+        ("human", "{question}"),
+    ]
+)
+
+# (query, route) pairs from the prompt's EXAMPLES block, used to evaluate the fast-path router.
+ROUTER_EXAMPLES = re.findall(
+    r'User Query: "(.+?)" -> ROUTE: (\w+)', MASTER_ROUTER_SYSTEM_PROMPT
+)
+
+# Routing plus entity extraction in one call, so compound queries need a single LLM round trip.
+ROUTER_EXTRACTOR_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            MASTER_ROUTER_SYSTEM_PROMPT
+            + """
+    In the same answer, also extract all relevant entities from the user's request.
+    Infer tickers and IDs.
     """,
         ),
         ("human", "{question}"),
@@ -0,0 +1,221 @@
+"""Vectorized price series shared by the historical-data tools.
+
+``PriceSeries`` holds timestamps, prices and (optionally) volumes as NumPy
+arrays and computes OHLC bars, returns, rolling volatility, drawdown and moving
+averages without Python-level loops. ``series_cache`` keeps recently fetched
+series so other tools can reuse them instead of calling the provider again;
+a cached longer window also serves shorter ones.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+WEEK_MS = 7 * DAY_MS
+# 1970-01-01 was a Thursday; shifting by four days starts weeks on Monday.
+_WEEK_OFFSET_MS = 4 * DAY_MS
+
+FREQUENCIES = {"hour": HOUR_MS, "day": DAY_MS, "week": WEEK_MS}
+# Crypto trades every day, so a year has 365 daily bars.
+PERIODS_PER_YEAR = {"hour": 365 * 24, "day": 365, "week": 52}
+
+SERIES_CACHE_TTL_SECONDS = float(os.getenv("SERIES_CACHE_TTL_SECONDS", "300"))
+SERIES_CACHE_MAX_ENTRIES = int(os.getenv("SERIES_CACHE_MAX_ENTRIES", "256"))
+
+
+class PriceSeries:
+    """A time-ordered price series; timestamps are epoch milliseconds."""
+
+    def __init__(self, timestamps: np.ndarray, prices: np.ndarray, volumes: Optional[np.ndarray] = None):
+        order = np.argsort(timestamps, kind="stable")
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)[order]
+        self.prices = np.asarray(prices, dtype=np.float64)[order]
+        self.volumes = None if volumes is None else np.asarray(volumes, dtype=np.float64)[order]
+
+    @classmethod
+    def from_sorted(
+        cls, timestamps: np.ndarray, prices: np.ndarray, volumes: Optional[np.ndarray] = None
+    ) -> "PriceSeries":
+        """Wraps arrays already in timestamp order without copying (e.g. memory-mapped ones)."""
+        series = cls.__new__(cls)
+        series.timestamps, series.prices, series.volumes = timestamps, prices, volumes
+        return series
+
+    @classmethod
+    def from_pairs(
+        cls, prices: Sequence[Sequence[float]], volumes: Optional[Sequence[Sequence[float]]] = None
+    ) -> "PriceSeries":
+        """Builds a series from ``[[timestamp_ms, value], ...]`` lists (CoinGecko's format)."""
+        price_array = np.asarray(prices, dtype=np.float64).reshape(-1, 2)
+        volume_values = None
+        if volumes:
+            volume_array = np.asarray(volumes, dtype=np.float64).reshape(-1, 2)
+            if len(volume_array) == len(price_array):
+                volume_values = volume_array[:, 1]
+        return cls(price_array[:, 0].astype(np.int64), price_array[:, 1], volume_values)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def span_days(self) -> float:
+        return float(self.timestamps[-1] - self.timestamps[0]) / DAY_MS if len(self) else 0.0
+
+    def since(self, start_ms: int) -> "PriceSeries":
+        start = np.searchsorted(self.timestamps, start_ms, side="left")
+        volumes = None if self.volumes is None else self.volumes[start:]
+        return PriceSeries.from_sorted(self.timestamps[start:], self.prices[start:], volumes)
+
+    def last_days(self, days: float) -> "PriceSeries":
+        if not len(self):
+            return self
+        return self.since(int(self.timestamps[-1] - days * DAY_MS))
+
+    def at_interval(self, width_ms: int) -> "PriceSeries":
+        """One point per ``width_ms`` bucket, stamped at the bucket start: its last price and volume."""
+        if not len(self):
+            return self
+        buckets = self.timestamps // width_ms
+        ends = np.r_[np.flatnonzero(buckets[1:] != buckets[:-1]), len(buckets) - 1]
+        volumes = None if self.volumes is None else self.volumes[ends]
+        return PriceSeries.from_sorted(buckets[ends] * width_ms, self.prices[ends], volumes)
+
+    def resample(self, frequency: str = "day") -> Dict[str, np.ndarray]:
+        """OHLC bars for ``hour``, ``day`` or ``week`` buckets.
+
+        ``volume`` is the last volume reading in each bucket (CoinGecko reports
+        rolling 24h volume, which must not be summed).
+        """
+        width = FREQUENCIES[frequency]
+        offset = _WEEK_OFFSET_MS if frequency == "week" else 0
+        buckets = (self.timestamps + offset) // width
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)] - 1
+        bars = {
+            "timestamp": buckets[starts] * width - offset,
+            "open": self.prices[starts],
+            "high": np.maximum.reduceat(self.prices, starts),
+            "low": np.minimum.reduceat(self.prices, starts),
+            "close": self.prices[ends],
+        }
+        if self.volumes is not None:
+            bars["volume"] = self.volumes[ends]
+        return bars
+
+    @staticmethod
+    def returns(values: np.ndarray, log: bool = False) -> np.ndarray:
+        if log:
+            return np.diff(np.log(values))
+        return values[1:] / values[:-1] - 1.0
+
+    @staticmethod
+    def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+        """Simple moving average; the result is ``window - 1`` shorter than the input."""
+        if len(values) < window:
+            return np.empty(0)
+        cumulative = np.cumsum(np.r_[0.0, values])
+        return (cumulative[window:] - cumulative[:-window]) / window
+
+    @staticmethod
+    def rolling_volatility(returns: np.ndarray, window: int, periods_per_year: Optional[int] = None) -> np.ndarray:
+        """Rolling sample standard deviation of returns, annualized if ``periods_per_year`` is given."""
+        if len(returns) < window or window < 2:
+            return np.empty(0)
+        volatility = np.lib.stride_tricks.sliding_window_view(returns, window).std(axis=1, ddof=1)
+        if periods_per_year:
+            volatility = volatility * np.sqrt(periods_per_year)
+        return volatility
+
+    @staticmethod
+    def drawdown(values: np.ndarray) -> np.ndarray:
+        """Fractional distance below the running peak at each point (0 at a new high)."""
+        return values / np.maximum.accumulate(values) - 1.0
+
+    def summary(
+        self,
+        frequency: str = "day",
+        ma_windows: Tuple[int, ...] = (7, 30),
+        volatility_window: int = 30,
+        periods_per_year: Optional[int] = None,
+    ) -> Dict[str, Optional[float]]:
+        """Headline statistics computed from one set of arrays.
+
+        ``periods_per_year`` annualizes volatility; it defaults to the
+        every-day-trades count for ``frequency`` (use 252 for daily stock bars).
+        """
+        prices = self.prices
+        bars = self.resample(frequency)
+        closes = bars["close"]
+        bar_returns = self.returns(closes, log=True)
+        periods = periods_per_year or PERIODS_PER_YEAR[frequency]
+        window = min(volatility_window, len(bar_returns))
+        volatility = self.rolling_volatility(bar_returns, window, periods) if window >= 2 else np.empty(0)
+
+        stats: Dict[str, Optional[float]] = {
+            "high": float(prices.max()),
+            "low": float(prices.min()),
+            "average": float(prices.mean()),
+            "open": float(prices[0]),
+            "close": float(prices[-1]),
+            "total_return": float(prices[-1] / prices[0] - 1.0),
+            "max_drawdown": float(self.drawdown(prices).min()),
+            "volatility": float(volatility[-1]) if len(volatility) else None,
+            "volatility_window": window if len(volatility) else None,
+            "bars": len(closes),
+        }
+        for ma_window in ma_windows:
+            average = self.moving_average(closes, ma_window)
+            stats[f"sma_{ma_window}"] = float(average[-1]) if len(average) else None
+        if self.volumes is not None and not np.isnan(self.volumes[-1]):
+            stats["latest_volume"] = float(self.volumes[-1])
+        return stats
+
+
+class SeriesCache:
+    """Recently fetched series keyed by (source, asset); entries cover ``days`` of history."""
+
+    def __init__(self, ttl: float = SERIES_CACHE_TTL_SECONDS, max_entries: int = SERIES_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, PriceSeries, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: str, asset: str, days: float) -> Optional[PriceSeries]:
+        """Returns the last ``days`` of a cached series that covers at least that much."""
+        key = (source, asset.lower())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            covered_days, series, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if covered_days < days:
+            return None
+        return series if covered_days == days else series.last_days(days)
+
+    def put(self, source: str, asset: str, days: float, series: PriceSeries) -> None:
+        key = (source, asset.lower())
+        with self._lock:
+            current = self._entries.get(key)
+            # Keep the longer window while it is still fresh.
+            if current is not None and current[0] > days and current[2] > time.monotonic():
+                return
+            self._entries[key] = (days, series, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+series_cache = SeriesCache()
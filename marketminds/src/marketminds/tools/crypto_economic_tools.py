@@ -1,9 +1,16 @@
+import asyncio
 import os
-import requests
-from crewai.tools import BaseTool
-from typing import Type
+from marketminds import http_client
+from typing import ClassVar, Type
 from pydantic import BaseModel, Field
 
+from marketminds.history_store import get_history_store
+from marketminds.timeseries import DAY_MS, HOUR_MS, PriceSeries, series_cache
+from marketminds.tools.fallback_tool import FallbackTool, Provider
+from marketminds.tools.provider_tool import ProviderDataError, ProviderTool
+
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+
 class CryptoToolInput(BaseModel):
     """Input for crypto tools that take a coin name."""
 
@@ -12,52 +19,87 @@ class CryptoToolInput(BaseModel):
     )
 
 
-class CryptoInfoTool(BaseTool):
+class CryptoInfoTool(ProviderTool):
     name: str = "CoinGecko Crypto Profile Tool"
     description: str = (
         "Primary tool to retrieve a detailed profile for a cryptocurrency."
     )
     args_schema: Type[BaseModel] = CryptoToolInput
+    error_message: ClassVar[str] = "Error from CoinGecko: {error}. Try another tool."
+    quote_provider: ClassVar[str] = "coingecko"
 
-    def _run(self, coin_name: str) -> str:
-        api_key = os.getenv("COINGECKO_API_KEY")
-        search_url = f"https://api.coingecko.com/api/v3/search?query={coin_name.lower()}&x_cg_demo_api_key={api_key}"
-        try:
-            search_response = requests.get(search_url)
-            search_response.raise_for_status()
-            coins = search_response.json().get("coins", [])
-            if not coins:
-                return f"Error: Could not find a cryptocurrency named '{coin_name}'."
-            coin_id = coins[0]["id"]
-            data_url = f"https://api.coingecko.com/api/v3/coins/{coin_id}?x_cg_demo_api_key={api_key}"
-            data_response = requests.get(data_url)
-            data_response.raise_for_status()
-            data = data_response.json()
-            return (
-                f"Name: {data['name']} ({data['symbol'].upper()})\n"
-                f"Price (USD): ${data['market_data']['current_price']['usd']:,}\n"
-                f"Market Cap (USD): ${data['market_data']['market_cap']['usd']:,}\n"
-                f"Description: {data['description']['en'].split('.')[0]}."
-            )
-        except Exception as e:
-            return f"Error from CoinGecko: {e}. Try another tool."
+    def _auth_params(self) -> dict:
+        return {"x_cg_demo_api_key": os.getenv("COINGECKO_API_KEY")}
+
+    def _coin_id(self, search_data: dict, coin_name: str) -> str:
+        coins = search_data.get("coins", [])
+        if not coins:
+            raise ProviderDataError(f"Error: Could not find a cryptocurrency named '{coin_name}'.")
+        return coins[0]["id"]
+
+    def _parse(self, data: dict, coin_name: str) -> str:
+        return (
+            f"Name: {data['name']} ({data['symbol'].upper()})\n"
+            f"Price (USD): ${data['market_data']['current_price']['usd']:,}\n"
+            f"Market Cap (USD): ${data['market_data']['market_cap']['usd']:,}\n"
+            f"Description: {data['description']['en'].split('.')[0]}."
+        )
 
+    def _fetch(self, coin_name: str) -> str:
+        search_response = http_client.get(
+            f"{COINGECKO_API_URL}/search",
+            params={"query": coin_name.lower(), **self._auth_params()},
+        )
+        coin_id = self._coin_id(search_response.json(), coin_name)
+        data_response = http_client.get(
+            f"{COINGECKO_API_URL}/coins/{coin_id}", params=self._auth_params()
+        )
+        return self._parse(data_response.json(), coin_name)
 
-class CoinCapQuoteTool(BaseTool):
+    async def _afetch(self, coin_name: str) -> str:
+        search_response = await http_client.aget(
+            f"{COINGECKO_API_URL}/search",
+            params={"query": coin_name.lower(), **self._auth_params()},
+        )
+        coin_id = self._coin_id(search_response.json(), coin_name)
+        data_response = await http_client.aget(
+            f"{COINGECKO_API_URL}/coins/{coin_id}", params=self._auth_params()
+        )
+        return self._parse(data_response.json(), coin_name)
+
+
+class CoinCapQuoteTool(ProviderTool):
     name: str = "CoinCap Crypto Price Tool"
     description: str = "A fallback tool to get the real-time price of a cryptocurrency."
     args_schema: Type[BaseModel] = CryptoToolInput
+    error_message: ClassVar[str] = "Error from CoinCap: {error}."
+    quote_provider: ClassVar[str] = "coincap"
+
+    def _request(self, coin_name: str):
+        return f"https://api.coincap.io/v2/assets/{coin_name.lower()}", None
+
+    def _parse(self, data: dict, coin_name: str) -> str:
+        data = data["data"]
+        price = float(data["priceUsd"])
+        return f"CoinCap Quote for {data['name']} ({data['symbol']}): Price (USD): ${price:,.2f}"
+
 
-    def _run(self, coin_name: str) -> str:
-        url = f"https://api.coincap.io/v2/assets/{coin_name.lower()}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()["data"]
-            price = float(data["priceUsd"])
-            return f"CoinCap Quote for {data['name']} ({data['symbol']}): Price (USD): ${price:,.2f}"
-        except Exception as e:
-            return f"Error from CoinCap: {e}."
+class CryptoQuoteTool(FallbackTool):
+    name: str = "Crypto Profile and Price Tool"
+    description: str = (
+        "Gets a cryptocurrency's profile and current price. It tries CoinGecko and then CoinCap by itself."
+    )
+    args_schema: Type[BaseModel] = CryptoToolInput
+    error_message: ClassVar[str] = "Error: no crypto data provider could answer for {coin_name}: {error}"
+    chain: ClassVar[tuple] = (
+        Provider("coingecko", (CryptoInfoTool(),)),
+        # CoinCap ids are slugs of the name: 'shiba-inu' for "Shiba Inu".
+        Provider(
+            "coincap",
+            (CoinCapQuoteTool(),),
+            translate=lambda kwargs: {**kwargs, "coin_name": "-".join(kwargs["coin_name"].lower().split())},
+        ),
+    )
 
 
 class CryptoHistoricalInput(BaseModel):
@@ -67,29 +109,75 @@ class CryptoHistoricalInput(BaseModel):
     days: int = Field(..., description="The number of past days of data to retrieve.")
 
 
-class CryptoHistoricalTool(BaseTool):
+class CryptoHistoricalTool(ProviderTool):
     name: str = "Cryptocurrency Historical Chart Data"
     description: str = (
         "Fetches historical market data for a cryptocurrency over a specified number of days."
     )
     args_schema: Type[BaseModel] = CryptoHistoricalInput
+    error_message: ClassVar[str] = "Error fetching historical crypto data: {error}"
+
+    def _fetch_range(self, coin_id: str, start_ms: int, end_ms: int) -> PriceSeries:
+        response = http_client.get(
+            f"{COINGECKO_API_URL}/coins/{coin_id}/market_chart/range",
+            params={
+                "vs_currency": "usd",
+                "from": start_ms // 1000,
+                "to": end_ms // 1000,
+                "x_cg_demo_api_key": os.getenv("COINGECKO_API_KEY"),
+            },
+        )
+        data = response.json()
+        return PriceSeries.from_pairs(data.get("prices", []), data.get("total_volumes"))
 
-    def _run(self, coin_id: str, days: int) -> str:
-        api_key = os.getenv("COINGECKO_API_KEY")
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart?vs_currency=usd&days={days}&x_cg_demo_api_key={api_key}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            prices = data["prices"]
-            if not prices:
+    @staticmethod
+    def _interval_ms(days: int) -> int:
+        # market_chart/range returns ~5-minute points for under a day, hourly up to 90 days, daily beyond.
+        if days <= 1:
+            return 5 * 60_000
+        return HOUR_MS if days <= 90 else DAY_MS
+
+    def _fetch(self, coin_id: str, days: int) -> str:
+        series = series_cache.get("coingecko", coin_id, days)
+        if series is None:
+            # Only the range missing from the local history store is downloaded.
+            series = get_history_store().window(
+                "coingecko",
+                coin_id,
+                days,
+                lambda start, end: self._fetch_range(coin_id, start, end),
+                interval_ms=self._interval_ms(days),
+            )
+            if not len(series):
                 return f"No historical data found for {coin_id}."
-            high = max(p[1] for p in prices)
-            low = min(p[1] for p in prices)
-            avg = sum(p[1] for p in prices) / len(prices)
-            return f"Historical Data for {coin_id.capitalize()} ({days} days):\n- High: ${high:,.2f}\n- Low: ${low:,.2f}\n- Average: ${avg:,.2f}"
-        except Exception as e:
-            return f"Error fetching historical crypto data: {e}"
+            series_cache.put("coingecko", coin_id, days, series)
+        return self._format(series, coin_id, days)
+
+    async def _afetch(self, coin_id: str, days: int) -> str:
+        # The history store reads and writes files, so it runs off the event loop.
+        return await asyncio.to_thread(self._fetch, coin_id=coin_id, days=days)
+
+    def _format(self, series: PriceSeries, coin_id: str, days: int) -> str:
+        frequency = "day" if series.span_days >= 2 else "hour"
+        stats = series.summary(frequency=frequency)
+        lines = [
+            f"Historical Data for {coin_id.capitalize()} ({days} days):",
+            f"- High: ${stats['high']:,.2f}",
+            f"- Low: ${stats['low']:,.2f}",
+            f"- Average: ${stats['average']:,.2f}",
+            f"- Open / Close: ${stats['open']:,.2f} / ${stats['close']:,.2f} ({stats['total_return']:+.2%})",
+            f"- Max Drawdown: {stats['max_drawdown']:.2%}",
+        ]
+        if stats["volatility"] is not None:
+            lines.append(
+                f"- Annualized Volatility ({stats['volatility_window']}-{frequency}): {stats['volatility']:.2%}"
+            )
+        for window in (7, 30):
+            if stats[f"sma_{window}"] is not None:
+                lines.append(f"- {window}-{frequency} Moving Average: ${stats[f'sma_{window}']:,.2f}")
+        if "latest_volume" in stats:
+            lines.append(f"- 24h Volume: ${stats['latest_volume']:,.0f}")
+        return "\n".join(lines)
 
 class EconomicIndicatorInput(BaseModel):
     indicator_name: str = Field(
@@ -98,31 +186,38 @@ class EconomicIndicatorInput(BaseModel):
     )
 
 
-class FREDEconomicTool(BaseTool):
+class FREDEconomicTool(ProviderTool):
     name: str = "FRED US Economic Data Tool"
     description: str = (
         "Primary tool for US economic indicators like GDP, inflation (CPI), and unemployment rate."
     )
     args_schema: Type[BaseModel] = EconomicIndicatorInput
+    error_message: ClassVar[str] = "Error from FRED: {error}. Try another tool."
 
-    def _run(self, indicator_name: str) -> str:
+    indicator_map: ClassVar[dict] = {
+        "gdp": "GDP",
+        "inflation": "CPIAUCSL",
+        "unemployment": "UNRATE",
+    }
+
+    def _request(self, indicator_name: str):
         api_key = os.getenv("FRED_API_KEY")
-        indicator_map = {
-            "gdp": "GDP",
-            "inflation": "CPIAUCSL",
-            "unemployment": "UNRATE",
-        }
-        series_id = indicator_map.get(indicator_name.lower())
+        series_id = self.indicator_map.get(indicator_name.lower())
         if not series_id:
-            return f"Error: Unknown indicator '{indicator_name}'."
-        url = f"https://api.stlouisfed.org/fred/series/observations?series_id={series_id}&api_key={api_key}&file_type=json&sort_order=desc&limit=1"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            obs = response.json()["observations"][0]
-            return f"Latest FRED data for {indicator_name.upper()}: Date: {obs['date']}, Value: {obs['value']}"
-        except Exception as e:
-            return f"Error from FRED: {e}. Try another tool."
+            raise ProviderDataError(f"Error: Unknown indicator '{indicator_name}'.")
+        url = "https://api.stlouisfed.org/fred/series/observations"
+        params = {
+            "series_id": series_id,
+            "api_key": api_key,
+            "file_type": "json",
+            "sort_order": "desc",
+            "limit": 1,
+        }
+        return url, params
+
+    def _parse(self, data: dict, indicator_name: str) -> str:
+        obs = data["observations"][0]
+        return f"Latest FRED data for {indicator_name.upper()}: Date: {obs['date']}, Value: {obs['value']}"
 
 
 class WorldBankInput(BaseModel):
@@ -135,26 +230,51 @@ class WorldBankInput(BaseModel):
     )
 
 
-class WorldBankEconomicTool(BaseTool):
+class WorldBankEconomicTool(ProviderTool):
     name: str = "World Bank Global Economic Data Tool"
     description: str = (
         "A fallback tool to retrieve economic indicators for any country."
     )
     args_schema: Type[BaseModel] = WorldBankInput
+    error_message: ClassVar[str] = "Error from World Bank: {error}."
+
+    indicator_map: ClassVar[dict] = {"gdp": "NY.GDP.MKTP.CD", "inflation": "FP.CPI.TOTL.ZG"}
 
-    def _run(self, indicator_name: str, country_code: str) -> str:
-        indicator_map = {"gdp": "NY.GDP.MKTP.CD", "inflation": "FP.CPI.TOTL.ZG"}
-        indicator_code = indicator_map.get(indicator_name.lower())
+    def _request(self, indicator_name: str, country_code: str):
+        indicator_code = self.indicator_map.get(indicator_name.lower())
         if not indicator_code:
-            return f"Error: Indicator '{indicator_name}' not supported."
-        url = f"http://api.worldbank.org/v2/country/{country_code}/indicator/{indicator_code}?format=json&date=2020:2025&per_page=1"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()[1]
-            if not data:
-                return f"No World Bank data found."
-            point = data[0]
-            return f"Latest World Bank data for {point['indicator']['value']} in {point['country']['value']}:\n- Year: {point['date']}\n- Value: {point['value']:,.2f}"
-        except Exception as e:
-            return f"Error from World Bank: {e}."
+            raise ProviderDataError(f"Error: Indicator '{indicator_name}' not supported.")
+        url = f"http://api.worldbank.org/v2/country/{country_code}/indicator/{indicator_code}"
+        return url, {"format": "json", "date": "2020:2025", "per_page": 1}
+
+    def _parse(self, data: list, indicator_name: str, country_code: str) -> str:
+        data = data[1]
+        if not data:
+            raise ProviderDataError("No World Bank data found.")
+        point = data[0]
+        return f"Latest World Bank data for {point['indicator']['value']} in {point['country']['value']}:\n- Year: {point['date']}\n- Value: {point['value']:,.2f}"
+
+
+class EconomicDataInput(BaseModel):
+    indicator_name: str = Field(
+        ...,
+        description="The common name of the economic indicator (e.g., 'GDP', 'inflation').",
+    )
+    country_code: str = Field(
+        "USA",
+        description="The 3-letter ISO code for the country (e.g., 'USA', 'DEU' for Germany).",
+    )
+
+
+class EconomicDataTool(FallbackTool):
+    name: str = "Economic Indicator Tool"
+    description: str = (
+        "Gets the latest value of an economic indicator (GDP, inflation, unemployment) for a country. "
+        "It uses FRED for the US and the World Bank otherwise, falling back between them by itself."
+    )
+    args_schema: Type[BaseModel] = EconomicDataInput
+    error_message: ClassVar[str] = "Error: no economic data provider could answer for {indicator_name}: {error}"
+    chain: ClassVar[tuple] = (
+        Provider("fred", (FREDEconomicTool(),), accepts=lambda country_code="USA", **_: country_code.upper() == "USA"),
+        Provider("world_bank", (WorldBankEconomicTool(),)),
+    )
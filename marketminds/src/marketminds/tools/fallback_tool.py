@@ -0,0 +1,217 @@
+import asyncio
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Tuple
+
+from marketminds import http_client, provider_health
+from marketminds.tools.provider_tool import ProviderDataError, ProviderTool
+
+# Start the next provider when the current one has not answered after this
+# many seconds, and keep whichever answers first. 0 disables hedging.
+PROVIDER_HEDGE_AFTER_SECONDS = float(os.getenv("PROVIDER_HEDGE_AFTER_SECONDS", "3"))
+PROVIDER_FALLBACK_WORKERS = int(os.getenv("PROVIDER_FALLBACK_WORKERS", "16"))
+
+_pool = ThreadPoolExecutor(max_workers=PROVIDER_FALLBACK_WORKERS, thread_name_prefix="provider-fallback")
+
+
+@dataclass(frozen=True)
+class Provider:
+    """One step of a fallback chain.
+
+    A step can use several tools (e.g. Alpha Vantage profile and financials);
+    the outputs of those that succeed are joined, and the step fails only when
+    all of them do. ``accepts`` can rule a step out for some inputs, and
+    ``translate`` rewrites the arguments into the provider's own conventions
+    (e.g. 'GCUSD' rather than 'XAU/USD' for gold on FMP). Each tool is given
+    only the arguments its own schema declares.
+    """
+
+    name: str
+    tools: Tuple[ProviderTool, ...]
+    accepts: Optional[Callable[..., bool]] = None
+    translate: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+    def _arguments(self, tool: ProviderTool, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.translate is not None:
+            kwargs = self.translate(dict(kwargs))
+        fields = tool.args_schema.model_fields
+        return {key: value for key, value in kwargs.items() if key in fields}
+
+    def _join(self, results: List[Any]) -> str:
+        """Joins the outputs; a failed tool is noted in its place unless every tool failed."""
+        errors = [result for result in results if isinstance(result, BaseException)]
+        for error in errors:
+            if not isinstance(error, Exception):
+                raise error  # cancellation and the like
+        if len(errors) == len(results):
+            raise errors[0]
+        return "\n".join(
+            f"{tool.name} unavailable: {result}" if isinstance(result, BaseException) else result
+            for tool, result in zip(self.tools, results)
+        )
+
+    def fetch(self, **kwargs) -> str:
+        results: List[Any] = []
+        for tool in self.tools:
+            try:
+                results.append(tool._cached_fetch(**self._arguments(tool, kwargs)))
+            except Exception as e:
+                results.append(e)
+        return self._join(results)
+
+    async def afetch(self, **kwargs) -> str:
+        results = await asyncio.gather(
+            *(tool._cached_afetch(**self._arguments(tool, kwargs)) for tool in self.tools),
+            return_exceptions=True,
+        )
+        return self._join(list(results))
+
+
+class AllProvidersFailed(Exception):
+    pass
+
+
+class FallbackTool(ProviderTool):
+    """Walks a chain of providers in code instead of leaving fallback to the agent.
+
+    Providers are tried in the order ``provider_health.order`` ranks them,
+    skipping any whose circuit breaker is open. A provider that raises moves
+    the call on to the next one; one that is slower than ``hedge_after``
+    seconds gets the next one started alongside it. A ``ProviderDataError``
+    (the provider answered but has no data) also moves on, without counting
+    against the provider's health.
+    """
+
+    chain: ClassVar[Tuple[Provider, ...]] = ()
+    hedge_after: ClassVar[float] = PROVIDER_HEDGE_AFTER_SECONDS
+
+    def _candidates(self, kwargs: Dict[str, Any]) -> List[Provider]:
+        accepted = {
+            provider.name: provider
+            for provider in self.chain
+            if provider.accepts is None or provider.accepts(**kwargs)
+        }
+        return [accepted[name] for name in provider_health.order(list(accepted))]
+
+    @staticmethod
+    def _record(provider: Provider, started: float, future) -> None:
+        health = provider_health.get_health(provider.name)
+        latency = time.perf_counter() - started
+        if future.cancelled():
+            health.record_abandoned(latency)
+            return
+        error = future.exception()
+        if error is None or isinstance(error, ProviderDataError):
+            health.record_success(latency)
+        else:
+            health.record_failure(latency)
+
+    @staticmethod
+    def _can_hedge(remaining: List[Provider]) -> bool:
+        """A hedge is speculative, so it may not spend the next provider's last rate-limit token."""
+        spare = http_client.spare_tokens(remaining[0].name)
+        return spare is None or spare >= 2.0
+
+    def _launch(
+        self, remaining: List[Provider], pending: Dict, errors: List, submit: Callable, hedge: bool = False
+    ) -> bool:
+        """Starts the next provider whose breaker allows a call; False when none is left (or a hedge is declined)."""
+        while remaining:
+            if hedge and not self._can_hedge(remaining):
+                provider_health.count("hedge_skipped")
+                return False
+            provider = remaining.pop(0)
+            if not provider_health.get_health(provider.name).allow():
+                errors.append((provider.name, AllProvidersFailed("circuit open")))
+                continue
+            started = time.perf_counter()
+            future = submit(provider)
+            future.add_done_callback(lambda f, p=provider, s=started: self._record(p, s, f))
+            pending[future] = provider
+            return True
+        return False
+
+    def _hedge_timeout(self, remaining: List[Provider]) -> Optional[float]:
+        return self.hedge_after if remaining and self.hedge_after > 0 else None
+
+    def _settle(self, done, pending: Dict, errors: List) -> Optional[Any]:
+        """Returns the first successful future among ``done``; records the rest as errors."""
+        winner = None
+        for future in done:
+            provider = pending.pop(future)
+            error = future.exception()
+            if error is None:
+                winner = winner or future
+            else:
+                errors.append((provider.name, error))
+        return winner
+
+    def _failure(self, errors: List[Tuple[str, Exception]]) -> Exception:
+        for _, error in errors:
+            if isinstance(error, ProviderDataError):
+                return error
+        details = "; ".join(f"{name}: {error}" for name, error in errors) or "no provider available"
+        return AllProvidersFailed(f"all providers failed ({details})")
+
+    def _fetch(self, **kwargs) -> str:
+        kwargs = self.args_schema(**kwargs).model_dump()  # fill in schema defaults
+        remaining = self._candidates(kwargs)
+        pending: Dict[Future, Provider] = {}
+        errors: List[Tuple[str, Exception]] = []
+
+        def submit(provider: Provider) -> Future:
+            return _pool.submit(copy_context().run, provider.fetch, **kwargs)
+
+        try:
+            while pending or self._launch(remaining, pending, errors, submit):
+                done, _ = wait(pending, timeout=self._hedge_timeout(remaining), return_when=FIRST_COMPLETED)
+                if not done:
+                    if self._launch(remaining, pending, errors, submit, hedge=True):
+                        provider_health.count("hedged")
+                    continue
+                winner = self._settle(done, pending, errors)
+                if winner is not None:
+                    if errors:
+                        provider_health.count("fell_back")
+                    return winner.result()
+        finally:
+            # A loser that has not started is dropped; a running one cannot be
+            # stopped and finishes on its pool thread.
+            for future in pending:
+                if not future.cancel():
+                    provider_health.count("losers_running")
+        provider_health.count("exhausted")
+        raise self._failure(errors)
+
+    async def _afetch(self, **kwargs) -> str:
+        kwargs = self.args_schema(**kwargs).model_dump()
+        remaining = self._candidates(kwargs)
+        pending: Dict[asyncio.Future, Provider] = {}
+        errors: List[Tuple[str, Exception]] = []
+
+        def submit(provider: Provider) -> asyncio.Future:
+            return asyncio.ensure_future(provider.afetch(**kwargs))
+
+        try:
+            while pending or self._launch(remaining, pending, errors, submit):
+                done, _ = await asyncio.wait(
+                    pending, timeout=self._hedge_timeout(remaining), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if self._launch(remaining, pending, errors, submit, hedge=True):
+                        provider_health.count("hedged")
+                    continue
+                winner = self._settle(done, pending, errors)
+                if winner is not None:
+                    if errors:
+                        provider_health.count("fell_back")
+                    return winner.result()
+        finally:
+            # Losing hedged requests are not needed any more.
+            for future in pending:
+                future.cancel()
+        provider_health.count("exhausted")
+        raise self._failure(errors)
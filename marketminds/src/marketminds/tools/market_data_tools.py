@@ -1,9 +1,11 @@
 import os
-import requests
-from crewai.tools import BaseTool
-from typing import Type
+from typing import Any, ClassVar, Dict, List, Type
 from pydantic import BaseModel, Field
 
+from marketminds.batch_quotes import afetch_quotes, fetch_quotes, fmp_symbol, twelve_data_symbol
+from marketminds.tools.fallback_tool import FallbackTool, Provider
+from marketminds.tools.provider_tool import ProviderDataError, ProviderTool
+
 class MarketSymbolInput(BaseModel):
     """Input schema for tools that take a market symbol."""
 
@@ -12,82 +14,141 @@ class MarketSymbolInput(BaseModel):
         description="The symbol for the asset (e.g., 'EUR/USD', 'XAU/USD' for Gold, '^IXIC' for NASDAQ).",
     )
 
-class TwelveDataQuoteTool(BaseTool):
+
+def _with_symbol(convert):
+    def translate(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {**kwargs, "symbol": convert(kwargs["symbol"])}
+    return translate
+
+
+class TwelveDataQuoteTool(ProviderTool):
     name: str = "Twelve Data Quote Tool"
     description: str = (
         "Primary tool to get the latest price quote for Forex pairs, commodities, and indices."
     )
     args_schema: Type[BaseModel] = MarketSymbolInput
+    error_message: ClassVar[str] = "Error from Twelve Data: {error}. Try another tool."
+    quote_provider: ClassVar[str] = "twelve_data"
 
-    def _run(self, symbol: str) -> str:
+    def _request(self, symbol: str):
         api_key = os.getenv("TWELVE_DATA_API_KEY")
-        url = f"https://api.twelvedata.com/quote?symbol={symbol}&apikey={api_key}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if "code" in data and data.get("code") == 404:
-                return f"Error from Twelve Data: Symbol '{symbol}' not found."
-
-            return (
-                f"Twelve Data Quote for {data.get('symbol')}:\n"
-                f"- Price: ${float(data.get('close')):.2f}\n"
-                f"- Change: ${float(data.get('change')):.2f}\n"
-                f"- Percent Change: {data.get('percent_change')}%"
-            )
-        except Exception as e:
-            return f"Error from Twelve Data: {e}. Try another tool."
-
-class FMPQuoteTool(BaseTool):
+        return "https://api.twelvedata.com/quote", {"symbol": symbol, "apikey": api_key}
+
+    def _parse(self, data: dict, symbol: str) -> str:
+        if "code" in data and data.get("code") == 404:
+            raise ProviderDataError(f"Error from Twelve Data: Symbol '{symbol}' not found.")
+
+        return (
+            f"Twelve Data Quote for {data.get('symbol')}:\n"
+            f"- Price: ${float(data.get('close')):.2f}\n"
+            f"- Change: ${float(data.get('change')):.2f}\n"
+            f"- Percent Change: {data.get('percent_change')}%"
+        )
+
+class FMPQuoteTool(ProviderTool):
     name: str = "FMP Quote Tool"
     description: str = (
         "Secondary fallback tool for Forex (e.g., EURUSD), commodities (e.g., GCUSD for Gold), and indices (e.g., ^NDX)."
     )
     args_schema: Type[BaseModel] = MarketSymbolInput
+    error_message: ClassVar[str] = "Error from FMP: {error}. Try another tool."
+    quote_provider: ClassVar[str] = "fmp"
 
-    def _run(self, symbol: str) -> str:
+    def _request(self, symbol: str):
         api_key = os.getenv("FMP_API_KEY")
         if "/" in symbol:
             symbol = symbol.replace("/", "")
 
-        url = (
-            f"https://financialmodelingprep.com/api/v3/quote/{symbol}?apikey={api_key}"
+        url = f"https://financialmodelingprep.com/api/v3/quote/{symbol}"
+        return url, {"apikey": api_key}
+
+    def _parse(self, data: list, symbol: str) -> str:
+        data = data[0]
+        return (
+            f"FMP Quote for {data.get('symbol')}:\n"
+            f"- Price: ${data.get('price')}\n"
+            f"- Change: ${data.get('change')}\n"
+            f"- Day High: ${data.get('dayHigh')}\n"
+            f"- Day Low: ${data.get('dayLow')}"
         )
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()[0]
-            return (
-                f"FMP Quote for {data.get('symbol')}:\n"
-                f"- Price: ${data.get('price')}\n"
-                f"- Change: ${data.get('change')}\n"
-                f"- Day High: ${data.get('dayHigh')}\n"
-                f"- Day Low: ${data.get('dayLow')}"
-            )
-        except Exception as e:
-            return f"Error from FMP: {e}. Try another tool."
-
-class AlphaVantageMarketQuoteTool(BaseTool):
+
+class AlphaVantageMarketQuoteTool(ProviderTool):
     name: str = "Alpha Vantage Market Quote Tool"
     description: str = (
         "A last-resort fallback tool to get a price quote for a given Forex pair, commodity, or stock market index."
     )
     args_schema: Type[BaseModel] = MarketSymbolInput
+    error_message: ClassVar[str] = "Error fetching market data from Alpha Vantage: {error}"
+    quote_provider: ClassVar[str] = "alpha_vantage"
 
-    def _run(self, symbol: str) -> str:
+    def _request(self, symbol: str):
         api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
-        url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={api_key}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json().get("Global Quote", {})
-            if not data:
-                return f"Error: No data found for symbol '{symbol}' from Alpha Vantage."
-
-            return (
-                f"Latest Alpha Vantage Quote for {data.get('01. symbol')}:\n"
-                f"- Price: {data.get('05. price')}\n"
-                f"- Change: {data.get('09. change')}"
-            )
-        except Exception as e:
-            return f"Error fetching market data from Alpha Vantage: {e}"
+        url = "https://www.alphavantage.co/query"
+        return url, {"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": api_key}
+
+    def _parse(self, data: dict, symbol: str) -> str:
+        data = data.get("Global Quote", {})
+        if not data:
+            raise ProviderDataError(f"Error: No data found for symbol '{symbol}' from Alpha Vantage.")
+
+        return (
+            f"Latest Alpha Vantage Quote for {data.get('01. symbol')}:\n"
+            f"- Price: {data.get('05. price')}\n"
+            f"- Change: {data.get('09. change')}"
+        )
+
+class MarketQuoteTool(FallbackTool):
+    name: str = "Market Quote Tool"
+    description: str = (
+        "Gets the latest price quote for a Forex pair, commodity or index (e.g., 'EUR/USD', 'XAU/USD', '^IXIC'). "
+        "It tries Twelve Data, FMP and Alpha Vantage by itself, so call it once per symbol."
+    )
+    args_schema: Type[BaseModel] = MarketSymbolInput
+    error_message: ClassVar[str] = "Error: no market data provider could answer for {symbol}: {error}"
+    chain: ClassVar[tuple] = (
+        Provider("twelve_data", (TwelveDataQuoteTool(),), translate=_with_symbol(twelve_data_symbol)),
+        Provider("fmp", (FMPQuoteTool(),), translate=_with_symbol(fmp_symbol)),
+        Provider("alpha_vantage", (AlphaVantageMarketQuoteTool(),)),
+    )
+
+class BatchQuoteInput(BaseModel):
+    """Input schema for the batch quote tool."""
+
+    symbols: List[str] = Field(
+        ...,
+        description=(
+            "Symbols to quote, e.g. ['AAPL', 'MSFT', 'EUR/USD', '^IXIC', 'BTC']. "
+            "Prefix a symbol with 'stock:', 'market:' or 'crypto:' to set its asset class."
+        ),
+    )
+
+class BatchQuoteTool(ProviderTool):
+    name: str = "Batch Quote Tool"
+    description: str = (
+        "Gets the latest prices for several stocks, forex pairs, commodities, indices or cryptocurrencies "
+        "in a single call. Use this instead of one quote tool call per symbol when comparing assets."
+    )
+    args_schema: Type[BaseModel] = BatchQuoteInput
+    error_message: ClassVar[str] = "Error fetching batch quotes: {error}"
+
+    def _format(self, payload: Dict[str, Any]) -> str:
+        lines = []
+        for symbol, quote in payload["quotes"].items():
+            price = quote["price"]
+            if price is None:
+                price_text = "price unavailable"
+            else:
+                price_text = "$" + (f"{price:,.2f}" if price >= 1 else f"{price:.6g}")
+            line = f"- {symbol} ({quote['asset_class']}, {quote['provider']}): {price_text}"
+            if quote["change_percent"] is not None:
+                line += f", {quote['change_percent']:+.2f}%"
+            lines.append(line)
+        for symbol, error in payload["errors"].items():
+            lines.append(f"- {symbol}: {error}")
+        return "Batch Quotes:\n" + "\n".join(lines)
+
+    def _fetch(self, symbols: List[str]) -> str:
+        return self._format(fetch_quotes(symbols))
+
+    async def _afetch(self, symbols: List[str]) -> str:
+        return self._format(await afetch_quotes(symbols))
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import date
+from typing import Any, ClassVar, Dict, Optional, Tuple
+
+from crewai.tools import BaseTool
+
+from marketminds import fundamentals_store, http_client, metrics
+from marketminds.quote_cache import quote_cache
+
+
+class ProviderDataError(Exception):
+    """Raised when a provider answers but has no usable data.
+
+    The message is returned to the agent as-is.
+    """
+
+
+class ProviderTool(BaseTool):
+    """Base class for tools backed by a remote data provider.
+
+    Single-request tools implement ``_request`` (returns the URL and query
+    params) and ``_parse`` (turns the JSON body into the tool output); tools that
+    need more than one call override ``_fetch``/``_afetch`` directly. Both
+    ``_run`` and ``_arun`` go through the shared pooled client and turn failures
+    into the message the agent sees, formatted with ``error_message``.
+
+    Tools that set ``quote_provider`` have successful results kept in the
+    shared quote cache, keyed by that provider and the tool's first argument.
+
+    Tools that set ``fundamentals_source`` keep the raw provider response in
+    the fundamentals store and only call the provider on a miss. A response is
+    stored only after ``_parse`` accepted it, and ``_fundamentals_period`` says
+    which fiscal period it covers and when the next one is due.
+    """
+
+    error_message: ClassVar[str] = "Error: {error}"
+    quote_provider: ClassVar[Optional[str]] = None
+    fundamentals_source: ClassVar[Optional[str]] = None
+
+    def _request(self, **kwargs) -> Tuple[str, Optional[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def _parse(self, data: Any, **kwargs) -> str:
+        raise NotImplementedError
+
+    def _download(self, **kwargs) -> Any:
+        url, params = self._request(**kwargs)
+        return http_client.get(url, params=params).json()
+
+    async def _adownload(self, **kwargs) -> Any:
+        url, params = self._request(**kwargs)
+        response = await http_client.aget(url, params=params)
+        return response.json()
+
+    def _fundamentals_period(self, data: Any) -> Tuple[Optional[date], Optional[float]]:
+        """The fiscal period ``data`` covers and when the next report is expected (epoch seconds)."""
+        return None, None
+
+    def _store(self, ticker: str, data: Any) -> None:
+        fiscal_period, next_earnings_at = self._fundamentals_period(data)
+        fundamentals_store.put(self.fundamentals_source, ticker, fiscal_period, data, next_earnings_at)
+
+    def _fetch(self, **kwargs) -> str:
+        if self.fundamentals_source is None:
+            return self._parse(self._download(**kwargs), **kwargs)
+        ticker = self._cache_symbol(**kwargs)
+        data = fundamentals_store.get(self.fundamentals_source, ticker)
+        if data is not None:
+            return self._parse(data, **kwargs)
+        data = self._download(**kwargs)
+        result = self._parse(data, **kwargs)
+        self._store(ticker, data)
+        return result
+
+    async def _afetch(self, **kwargs) -> str:
+        if self.fundamentals_source is None:
+            return self._parse(await self._adownload(**kwargs), **kwargs)
+        ticker = self._cache_symbol(**kwargs)
+        data = await asyncio.to_thread(fundamentals_store.get, self.fundamentals_source, ticker)
+        if data is not None:
+            return self._parse(data, **kwargs)
+        data = await self._adownload(**kwargs)
+        result = self._parse(data, **kwargs)
+        await asyncio.to_thread(self._store, ticker, data)
+        return result
+
+    def _cache_symbol(self, **kwargs) -> str:
+        return str(next(iter(kwargs.values())))
+
+    def _cached_fetch(self, **kwargs) -> str:
+        if self.quote_provider is None:
+            return self._fetch(**kwargs)
+        return quote_cache.get_or_fetch(
+            self.quote_provider, self._cache_symbol(**kwargs), lambda: self._fetch(**kwargs)
+        )
+
+    async def _cached_afetch(self, **kwargs) -> str:
+        if self.quote_provider is None:
+            return await self._afetch(**kwargs)
+        return await quote_cache.aget_or_fetch(
+            self.quote_provider, self._cache_symbol(**kwargs), lambda: self._afetch(**kwargs)
+        )
+
+    def _error(self, error: Exception, **kwargs) -> str:
+        if isinstance(error, ProviderDataError):
+            return str(error)
+        return self.error_message.format(error=error, **kwargs)
+
+    def _run(self, **kwargs) -> str:
+        try:
+            with metrics.span("tool", self.name):
+                return self._cached_fetch(**kwargs)
+        except Exception as e:
+            return self._error(e, **kwargs)
+
+    async def _arun(self, **kwargs) -> str:
+        try:
+            with metrics.span("tool", self.name):
+                return await self._cached_afetch(**kwargs)
+        except Exception as e:
+            return self._error(e, **kwargs)
@@ -1,10 +1,10 @@
 from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
-from langchain_chroma import Chroma  # ✅ Updated import
-from langchain_openai import OpenAIEmbeddings
 import os
 
+from marketminds.vector_store import get_vector_store
+
 
 class RAGInput(BaseModel):
     """Input schema for the RAG Tool."""
@@ -19,30 +19,33 @@ class RAGTool(BaseTool):
     def __init__(self, persist_directory: str = None, **kwargs):
         super().__init__(**kwargs)
 
-        self._persist_directory = persist_directory or os.getenv("CHROMA_DB_DIR", "/tmp/chroma_db")
+        self._persist_directory = persist_directory or os.getenv("CHROMA_DB_DIR", "./storage/current")
+
+        # Shared by every RAGTool on the same directory: one Chroma client,
+        # one embeddings client and the query/result caches.
+        self._vector_store = get_vector_store(self._persist_directory)
 
-        os.makedirs(self._persist_directory, exist_ok=True)
+    def _format_docs(self, relevant_docs) -> str:
+        if not relevant_docs:
+            return "No relevant information found in the knowledge base for that query."
 
-        self._embeddings = OpenAIEmbeddings()
-        self._vector_store = Chroma(
-            persist_directory=self._persist_directory,
-            embedding_function=self._embeddings
-        )
+        formatted_docs = [
+            f"Source: {doc.metadata.get('source', 'N/A')}\nContent: {doc.page_content}"
+            for doc in relevant_docs
+        ]
+        return "\n\n---\n\n".join(formatted_docs)
 
     def _run(self, query: str) -> str:
         """The tool's main execution logic."""
         try:
-            retriever = self._vector_store.as_retriever(search_kwargs={'k': 3})
-            relevant_docs = retriever.invoke(query)
+            return self._format_docs(self._vector_store.search(query, k=3))
 
-            if not relevant_docs:
-                return "No relevant information found in the knowledge base for that query."
+        except Exception as e:
+            return f"Error searching knowledge base: {e}"
 
-            formatted_docs = [
-                f"Source: {doc.metadata.get('source', 'N/A')}\nContent: {doc.page_content}"
-                for doc in relevant_docs
-            ]
-            return "\n\n---\n\n".join(formatted_docs)
+    async def _arun(self, query: str) -> str:
+        try:
+            return self._format_docs(await self._vector_store.asearch(query, k=3))
 
         except Exception as e:
             return f"Error searching knowledge base: {e}"
@@ -1,10 +1,19 @@
+import asyncio
 import os
-import requests
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
 import yfinance as yf
-from crewai.tools import BaseTool
-from typing import Type
+from typing import ClassVar, Type
 from pydantic import BaseModel, Field
 
+from marketminds import fundamentals_store
+from marketminds.history_store import get_history_store
+from marketminds.timeseries import DAY_MS, PriceSeries, series_cache
+from marketminds.tools.fallback_tool import FallbackTool, Provider
+from marketminds.tools.provider_tool import ProviderDataError, ProviderTool
+
 class StockTickerInput(BaseModel):
     """Input schema for tools that take a stock ticker."""
 
@@ -12,107 +21,222 @@ class StockTickerInput(BaseModel):
         ..., description="The stock ticker symbol (e.g., 'AAPL', 'GOOGL')."
     )
 
-class PolygonQuoteTool(BaseTool):
+class PolygonQuoteTool(ProviderTool):
     name: str = "Polygon Stock Quote Tool"
     description: str = (
         "Primary tool to get the latest daily price quote for a stock. Use this first."
     )
     args_schema: Type[BaseModel] = StockTickerInput
+    error_message: ClassVar[str] = "Error from Polygon.io: {error}. Try another tool."
+    quote_provider: ClassVar[str] = "polygon"
 
-    def _run(self, ticker: str) -> str:
+    def _request(self, ticker: str):
         api_key = os.getenv("POLYGON_API_KEY")
-        url = f"https://api.polygon.io/v2/aggs/ticker/{ticker.upper()}/prev?adjusted=true&apiKey={api_key}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if data.get("resultsCount", 0) == 0:
-                return f"Error: No data found for ticker '{ticker}' from Polygon.io."
-            quote = data["results"][0]
-            return f"Polygon Quote for {data['ticker']}: Open: ${quote.get('o')}, High: ${quote.get('h')}, Low: ${quote.get('l')}, Close: ${quote.get('c')}, Volume: {quote.get('v'):,}"
-        except Exception as e:
-            return f"Error from Polygon.io: {e}. Try another tool."
-
-class YFinanceTool(BaseTool):
+        url = f"https://api.polygon.io/v2/aggs/ticker/{ticker.upper()}/prev"
+        return url, {"adjusted": "true", "apiKey": api_key}
+
+    def _parse(self, data: dict, ticker: str) -> str:
+        if data.get("resultsCount", 0) == 0:
+            raise ProviderDataError(f"Error: No data found for ticker '{ticker}' from Polygon.io.")
+        quote = data["results"][0]
+        return f"Polygon Quote for {data['ticker']}: Open: ${quote.get('o')}, High: ${quote.get('h')}, Low: ${quote.get('l')}, Close: ${quote.get('c')}, Volume: {quote.get('v'):,}"
+
+def _rounded(value, digits):
+    """A ``fast_info`` number rounded like its ``stock.info`` counterpart; None when missing."""
+    if value is None or pd.isna(value):
+        return None
+    return round(value, digits) if digits is not None else int(round(value))
+
+class YFinanceTool(ProviderTool):
     name: str = "Yahoo Finance Data Tool"
     description: str = (
         "Secondary fallback tool to get a full company profile, including financials and quotes, from Yahoo Finance."
     )
     args_schema: Type[BaseModel] = StockTickerInput
+    error_message: ClassVar[str] = "Error fetching data from yfinance for {ticker}: {error}. Try another tool."
+    fundamentals_source: ClassVar[str] = "yfinance_info"
+    # Only these fields of ``stock.info`` are stored. A stored entry cannot
+    # supply live quote fields, so those come from ``fast_info`` on every call.
+    info_fields: ClassVar[tuple] = (
+        "longName", "sector", "industry", "longBusinessSummary", "totalRevenue", "netIncome",
+        "mostRecentQuarter", "earningsTimestamp", "earningsTimestampStart",
+    )
 
-    def _run(self, ticker: str) -> str:
-        try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
+    def _download(self, ticker: str) -> dict:
+        info = yf.Ticker(ticker).info
+        return {field: info[field] for field in self.info_fields if field in info}
 
-            market_cap = info.get("marketCap")
-            total_revenue = info.get("totalRevenue")
-            net_income = info.get("netIncome")
-            previous_close = info.get("previousClose")
-            day_high = info.get("dayHigh")
-            day_low = info.get("dayLow")
+    def _fundamentals_period(self, data: dict):
+        period = fundamentals_store.period_end(data.get("mostRecentQuarter"))
+        upcoming = [
+            data[field] for field in ("earningsTimestampStart", "earningsTimestamp")
+            if isinstance(data.get(field), (int, float)) and data[field] > time.time()
+        ]
+        next_earnings_at = min(upcoming) if upcoming else fundamentals_store.expected_report(period, 91)
+        return period, next_earnings_at
 
-            formatted_market_cap = (
-                f"${market_cap:,}" if market_cap is not None else "N/A"
-            )
-            formatted_total_revenue = (
-                f"${total_revenue:,}" if total_revenue is not None else "N/A"
-            )
-            formatted_net_income = (
-                f"${net_income:,}" if net_income is not None else "N/A"
-            )
-            formatted_previous_close = (
-                f"${previous_close}" if previous_close is not None else "N/A"
-            )
-            formatted_day_high = f"${day_high}" if day_high is not None else "N/A"
-            formatted_day_low = f"${day_low}" if day_low is not None else "N/A"
-
-            return (
-                f"Full Report for {info.get('longName', ticker.upper())} from Yahoo Finance:\n"
-                f"Profile: Sector is {info.get('sector', 'N/A')}. Industry is {info.get('industry', 'N/A')}. Summary: {info.get('longBusinessSummary', 'N/A')}\n"
-                f"Quote: Previous Close was {formatted_previous_close}. Day's range was {formatted_day_low} - {formatted_day_high}.\n"
-                f"Financials: Market Cap is {formatted_market_cap}. Total Revenue is {formatted_total_revenue}. Net Income is {formatted_net_income}."
+    def _fetch(self, ticker: str) -> str:
+        info = fundamentals_store.get(self.fundamentals_source, ticker)
+        if info is None:
+            info = self._download(ticker)
+            if info:
+                self._store(ticker, info)
+        quote = yf.Ticker(ticker).fast_info
+
+        # Shaped like the ``stock.info`` values they stand in for: a whole-dollar market cap and cent prices.
+        market_cap = _rounded(quote.market_cap, None)
+        total_revenue = info.get("totalRevenue")
+        net_income = info.get("netIncome")
+        previous_close = _rounded(quote.previous_close, 2)
+        day_high = _rounded(quote.day_high, 2)
+        day_low = _rounded(quote.day_low, 2)
+
+        formatted_market_cap = (
+            f"${market_cap:,}" if market_cap is not None else "N/A"
+        )
+        formatted_total_revenue = (
+            f"${total_revenue:,}" if total_revenue is not None else "N/A"
+        )
+        formatted_net_income = (
+            f"${net_income:,}" if net_income is not None else "N/A"
+        )
+        formatted_previous_close = (
+            f"${previous_close}" if previous_close is not None else "N/A"
+        )
+        formatted_day_high = f"${day_high}" if day_high is not None else "N/A"
+        formatted_day_low = f"${day_low}" if day_low is not None else "N/A"
+
+        return (
+            f"Full Report for {info.get('longName', ticker.upper())} from Yahoo Finance:\n"
+            f"Profile: Sector is {info.get('sector', 'N/A')}. Industry is {info.get('industry', 'N/A')}. Summary: {info.get('longBusinessSummary', 'N/A')}\n"
+            f"Quote: Previous Close was {formatted_previous_close}. Day's range was {formatted_day_low} - {formatted_day_high}.\n"
+            f"Financials: Market Cap is {formatted_market_cap}. Total Revenue is {formatted_total_revenue}. Net Income is {formatted_net_income}."
+        )
+
+    async def _afetch(self, ticker: str) -> str:
+        # yfinance has no async API and manages its own session.
+        return await asyncio.to_thread(self._fetch, ticker=ticker)
+
+class StockHistoricalInput(BaseModel):
+    ticker: str = Field(
+        ..., description="The stock ticker symbol (e.g., 'AAPL', 'GOOGL')."
+    )
+    days: int = Field(..., description="The number of past days of data to retrieve.")
+
+
+class StockHistoricalTool(ProviderTool):
+    name: str = "Stock Historical Price Data"
+    description: str = (
+        "Fetches daily price history for a stock over a specified number of days, "
+        "with return, drawdown, volatility and moving averages."
+    )
+    args_schema: Type[BaseModel] = StockHistoricalInput
+    error_message: ClassVar[str] = "Error fetching historical stock data for {ticker}: {error}"
+    # Stocks trade on weekdays only.
+    trading_days_per_year: ClassVar[int] = 252
+
+    def _fetch_range(self, ticker: str, start_ms: int, end_ms: int) -> PriceSeries:
+        history = yf.Ticker(ticker).history(
+            start=datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc),
+            # Yahoo's end date is exclusive and day-granular.
+            end=datetime.fromtimestamp((end_ms + DAY_MS) / 1000, tz=timezone.utc),
+            interval="1d",
+        )
+        timestamps = (history.index.tz_convert("UTC") - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)
+        return PriceSeries(
+            timestamps.to_numpy(), history["Close"].to_numpy(), history["Volume"].to_numpy()
+        )
+
+    def _fetch(self, ticker: str, days: int) -> str:
+        ticker = ticker.upper()
+        series = series_cache.get("yfinance", ticker, days)
+        if series is None:
+            series = get_history_store().window(
+                "yfinance", ticker, days, lambda start, end: self._fetch_range(ticker, start, end)
             )
-        except Exception as e:
-            return f"Error fetching data from yfinance for {ticker}: {e}. Try another tool."
+            if not len(series):
+                raise ProviderDataError(f"Error: No price history found for ticker '{ticker}'.")
+            series_cache.put("yfinance", ticker, days, series)
 
-class AlphaVantageProfileTool(BaseTool):
+        stats = series.summary(frequency="day", ma_windows=(20, 50), periods_per_year=self.trading_days_per_year)
+        lines = [
+            f"Historical Data for {ticker} ({days} days, {stats['bars']} trading days):",
+            f"- High / Low Close: ${stats['high']:,.2f} / ${stats['low']:,.2f}",
+            f"- Average Close: ${stats['average']:,.2f}",
+            f"- First / Last Close: ${stats['open']:,.2f} / ${stats['close']:,.2f} ({stats['total_return']:+.2%})",
+            f"- Max Drawdown: {stats['max_drawdown']:.2%}",
+        ]
+        if stats["volatility"] is not None:
+            lines.append(f"- Annualized Volatility ({stats['volatility_window']}-day): {stats['volatility']:.2%}")
+        for window in (20, 50):
+            if stats[f"sma_{window}"] is not None:
+                lines.append(f"- {window}-day Moving Average: ${stats[f'sma_{window}']:,.2f}")
+        if "latest_volume" in stats:
+            lines.append(f"- Latest Volume: {stats['latest_volume']:,.0f} shares")
+        return "\n".join(lines)
+
+    async def _afetch(self, ticker: str, days: int) -> str:
+        # yfinance has no async API and the history store does file I/O.
+        return await asyncio.to_thread(self._fetch, ticker=ticker, days=days)
+
+
+class AlphaVantageProfileTool(ProviderTool):
     name: str = "Alpha Vantage Profile Tool"
     description: str = (
         "A last-resort fallback tool to get a company's profile (description, industry, etc.)."
     )
     args_schema: Type[BaseModel] = StockTickerInput
+    error_message: ClassVar[str] = "Error fetching from Alpha Vantage Profile: {error}."
+    fundamentals_source: ClassVar[str] = "alpha_vantage_overview"
+
+    def _fundamentals_period(self, profile_data: dict):
+        period = fundamentals_store.period_end(profile_data.get("LatestQuarter"))
+        return period, fundamentals_store.expected_report(period, 91)
 
-    def _run(self, ticker: str) -> str:
+    def _request(self, ticker: str):
         api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
-        url = f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={ticker}&apikey={api_key}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            profile_data = response.json()
-            if "Note" in profile_data or not profile_data:
-                return f"Error from Alpha Vantage Profile: API limit reached or data not found."
-            return f"Alpha Vantage Profile for {profile_data.get('Name')}: Industry is {profile_data.get('Industry')}. Description: {profile_data.get('Description')}"
-        except Exception as e:
-            return f"Error fetching from Alpha Vantage Profile: {e}."
-
-class AlphaVantageFinancialsTool(BaseTool):
+        url = "https://www.alphavantage.co/query"
+        return url, {"function": "OVERVIEW", "symbol": ticker, "apikey": api_key}
+
+    def _parse(self, profile_data: dict, ticker: str) -> str:
+        if "Note" in profile_data or "Information" in profile_data or not profile_data:
+            raise ProviderDataError("Error from Alpha Vantage Profile: API limit reached or data not found.")
+        return f"Alpha Vantage Profile for {profile_data.get('Name')}: Industry is {profile_data.get('Industry')}. Description: {profile_data.get('Description')}"
+
+class AlphaVantageFinancialsTool(ProviderTool):
     name: str = "Alpha Vantage Financials Tool"
     description: str = (
         "A last-resort fallback tool to get a company's annual income statement."
     )
     args_schema: Type[BaseModel] = StockTickerInput
+    error_message: ClassVar[str] = "Error fetching from Alpha Vantage Financials: {error}."
+    fundamentals_source: ClassVar[str] = "alpha_vantage_income"
+
+    def _fundamentals_period(self, data: dict):
+        period = fundamentals_store.period_end(data["annualReports"][0].get("fiscalDateEnding"))
+        return period, fundamentals_store.expected_report(period, 365)
 
-    def _run(self, ticker: str) -> str:
+    def _request(self, ticker: str):
         api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
-        url = f"https://www.alphavantage.co/query?function=INCOME_STATEMENT&symbol={ticker}&apikey={api_key}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if "Note" in data or not data.get("annualReports"):
-                return "Error from Alpha Vantage Financials: API limit reached or data not found."
-            report = data["annualReports"][0]
-            return f"Alpha Vantage Financials for {ticker}: Total Revenue: ${int(report.get('totalRevenue')):,}, Net Income: ${int(report.get('netIncome')):,}"
-        except Exception as e:
-            return f"Error fetching from Alpha Vantage Financials: {e}."
+        url = "https://www.alphavantage.co/query"
+        return url, {"function": "INCOME_STATEMENT", "symbol": ticker, "apikey": api_key}
+
+    def _parse(self, data: dict, ticker: str) -> str:
+        if "Note" in data or "Information" in data or not data.get("annualReports"):
+            raise ProviderDataError("Error from Alpha Vantage Financials: API limit reached or data not found.")
+        report = data["annualReports"][0]
+        return f"Alpha Vantage Financials for {ticker}: Total Revenue: ${int(report.get('totalRevenue')):,}, Net Income: ${int(report.get('netIncome')):,}"
+
+class StockDataTool(FallbackTool):
+    name: str = "Stock Data Tool"
+    description: str = (
+        "Gets a stock's latest quote and company data. It tries Polygon, Yahoo Finance and Alpha Vantage "
+        "by itself, so call it once per ticker."
+    )
+    args_schema: Type[BaseModel] = StockTickerInput
+    error_message: ClassVar[str] = "Error: no stock data provider could answer for {ticker}: {error}"
+    chain: ClassVar[tuple] = (
+        Provider("polygon", (PolygonQuoteTool(),)),
+        Provider("yfinance", (YFinanceTool(),)),
+        Provider("alpha_vantage", (AlphaVantageProfileTool(), AlphaVantageFinancialsTool())),
+    )
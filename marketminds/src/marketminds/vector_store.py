@@ -0,0 +1,263 @@
+"""Process-wide knowledge-base handle shared by every RAGTool.
+
+Opening Chroma and an OpenAI embeddings client is done once per persist
+directory. Query embeddings are cached by normalized query text in memory and
+in a small SQLite file, so repeated questions survive restarts without another
+embedding call, and top-k results are cached per query until the collection
+changes on disk.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./storage/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+# How long a worker waits for another one's write to the cache file before skipping the cache.
+EMBEDDING_CACHE_BUSY_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_CACHE_BUSY_TIMEOUT_SECONDS", "2"))
+RAG_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RAG_RESULT_CACHE_MAX_ENTRIES", "512"))
+# How often the collection is checked for changes before serving cached results.
+RAG_VERSION_CHECK_SECONDS = float(os.getenv("RAG_VERSION_CHECK_SECONDS", "5"))
+
+
+def normalize_query(text: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ").lower()
+
+
+class EmbeddingCache:
+    """Bounded LRU of query embeddings, persisted to SQLite.
+
+    Several server processes can share the file. It runs in WAL mode, and an
+    error from SQLite (e.g. "database is locked") is treated as a cache miss
+    rather than failing the search.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=EMBEDDING_CACHE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"WARNING: Embedding cache at {path} unavailable, using memory only: {e}")
+            self._db = None
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                return vector
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"WARNING: Embedding cache read failed, treating as a miss: {e}")
+                return None
+            if row is None:
+                return None
+            vector = array("d", row[0]).tolist()
+            self._remember(key, vector)
+            return vector
+
+    def put(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, updated_at) VALUES (?, ?, ?)",
+                    (key, array("d", vector).tobytes(), time.time()),
+                )
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                # The vector is still cached in memory; only persisting it is skipped.
+                self._db.rollback()
+                print(f"WARNING: Embedding cache write failed, skipping it: {e}")
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wraps an embeddings client so ``embed_query`` is served from the cache.
+
+    Only the cache key is normalized; the query is embedded as written.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def _key(self, text: str) -> str:
+        return f"{self.model}:{normalize_query(text)}"
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        # The cache may read or write its SQLite file, so it runs off the event loop.
+        vector = await asyncio.to_thread(self.cache.get, key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self.cache.put, key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+
+class VectorStoreHandle:
+    """One Chroma client per persist directory plus a per-query top-k cache."""
+
+    def __init__(self, persist_directory: str, embeddings: Embeddings):
+        self.persist_directory = persist_directory
+        self.embeddings = embeddings
+        self._open()
+        self._results: "OrderedDict[Tuple[str, int], List[Document]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = self._collection_version()
+        self._version_checked_at = time.monotonic()
+
+    def _open(self) -> None:
+        # The ingest script swaps a symlink to publish a new index, so the client
+        # is opened on the resolved directory and reopened when the link moves.
+        self.real_directory = os.path.realpath(self.persist_directory)
+        self.store = Chroma(persist_directory=self.real_directory, embedding_function=self.embeddings)
+
+    def _collection_version(self) -> Tuple:
+        """Changes when a new index is published or the collection's files are written."""
+        real_directory = os.path.realpath(self.persist_directory)
+        if real_directory != self.real_directory:
+            return (real_directory,)
+        mtimes = []
+        for file_name in ("chroma.sqlite3", "chroma.sqlite3-wal"):
+            path = os.path.join(real_directory, file_name)
+            if os.path.exists(path):
+                mtimes.append(os.path.getmtime(path))
+        return (real_directory, tuple(mtimes))
+
+    def _version_due(self) -> bool:
+        return time.monotonic() - self._version_checked_at >= RAG_VERSION_CHECK_SECONDS
+
+    def _check_version(self) -> None:
+        if not self._version_due():
+            return
+        now = time.monotonic()
+        version = self._collection_version()
+        with self._lock:
+            self._version_checked_at = now
+            if version == self._version:
+                return
+            if version[0] != self.real_directory:
+                print(f"INFO: Knowledge base moved to {version[0]}; reopening vector store.")
+                self._open()
+                version = self._collection_version()
+            self._version = version
+            self._results.clear()
+
+    def _cached(self, key: Tuple[str, int]) -> Optional[List[Document]]:
+        with self._lock:
+            docs = self._results.get(key)
+            if docs is not None:
+                self._results.move_to_end(key)
+            return docs
+
+    def _store(self, key: Tuple[str, int], docs: List[Document]) -> None:
+        with self._lock:
+            self._results[key] = docs
+            while len(self._results) > RAG_RESULT_CACHE_MAX_ENTRIES:
+                self._results.popitem(last=False)
+
+    def search(self, query: str, k: int = 3) -> List[Document]:
+        self._check_version()
+        key = (normalize_query(query), k)
+        docs = self._cached(key)
+        if docs is None:
+            docs = self.store.similarity_search(query, k=k)
+            self._store(key, docs)
+        return docs
+
+    async def asearch(self, query: str, k: int = 3) -> List[Document]:
+        if self._version_due():
+            # File stats and a possible reopen of Chroma block, so they run off the event loop.
+            await asyncio.to_thread(self._check_version)
+        key = (normalize_query(query), k)
+        docs = self._cached(key)
+        if docs is None:
+            docs = await self.store.asimilarity_search(query, k=k)
+            self._store(key, docs)
+        return docs
+
+    def clear_results(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+
+_handles: Dict[str, VectorStoreHandle] = {}
+_handles_lock = threading.Lock()
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    with _handles_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+
+def get_vector_store(persist_directory: str) -> VectorStoreHandle:
+    """Returns the shared handle for ``persist_directory``, opening it on first use."""
+    key = os.path.abspath(persist_directory)
+    handle = _handles.get(key)
+    if handle is None:
+        embeddings = CachedQueryEmbeddings(OpenAIEmbeddings(), get_embedding_cache())
+        with _handles_lock:
+            handle = _handles.get(key)
+            if handle is None:
+                os.makedirs(key, exist_ok=True)
+                handle = VectorStoreHandle(key, embeddings)
+                _handles[key] = handle
+    return handle